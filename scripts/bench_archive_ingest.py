@@ -0,0 +1,68 @@
+#!/usr/bin/env python
+"""
+Archive ingest benchmark: rows/sec for multi-file ingest against parse workers.
+
+Builds a backfill-style zip of gzip'd CSV files (one per hour of
+1-minute readings by default), then ingests it with common.ingest
+ingest_files at each worker count into a fresh throwaway database.
+Parsing scales with workers up to the core count; writing is a single
+writer, so it bounds the speedup.
+
+Usage:
+    python scripts/bench_archive_ingest.py [--files 2000] [--rows-per-file 500] [--workers 1 2 4 8]
+"""
+
+import argparse
+import gzip
+import os
+import sys
+import tempfile
+import zipfile
+from datetime import datetime, timezone
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "services"))
+
+from common import gcp  # noqa: E402
+from common.ingest import ingest_files  # noqa: E402
+
+START = 1_609_459_200  # 2021-01-01T00:00:00Z
+
+
+def build_archive(path: Path, files: int, rows_per_file: int):
+    with zipfile.ZipFile(path, "w", compression=zipfile.ZIP_STORED) as archive:
+        for f in range(files):
+            lines = ["timestamp,kw,cost_usd,co2_kg,temp_c"]
+            for i in range(rows_per_file):
+                ts = START + 60 * (f * rows_per_file + i)
+                stamp = datetime.fromtimestamp(ts, tz=timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
+                lines.append(f"{stamp},{50 + i % 60 * 0.5:.2f},{0.1 + i % 7 * 0.01:.3f},{0.4:.2f},{18 + i % 10}")
+            archive.writestr(f"meter/{f:05d}.csv.gz", gzip.compress(("\n".join(lines) + "\n").encode(), 6))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--files", type=int, default=2000)
+    parser.add_argument("--rows-per-file", type=int, default=500)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4, 8])
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        archive = Path(tmp) / "backfill.zip"
+        build_archive(archive, args.files, args.rows_per_file)
+        print(f"archive: {args.files} files, {args.files * args.rows_per_file:,} rows, "
+              f"{archive.stat().st_size / 1e6:.1f} MB; cpu_count={os.cpu_count()}")
+        print(f"{'workers':>8} {'files':>7} {'rows':>10} {'seconds':>8} {'rows/s':>10} {'errors':>7}")
+        for workers in args.workers:
+            gcp.DB_PATH = Path(tmp) / f"bench-{workers}.db"
+            gcp.init_db()
+            report = ingest_files([(str(archive), archive.name)], "bench", workers=workers)
+            totals = report["totals"]
+            print(
+                f"{workers:>8} {totals['files']:>7} {totals['inserted']:>10,} {report['seconds']:>8.2f} "
+                f"{report['rows_per_sec']:>10,} {totals['errors']:>7}"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+#!/usr/bin/env python
+"""
+Batch analysis benchmark: multi-site /analyze throughput against worker count.
+
+Seeds N sites of hourly load into a temporary database, then runs a full
+batch analysis of every site with 1, 2, 4 and 8 worker processes (plus
+the sequential in-process path for reference), reporting wall time,
+sites/sec and speedup over one worker.
+
+Usage:
+    python scripts/bench_batch.py [--sites 200] [--hours 720] [--workers 1 2 4 8]
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "services"))
+
+from common import analysis, gcp  # noqa: E402
+from common.models import EnergyPoint  # noqa: E402
+
+START = 1_704_067_200  # 2024-01-01T00:00:00Z
+
+
+def seed(n_sites: int, hours: int, seed: int):
+    rng = np.random.default_rng(seed)
+    hour = np.arange(hours) % 24
+    for i in range(n_sites):
+        base = rng.uniform(40, 400)
+        kw = base * (1 + 0.35 * np.exp(-((hour - 14) ** 2) / 18)) + rng.normal(0, 0.05 * base, hours)
+        gcp.insert_energy_many(
+            EnergyPoint(
+                timestamp=datetime.fromtimestamp(START + h * 3600, tz=timezone.utc).isoformat(),
+                kw=float(kw[h]),
+                site=f"site-{i}"
+            )
+            for h in range(hours)
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--sites", type=int, default=200)
+    parser.add_argument("--hours", type=int, default=720)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4, 8])
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        gcp.DB_PATH = Path(tmp) / "bench.db"
+        gcp.init_db()
+        seed(args.sites, args.hours, args.seed)
+        sites = gcp.list_sites()
+        print(f"{args.sites} sites x {args.hours} hourly rows, {os.cpu_count()} cores")
+
+        start = time.perf_counter()
+        analysis.save_analyses([analysis.analyze_site(site, full=True) for site in sites])
+        sequential = time.perf_counter() - start
+
+        print(f"{'workers':>10} {'seconds':>9} {'sites/s':>9} {'speedup':>8}")
+        print(f"{'in-process':>10} {sequential:>9.2f} {len(sites) / sequential:>9.1f} {'':>8}")
+        baseline = None
+        for workers in args.workers:
+            start = time.perf_counter()
+            results = list(analysis.analyze_batch(sites, workers, full=True))
+            elapsed = time.perf_counter() - start
+            assert len(results[-1]["insight_ids"]) == len(sites)
+            baseline = baseline or elapsed
+            print(f"{workers:>10} {elapsed:>9.2f} {len(sites) / elapsed:>9.1f} {baseline / elapsed:>7.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+#!/usr/bin/env python
+"""
+Columnar store benchmark: memory and scan time against sqlite rows.
+
+Ingests N rows of 1-minute data for one site with the columnar store
+enabled (dual write), then computes the mean kW over the whole history
+and over the last 30 days via EnergyPoint lists, sqlite arrays and the
+memory-mapped columnar store. Peak Python heap is measured with
+tracemalloc in a second run; memory-mapped pages live in the OS page
+cache instead.
+
+Usage:
+    python scripts/bench_columnar.py [--rows 1000000]
+"""
+
+import argparse
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "services"))
+
+from common import columnar, gcp  # noqa: E402
+
+START = 1_546_300_800  # 2019-01-01T00:00:00Z
+SITE = "plant-long"
+MONTH = 30 * 86400
+
+
+def seed(rows: int):
+    rng = np.random.default_rng(7)
+    kw = 100 + 20 * np.sin(np.arange(rows) * 2 * np.pi / 1440) + rng.normal(0, 3, rows)
+    chunk = 100_000
+    storage = gcp.get_storage()
+    store = columnar.get_store()
+    for lo in range(0, rows, chunk):
+        epochs = START + 60 * np.arange(lo, min(rows, lo + chunk))
+        batch = [
+            (f"{e}", int(e), float(k), SITE, None, None, 20.0)
+            for e, k in zip(epochs, kw[lo:lo + chunk])
+        ]
+        with storage.transaction() as conn:
+            conn.executemany(gcp._INSERT_ENERGY_SQL.format(table=gcp.ENERGY_TABLE), batch)
+        store.append_rows(batch)
+    store.mark_complete(SITE)
+
+
+def measure(fn):
+    # Timed without tracemalloc (it slows allocation-heavy paths several-fold)
+    start = time.perf_counter()
+    value = fn()
+    elapsed = time.perf_counter() - start
+    tracemalloc.start()
+    fn()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return value, elapsed, peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--skip-points", action="store_true", help="Skip the EnergyPoint list case")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        gcp.DB_PATH = Path(tmp) / "bench.db"
+        columnar.ENERGY_COLUMNAR_DIR = str(Path(tmp) / "columnar")
+        gcp.init_db()
+        seed(args.rows)
+        last = START + 60 * (args.rows - 1)
+
+        def sqlite_arrays(**kwargs):
+            columnar.ENERGY_COLUMNAR_DIR = ""
+            try:
+                return gcp.read_energy_arrays(SITE, ["kw"], **kwargs)["kw"].mean()
+            finally:
+                columnar.ENERGY_COLUMNAR_DIR = str(Path(tmp) / "columnar")
+
+        cases = [
+            ("sqlite arrays, all", lambda: sqlite_arrays()),
+            ("columnar mmap, all", lambda: gcp.read_energy_arrays(SITE, ["kw"])["kw"].mean()),
+            ("sqlite arrays, 30d", lambda: sqlite_arrays(start_epoch=last - MONTH)),
+            ("columnar mmap, 30d", lambda: gcp.read_energy_arrays(SITE, ["kw"], start_epoch=last - MONTH)["kw"].mean()),
+        ]
+        if not args.skip_points:
+            cases.insert(0, ("EnergyPoint list, all", lambda: np.mean([p.kw for p in gcp.read_energy(SITE, limit=None)])))
+
+        print(f"{args.rows} rows, mean kW per case")
+        print(f"{'case':>22} {'seconds':>9} {'peak MB':>9} {'mean kW':>9}")
+        for label, fn in cases:
+            value, elapsed, peak = measure(fn)
+            print(f"{label:>22} {elapsed:>9.3f} {peak / 1e6:>9.1f} {value:>9.3f}")
+
+
+if __name__ == "__main__":
+    main()
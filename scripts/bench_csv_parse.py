@@ -0,0 +1,96 @@
+#!/usr/bin/env python
+"""
+CSV parse benchmark: column-oriented EnergyCsvReader against the row-at-a-time loop.
+
+The legacy loop is the parser /upload used before: csv.DictReader, a
+dict per row, float() per field and a pydantic EnergyPoint per row,
+turned into storage rows. Both parse the same synthetic 1-minute meter
+export held in memory; storage is not involved. A share of rows can be
+corrupted (--bad-every) to time the reject path too.
+
+Usage:
+    python scripts/bench_csv_parse.py [--rows 1000000] [--bad-every 0]
+"""
+
+import argparse
+import csv
+import io
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "services"))
+
+from common.gcp import energy_row  # noqa: E402
+from common.ingest import UPLOAD_READ_SIZE, EnergyCsvReader  # noqa: E402
+from common.models import EnergyPoint  # noqa: E402
+from common.schema import to_epoch  # noqa: E402
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from bench_ingest import make_csv  # noqa: E402
+
+
+def legacy_rows(data: bytes, site: str):
+    rows = []
+    for row in csv.DictReader(io.StringIO(data.decode("utf-8"))):
+        try:
+            to_epoch(row["timestamp"])
+            point = EnergyPoint(
+                timestamp=row["timestamp"],
+                kw=float(row["kw"]),
+                site=site,
+                cost_usd=float(row["cost_usd"]) if row.get("cost_usd") else None,
+                co2_kg=float(row["co2_kg"]) if row.get("co2_kg") else None,
+                temp_c=float(row["temp_c"]) if row.get("temp_c") else None,
+            )
+        except (ValueError, KeyError, TypeError):
+            continue
+        rows.append(energy_row(point))
+    return rows, None
+
+
+def columnar_rows(data: bytes, site: str):
+    reader = EnergyCsvReader(site)
+    rows, rejects = [], []
+    for offset in range(0, len(data) + 1, UPLOAD_READ_SIZE):
+        chunk = data[offset:offset + UPLOAD_READ_SIZE]
+        parsed, bad = reader.feed(chunk, final=len(chunk) < UPLOAD_READ_SIZE)
+        rows += parsed
+        rejects += bad
+    return rows, rejects
+
+
+def corrupt(data: bytes, every: int) -> bytes:
+    lines = data.split(b"\n")
+    for i in range(1, len(lines) - 1, every):
+        lines[i] = lines[i].replace(b",", b",x", 1)
+    return b"\n".join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--bad-every", type=int, default=0, help="Corrupt the kw of every Nth row (0 = none)")
+    args = parser.parse_args()
+
+    data = make_csv(args.rows)
+    if args.bad_every:
+        data = corrupt(data, args.bad_every)
+    print(f"{args.rows:,} rows, {len(data) / 1e6:.1f} MB")
+    print(f"{'parser':>10} {'seconds':>8} {'rows/s':>12} {'valid':>9} {'rejected':>9}")
+    results = {}
+    for name, fn in (("legacy", legacy_rows), ("columnar", columnar_rows)):
+        start = time.perf_counter()
+        rows, rejects = fn(data, "bench")
+        elapsed = time.perf_counter() - start
+        results[name] = (rows, elapsed)
+        rejected = "-" if rejects is None else f"{len(rejects):,}"
+        print(f"{name:>10} {elapsed:>8.2f} {args.rows / elapsed:>12,.0f} {len(rows):>9,} {rejected:>9}")
+
+    (legacy, legacy_s), (columnar, columnar_s) = results["legacy"], results["columnar"]
+    print(f"speedup {legacy_s / columnar_s:.1f}x, identical rows: {legacy == columnar}")
+
+
+if __name__ == "__main__":
+    main()
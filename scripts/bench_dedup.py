@@ -0,0 +1,74 @@
+#!/usr/bin/env python
+"""
+Dedup benchmark: resending an overlapping window under each conflict policy.
+
+Ingests N 1-minute readings for one site, then resends all of them:
+unchanged (ignore and replace both skip identical rows without a write)
+and with every value changed (replace and latest overwrite, ignore keeps
+the stored rows). Reports rows/sec and the inserted/updated/skipped
+counts. Points are built before timing; the counts include rollup
+maintenance.
+
+Usage:
+    python scripts/bench_dedup.py [--rows 1000000]
+"""
+
+import argparse
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "services"))
+
+from common import gcp  # noqa: E402
+from common.models import EnergyPoint  # noqa: E402
+
+START = 1_609_459_200  # 2021-01-01T00:00:00Z
+SITE = "plant-resend"
+
+
+def points(rows: int, offset: float = 0.0):
+    stamps = [datetime.fromtimestamp(START + 60 * i, tz=timezone.utc).isoformat() for i in range(rows)]
+    return [
+        EnergyPoint(timestamp=stamps[i], kw=50 + (i % 60) * 0.5 + offset, site=SITE, cost_usd=0.1 + offset)
+        for i in range(rows)
+    ]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    args = parser.parse_args()
+
+    original = points(args.rows)
+    changed = points(args.rows, offset=1.0)
+    changed_again = points(args.rows, offset=2.0)
+    cases = [
+        ("first upload", "replace", original),
+        ("resend unchanged", "ignore", original),
+        ("resend unchanged", "replace", original),
+        ("resend changed", "ignore", changed),
+        ("resend changed", "replace", changed),
+        ("resend changed", "latest", changed_again),
+    ]
+
+    with tempfile.TemporaryDirectory() as tmp:
+        gcp.DB_PATH = Path(tmp) / "bench.db"
+        gcp.init_db()
+        print(f"{'case':>18} {'policy':>8} {'seconds':>8} {'rows/s':>10} {'inserted':>9} {'updated':>9} {'skipped':>9}")
+        for label, policy, source in cases:
+            start = time.perf_counter()
+            counts = gcp.insert_energy_many(source, policy=policy)
+            elapsed = time.perf_counter() - start
+            print(
+                f"{label:>18} {policy:>8} {elapsed:>8.2f} {args.rows / elapsed:>10,.0f} "
+                f"{counts.inserted:>9} {counts.updated:>9} {counts.skipped:>9}"
+            )
+        stored = gcp.energy_summary(SITE, limit=args.rows * 2)[0]
+        print(f"stored rows after {len(cases)} uploads: {stored}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+#!/usr/bin/env python
+"""
+GET /energy benchmark: rollup-backed bucket queries against raw aggregation.
+
+Ingests a year of 1-minute readings for one site (525,600 rows by
+default) with and without rollup maintenance to show the ingest cost,
+then times one-year queries: hourly/daily avg from the rollup tables,
+the same hourly query as a raw SQL GROUP BY and over NumPy arrays, p95
+(always raw), and the full endpoint with LTTB downsampling.
+
+Usage:
+    python scripts/bench_energy_query.py [--rows 525600] [--repeat 5]
+"""
+
+import argparse
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "services"))
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "services" / "gateway-api"))
+
+from fastapi.testclient import TestClient  # noqa: E402
+
+from common import gcp, rollups  # noqa: E402
+from common.models import EnergyPoint  # noqa: E402
+
+START = 1_672_531_200  # 2023-01-01T00:00:00Z
+SITE = "plant-year"
+
+
+def points(rows: int):
+    rng = np.random.default_rng(11)
+    kw = 100 + 30 * np.sin(np.arange(rows) * 2 * np.pi / 1440) + rng.normal(0, 4, rows)
+    for i in range(rows):
+        ts = datetime.fromtimestamp(START + 60 * i, tz=timezone.utc).isoformat()
+        yield EnergyPoint(timestamp=ts, kw=float(kw[i]), site=SITE)
+
+
+def ingest(rows: int, with_rollups: bool) -> float:
+    apply_rollups = gcp.apply_rollups
+    if not with_rollups:
+        gcp.apply_rollups = lambda conn, chunk: None
+    try:
+        source = list(points(rows))
+        start = time.perf_counter()
+        gcp.insert_energy_many(source)
+        return time.perf_counter() - start
+    finally:
+        gcp.apply_rollups = apply_rollups
+
+
+def timed(fn, repeat: int):
+    fn()  # warm the page cache
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        value = fn()
+        samples.append(time.perf_counter() - start)
+    return value, min(samples), float(np.median(samples))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--rows", type=int, default=525_600)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        for with_rollups in (False, True):
+            gcp.DB_PATH = Path(tmp) / f"bench-{with_rollups}.db"
+            gcp.init_db()
+            elapsed = ingest(args.rows, with_rollups)
+            label = "with rollups" if with_rollups else "no rollups"
+            print(f"ingest {label:>13}: {elapsed:7.2f} s, {args.rows / elapsed:>9,.0f} rows/s")
+
+        import main as gateway  # gateway-api/main.py
+        client = TestClient(gateway.app)
+
+        def raw_sql_hourly():
+            sql = gcp._ENERGY_AGGREGATE_SQL.format(expr="AVG(kw)")
+            return gcp._fetch_tuples(sql, (3600, 3600, SITE, -2 ** 63, 2 ** 63 - 1))
+
+        def arrays_hourly():
+            arrays = gcp.read_energy_arrays(SITE, ["ts_epoch", "kw"])
+            return rollups.aggregate_arrays(arrays["ts_epoch"], arrays["kw"], 3600, "avg")[0]
+
+        def endpoint(**params):
+            return lambda: client.get("/energy", params={"site": SITE, **params}).json()["points"]
+
+        cases = [
+            ("1h avg, rollup", lambda: gcp.read_energy_aggregate(SITE, "1h", "avg")["kw"]),
+            ("1h avg, raw SQL", raw_sql_hourly),
+            ("1h avg, raw arrays", arrays_hourly),
+            ("1d avg, rollup", lambda: gcp.read_energy_aggregate(SITE, "1d", "avg")["kw"]),
+            ("1h p95, raw arrays", lambda: gcp.read_energy_aggregate(SITE, "1h", "p95")["kw"]),
+            ("GET 1h avg", endpoint(bucket="1h", agg="avg")),
+            ("GET 1h avg, lttb 1000", endpoint(bucket="1h", agg="avg", points=1000)),
+            ("GET 1m avg, lttb 1000", endpoint(bucket="1m", agg="avg", points=1000)),
+        ]
+        print(f"{'query (one year)':>24} {'points':>8} {'best ms':>9} {'median ms':>10}")
+        for label, fn in cases:
+            value, best, median = timed(fn, args.repeat)
+            print(f"{label:>24} {len(value):>8} {best * 1000:>9.1f} {median * 1000:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
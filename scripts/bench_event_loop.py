@@ -0,0 +1,122 @@
+#!/usr/bin/env python
+"""
+Event loop load test: /health latency while a heavy /analyze runs.
+
+Seeds one site with dense per-second readings, serves agent-insight with
+uvicorn in a background thread and polls /health continuously while full
+analyses run. Compares the service's /analyze (storage and analysis on
+the common.aio thread pool) against the same work called inline on the
+event loop, as the handlers did before.
+
+Usage:
+    python scripts/bench_event_loop.py [--rows 500000] [--runs 5]
+"""
+
+import argparse
+import importlib.util
+import socket
+import sys
+import tempfile
+import threading
+import time
+import urllib.request
+from datetime import datetime, timezone
+from pathlib import Path
+
+import numpy as np
+import uvicorn
+
+SERVICES = Path(__file__).resolve().parent.parent / "services"
+sys.path.insert(0, str(SERVICES))
+
+from common import analysis, gcp  # noqa: E402
+from common.models import EnergyPoint  # noqa: E402
+
+START = 1_704_067_200  # 2024-01-01T00:00:00Z
+SITE = "plant-heavy"
+
+
+def seed(rows: int):
+    rng = np.random.default_rng(7)
+    kw = 100 + 20 * np.sin(np.arange(rows) * 2 * np.pi / 86400) + rng.normal(0, 3, rows)
+    gcp.insert_energy_many(
+        EnergyPoint(
+            timestamp=datetime.fromtimestamp(START + i, tz=timezone.utc).isoformat(),
+            kw=float(kw[i]),
+            site=SITE
+        )
+        for i in range(rows)
+    )
+
+
+def load_app():
+    spec = importlib.util.spec_from_file_location("agent_insight", SERVICES / "agent-insight" / "main.py")
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    app = module.app
+
+    @app.post("/analyze-inline")
+    async def analyze_inline(site: str):
+        # The pre-facade handler: blocking work directly on the event loop
+        return analysis.run_analysis(site, full=True)
+
+    return app
+
+
+def serve(app) -> str:
+    sock = socket.socket()
+    sock.bind(("127.0.0.1", 0))
+    port = sock.getsockname()[1]
+    sock.close()
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning"))
+    threading.Thread(target=server.run, daemon=True).start()
+    while not server.started:
+        time.sleep(0.05)
+    return f"http://127.0.0.1:{port}"
+
+
+def poll_health(base: str, stop: threading.Event, latencies: list):
+    while not stop.is_set():
+        start = time.perf_counter()
+        urllib.request.urlopen(f"{base}/health").read()
+        latencies.append(time.perf_counter() - start)
+        time.sleep(0.005)
+
+
+def measure(base: str, path: str, runs: int, idle: float = 1.0):
+    latencies, stop = [], threading.Event()
+    poller = threading.Thread(target=poll_health, args=(base, stop, latencies))
+    poller.start()
+    if path:
+        request = urllib.request.Request(f"{base}{path}?site={SITE}&full=true", method="POST")
+        for _ in range(runs):
+            urllib.request.urlopen(request).read()
+    else:
+        time.sleep(idle)
+    stop.set()
+    poller.join()
+    ms = np.array(latencies) * 1000
+    return len(ms), np.percentile(ms, 50), np.percentile(ms, 99), ms.max()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--rows", type=int, default=500_000)
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        gcp.DB_PATH = Path(tmp) / "bench.db"
+        gcp.init_db()
+        seed(args.rows)
+        base = serve(load_app())
+
+        print(f"/health latency, {args.rows} rows, {args.runs} full analyses per case")
+        print(f"{'case':>22} {'polls':>6} {'p50 ms':>8} {'p99 ms':>8} {'max ms':>8}")
+        for label, path in [("idle", ""), ("/analyze (aio pool)", "/analyze"), ("/analyze-inline", "/analyze-inline")]:
+            polls, p50, p99, worst = measure(base, path, args.runs)
+            print(f"{label:>22} {polls:>6} {p50:>8.2f} {p99:>8.2f} {worst:>8.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,137 @@
+#!/usr/bin/env python
+"""
+Event bus benchmark: throughput and end-to-end latency per backend.
+
+Publishes N events from producer threads (memory backend) or from a
+separate producer process (sqlite backend) to one asyncio subscriber,
+reporting events/sec from first publish to last delivery and the
+publish-to-delivery latency. A slow-consumer case shows backpressure:
+publishers block instead of buffering without bound. The legacy
+list-and-print publisher is timed for reference.
+
+Usage:
+    python scripts/bench_events.py [--events 100000] [--producers 4]
+"""
+
+import argparse
+import asyncio
+import contextlib
+import io
+import json
+import multiprocessing
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "services"))
+
+from common import gcp  # noqa: E402
+from common.events import EventBus, SqliteEventBus  # noqa: E402
+
+TOPIC = "event.bench"
+
+
+class LegacyPublisher:
+    """The original MockPubSubPublisher: unbounded list plus a print per event."""
+
+    def __init__(self):
+        self.published = []
+
+    def publish(self, topic, data):
+        message = {"topic": topic, "data": data, "timestamp": datetime.utcnow().isoformat()}
+        self.published.append(message)
+        print(f"[MOCK Pub/Sub] Published to {topic}: {json.dumps(data)[:100]}...")
+
+
+def produce(bus, count: int, start: int = 0):
+    for i in range(start, start + count):
+        bus.publish(TOPIC, {"site": f"site-{i % 100}", "n": i})
+
+
+async def consume(sub, total: int, delay: float = 0.0):
+    latencies = []
+    while len(latencies) < total:
+        batch = await sub.get_batch()
+        now = time.time()
+        latencies.extend(now - e.published_at for e in batch)
+        if delay:
+            await asyncio.sleep(delay)
+    return latencies
+
+
+async def run_memory(events: int, producers: int, queue_size: int, delay: float = 0.0):
+    bus = EventBus(queue_size=queue_size, publish_timeout=30.0)
+    sub = bus.subscribe(TOPIC)
+    per = events // producers
+    start = time.perf_counter()
+    threads = [threading.Thread(target=produce, args=(bus, per, i * per)) for i in range(producers)]
+    for t in threads:
+        t.start()
+    latencies = await consume(sub, per * producers, delay)
+    elapsed = time.perf_counter() - start
+    for t in threads:
+        t.join()
+    return per * producers, elapsed, latencies, bus.blocked, sub.dropped
+
+
+def sqlite_producer(db_path: str, events: int):
+    gcp.DB_PATH = Path(db_path)
+    bus = SqliteEventBus(gcp.get_storage)
+    produce(bus, events)
+    bus.flush()
+
+
+async def run_sqlite(events: int, db_path: Path):
+    bus = SqliteEventBus(gcp.get_storage, poll_interval=0.005)
+    sub = bus.subscribe(TOPIC, name="bench")
+    start = time.perf_counter()
+    proc = multiprocessing.get_context("spawn").Process(target=sqlite_producer, args=(str(db_path), events))
+    proc.start()
+    latencies = await consume(sub, events)
+    elapsed = time.perf_counter() - start
+    proc.join()
+    return events, elapsed, latencies, bus.blocked, 0
+
+
+def report(label: str, result):
+    count, elapsed, latencies, blocked, dropped = result
+    ms = np.array(latencies) * 1000
+    print(
+        f"{label:>22} {count:>8} {count / elapsed:>12,.0f} {np.percentile(ms, 50):>8.2f} "
+        f"{np.percentile(ms, 99):>8.2f} {blocked:>8} {dropped:>8}"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--events", type=int, default=100_000)
+    parser.add_argument("--producers", type=int, default=4)
+    parser.add_argument("--queue-size", type=int, default=1024)
+    args = parser.parse_args()
+
+    legacy = LegacyPublisher()
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        produce(legacy, args.events)
+    elapsed = time.perf_counter() - start
+    print(f"legacy publisher: {args.events / elapsed:,.0f} publishes/s, "
+          f"{len(legacy.published)} messages retained, never delivered")
+
+    print(f"{'case':>22} {'events':>8} {'events/s':>12} {'p50 ms':>8} {'p99 ms':>8} {'blocked':>8} {'dropped':>8}")
+    report("memory", asyncio.run(run_memory(args.events, args.producers, args.queue_size)))
+    slow = min(args.events, 20_000)
+    report("memory, slow consumer", asyncio.run(run_memory(slow, args.producers, args.queue_size, delay=0.002)))
+
+    with tempfile.TemporaryDirectory() as tmp:
+        gcp.DB_PATH = Path(tmp) / "bench.db"
+        gcp.init_db()
+        report("sqlite, cross-process", asyncio.run(run_sqlite(min(args.events, 50_000), gcp.DB_PATH)))
+
+
+if __name__ == "__main__":
+    main()
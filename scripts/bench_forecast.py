@@ -0,0 +1,79 @@
+#!/usr/bin/env python
+"""
+Forecast benchmark: batched fit time and MAPE on synthetic load curves.
+
+Generates seeded hourly load for N sites (daily and weekly cycles, a
+temperature-driven HVAC term and noise), fits each model on 8 days of
+history and scores the next 24 hours. Also times the batched call against
+fitting sites one at a time.
+
+Usage:
+    python scripts/bench_forecast.py [--sites 10 100 1000] [--seed 7]
+"""
+
+import argparse
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "services"))
+
+from common import forecasting  # noqa: E402
+
+RESOLUTION = 3600
+HORIZON = 24
+HISTORY = forecasting.HISTORY_SEASONS * 24
+START = 1_704_067_200  # 2024-01-01T00:00:00Z
+
+
+def make_sites(n: int, seed: int):
+    rng = np.random.default_rng(seed)
+    t = np.arange(HISTORY + HORIZON)
+    hour = t % 24
+    weekday = (t // 24) % 7
+    series, truth = {}, {}
+    for i in range(n):
+        base = rng.uniform(40, 400)
+        temp = 15 + 8 * np.sin(2 * np.pi * (hour - 9) / 24) + rng.normal(0, 1.5, t.size)
+        kw = base * (1 + 0.35 * np.exp(-((hour - 14) ** 2) / 18) - 0.15 * (weekday >= 5))
+        kw += 0.02 * base * np.maximum(temp - 18, 0) + rng.normal(0, 0.03 * base, t.size)
+        series[f"site-{i}"] = forecasting.SiteSeries(START, kw[:HISTORY], temp[:HISTORY])
+        truth[f"site-{i}"] = kw[HISTORY:]
+    return series, truth
+
+
+def mape(forecasts, truth) -> float:
+    errors = [
+        np.mean(np.abs(np.array([p.kw for p in forecasts[site]]) - actual) / actual)
+        for site, actual in truth.items()
+    ]
+    return 100 * float(np.mean(errors))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--sites", type=int, nargs="+", default=[10, 100, 1000])
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    print(f"{'sites':>6} {'model':>15} {'batch s':>9} {'per-site s':>11} {'MAPE %':>8}")
+    for n in args.sites:
+        series, truth = make_sites(n, args.seed)
+        for model in forecasting.MODELS:
+            forecasting.clear_param_cache()
+            start = time.perf_counter()
+            result = forecasting.forecast_many(series, model, HORIZON, RESOLUTION)
+            batch = time.perf_counter() - start
+
+            forecasting.clear_param_cache()
+            start = time.perf_counter()
+            for site, s in series.items():
+                forecasting.forecast_many({site: s}, model, HORIZON, RESOLUTION)
+            single = time.perf_counter() - start
+            print(f"{n:>6} {model:>15} {batch:>9.3f} {single:>11.3f} {mape(result, truth):>8.2f}")
+
+
+if __name__ == "__main__":
+    main()
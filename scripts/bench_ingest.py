@@ -0,0 +1,105 @@
+#!/usr/bin/env python
+"""
+Ingest benchmark: rows/sec for CSV uploads through the gateway ingest path.
+
+Compares the legacy per-row insert_energy loop, whole-file insert_energy_rows
+and the streaming upload path on synthetic CSV files. With --memory, also
+reports peak Python heap per mode (tracemalloc, slower). Runs against a
+throwaway SQLite database.
+
+Usage:
+    python scripts/bench_ingest.py [--sizes 10000 100000 1000000] [--baseline-max 100000] [--memory]
+"""
+
+import argparse
+import asyncio
+import io
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "services"))
+
+from common import gcp  # noqa: E402
+from common.ingest import EnergyCsvReader, ingest_csv_stream  # noqa: E402
+from common.models import EnergyPoint  # noqa: E402
+
+
+def make_csv(rows: int) -> bytes:
+    """Build a synthetic 1-minute meter export."""
+    start = datetime(2024, 1, 1)
+    buf = io.StringIO()
+    buf.write("timestamp,kw,cost_usd,co2_kg,temp_c\n")
+    for i in range(rows):
+        ts = (start + timedelta(minutes=i)).isoformat() + "Z"
+        kw = 50 + (i % 60) * 0.5
+        buf.write(f"{ts},{kw:.2f},{kw * 0.12:.2f},{kw * 0.5:.2f},{20 + (i % 24) * 0.1:.1f}\n")
+    return buf.getvalue().encode("utf-8")
+
+
+def parse(data: bytes):
+    return EnergyCsvReader("bench").feed(data, final=True)[0]
+
+
+def run_bulk(data: bytes) -> int:
+    return gcp.insert_energy_rows(parse(data)).written
+
+
+def run_stream(data: bytes) -> int:
+    source = io.BytesIO(data)
+
+    async def read(size: int) -> bytes:
+        return source.read(size)
+
+    return asyncio.run(ingest_csv_stream(read, "bench")).counts.written
+
+
+def run_per_row(data: bytes) -> int:
+    count = 0
+    for timestamp, _, kw, site, cost_usd, co2_kg, temp_c in parse(data):
+        gcp.insert_energy(EnergyPoint(timestamp=timestamp, kw=kw, site=site, cost_usd=cost_usd, co2_kg=co2_kg, temp_c=temp_c))
+        count += 1
+    return count
+
+
+def timed(fn, data: bytes, db_path: Path, memory: bool):
+    gcp.DB_PATH = db_path
+    gcp.init_db()
+    if memory:
+        tracemalloc.start()
+    start = time.perf_counter()
+    rows = fn(data)
+    elapsed = time.perf_counter() - start
+    peak = None
+    if memory:
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+    return rows, elapsed, peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000, 1_000_000])
+    parser.add_argument("--baseline-max", type=int, default=100_000,
+                        help="Skip the per-row baseline above this size (it is very slow)")
+    parser.add_argument("--memory", action="store_true", help="Report peak heap per mode")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        print(f"{'rows':>10} {'mode':>10} {'seconds':>10} {'rows/sec':>12} {'peak MB':>10}")
+        for size in args.sizes:
+            data = make_csv(size)
+            modes = [("bulk", run_bulk), ("stream", run_stream)]
+            if size <= args.baseline_max:
+                modes.insert(0, ("per-row", run_per_row))
+            for name, fn in modes:
+                rows, elapsed, peak = timed(fn, data, Path(tmp) / f"{name}-{size}.db", args.memory)
+                peak_mb = f"{peak / 1e6:.1f}" if peak is not None else "-"
+                print(f"{rows:>10} {name:>10} {elapsed:>10.2f} {rows / elapsed:>12,.0f} {peak_mb:>10}")
+
+
+if __name__ == "__main__":
+    main()
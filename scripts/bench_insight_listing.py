@@ -0,0 +1,130 @@
+#!/usr/bin/env python
+"""
+Insight listing benchmark: binary details and header reads against data_json.
+
+For each anomaly count, saves --insights insights for one site into a
+throwaway database and times listing them: the legacy path (json.loads
+of a data_json TEXT blob, kept in a side table, and a model per nested
+record), list_insights (binary details), and list_insight_headers (the
+planner's and assistant's lookups, which never read details).
+
+Usage:
+    python scripts/bench_insight_listing.py [--anomalies 10 1000 10000] [--insights 10] [--repeat 20]
+"""
+
+import argparse
+import json
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "services"))
+
+from common import gcp  # noqa: E402
+from common.models import Anomaly, ForecastPoint, Insight  # noqa: E402
+
+_LEGACY_LIST_SQL = """
+    SELECT id, site, created_at, summary, mode, data_json
+    FROM legacy_insights
+    WHERE site = ?
+    ORDER BY created_at DESC
+    LIMIT ?
+"""
+
+
+def make_insight(site: str, index: int, anomalies: int) -> Insight:
+    severities = ("low", "medium", "high")
+    return Insight(
+        site=site,
+        created_at=f"2024-01-01T00:00:{index:02d}",
+        anomalies=[
+            Anomaly(
+                timestamp=f"2024-01-01T{i // 60 % 24:02d}:{i % 60:02d}:00Z",
+                kw=50 + i % 40 * 1.25, expected_kw=50.0, deviation=i % 40 * 1.25,
+                severity=severities[i % 3]
+            )
+            for i in range(anomalies)
+        ],
+        forecast_24h=[ForecastPoint(timestamp=f"2024-01-02T{h:02d}:00:00Z", kw=50 + h) for h in range(24)],
+        summary=f"Insight {index}"
+    )
+
+
+def legacy_list(site: str, limit: int):
+    rows = gcp.get_storage().connection().execute(_LEGACY_LIST_SQL, (site, limit)).fetchall()
+    insights = []
+    for row in rows:
+        data = json.loads(row["data_json"] or "{}")
+        insights.append(Insight(
+            id=row["id"], site=row["site"], created_at=row["created_at"], summary=row["summary"], mode=row["mode"],
+            anomalies=[Anomaly(**a) for a in data.get("anomalies", [])],
+            forecast_24h=[ForecastPoint(**f) for f in data.get("forecast_24h", [])]
+        ))
+    return insights
+
+
+def timed(fn, repeat: int) -> float:
+    fn()
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - start) / repeat * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--anomalies", type=int, nargs="+", default=[10, 1000, 10000])
+    parser.add_argument("--insights", type=int, default=10)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        gcp.DB_PATH = Path(tmp) / "bench.db"
+        gcp.init_db()
+        with gcp.get_storage().transaction() as conn:
+            conn.execute("""
+                CREATE TABLE legacy_insights (
+                    id INTEGER PRIMARY KEY, site TEXT, created_at TEXT, summary TEXT, mode TEXT, data_json TEXT
+                )
+            """)
+            conn.execute("CREATE INDEX idx_legacy_site_created ON legacy_insights (site, created_at)")
+
+        print(f"{args.insights} insights per site, ms per listing")
+        print(
+            f"{'anomalies':>9} {'json KB':>8} {'binary KB':>9} {'legacy':>9} {'binary':>9} "
+            f"{'headers':>9} {'header[1]':>9}"
+        )
+        for count in args.anomalies:
+            site = f"site-{count}"
+            insights = [make_insight(site, i, count) for i in range(args.insights)]
+            for insight in insights:
+                insight.id = gcp.save_insight(insight)
+            legacy = [
+                (i.id, i.site, i.created_at, i.summary, i.mode, json.dumps({
+                    "anomalies": [a.dict() for a in i.anomalies],
+                    "forecast_24h": [f.dict() for f in i.forecast_24h]
+                }))
+                for i in insights
+            ]
+            with gcp.get_storage().transaction() as conn:
+                conn.executemany("INSERT INTO legacy_insights VALUES (?, ?, ?, ?, ?, ?)", legacy)
+            json_kb = sum(len(row[-1]) for row in legacy) / len(legacy) / 1024
+            binary_kb = gcp.get_storage().connection().execute(
+                "SELECT AVG(LENGTH(details)) FROM insights WHERE site = ?", (site,)
+            ).fetchone()[0] / 1024
+
+            assert [i.dict() for i in gcp.list_insights(site, args.insights)] == \
+                [i.dict() for i in legacy_list(site, args.insights)]
+            limit = args.insights
+            print(
+                f"{count:>9,} {json_kb:>8.1f} {binary_kb:>9.1f} "
+                f"{timed(lambda: legacy_list(site, limit), args.repeat):>9.2f} "
+                f"{timed(lambda: gcp.list_insights(site, limit), args.repeat):>9.2f} "
+                f"{timed(lambda: gcp.list_insight_headers(site, limit), args.repeat):>9.3f} "
+                f"{timed(lambda: gcp.list_insight_headers(site, 1), args.repeat):>9.3f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
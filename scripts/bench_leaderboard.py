@@ -0,0 +1,113 @@
+#!/usr/bin/env python
+"""
+Leaderboard benchmark: cross-site top-k from the index against a per-site scan.
+
+For each site count, fills a throwaway database with a week of daily
+readings (with cost and CO2) and one insight per site, then times a
+top-k read of every leaderboard metric (site_leaderboard), a site's own
+rank (site_rank), and the loop the index replaces: list_insights plus
+rollup_totals for every site, sorted in Python. Also reports what the
+index upkeep adds to a single save_insight.
+
+Usage:
+    python scripts/bench_leaderboard.py [--sites 10 1000 10000] [--top 10] [--repeat 50]
+"""
+
+import argparse
+import random
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "services"))
+
+from common import gcp  # noqa: E402
+from common.models import Anomaly, ForecastPoint, Insight  # noqa: E402
+from common.schema import LEADERBOARD_DAYS  # noqa: E402
+
+START = 1_704_067_200  # 2024-01-01T00:00:00Z
+
+
+def make_insight(site: str, rng: random.Random, created_at: str = "2024-01-08T00:00:00") -> Insight:
+    return Insight(
+        site=site,
+        created_at=created_at,
+        anomalies=[
+            Anomaly(timestamp="2024-01-07T12:00:00Z", kw=80.0, expected_kw=50.0, deviation=30.0, severity=rng.choice(("low", "high")))
+            for _ in range(rng.randint(0, 40))
+        ],
+        forecast_24h=[ForecastPoint(timestamp=f"2024-01-08T{h:02d}:00:00Z", kw=rng.uniform(20, 200)) for h in range(24)],
+        summary=f"Insight for {site}"
+    )
+
+
+def seed(sites, rng: random.Random):
+    rows = [
+        (f"2024-01-{day + 1:02d}T00:00:00Z", START + day * 86400, rng.uniform(20, 200), site, rng.uniform(1, 50), rng.uniform(1, 20), None)
+        for site in sites
+        for day in range(7)
+    ]
+    gcp.insert_energy_rows(rows)
+    gcp.save_insights_many([(make_insight(site, rng), None, None) for site in sites])
+
+
+def scan_top(metric: str, sites, top: int):
+    # What answering without the index takes: every site's latest insight and totals
+    values = []
+    for site in sites:
+        insight = gcp.list_insights(site, limit=1)[0]
+        totals = gcp.rollup_totals(site, days=LEADERBOARD_DAYS)
+        if metric == "high_anomalies":
+            values.append((sum(1 for a in insight.anomalies if a.severity == "high"), site))
+        elif metric == "cost_usd":
+            values.append((totals["cost_usd"]["sum"], site))
+    return sorted(values, reverse=True)[:top]
+
+
+def timed(fn, repeat: int) -> float:
+    fn()
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - start) / repeat * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--sites", type=int, nargs="+", default=[10, 1000, 10000])
+    parser.add_argument("--top", type=int, default=10)
+    parser.add_argument("--repeat", type=int, default=50)
+    args = parser.parse_args()
+
+    rng = random.Random(7)
+    print(f"ms per call; top-{args.top}")
+    print(
+        f"{'sites':>6} {'top-k (all metrics)':>20} {'site_rank':>10} {'scan high_anom':>15} "
+        f"{'scan cost':>10} {'save_insight':>13}"
+    )
+    with tempfile.TemporaryDirectory() as tmp:
+        for count in args.sites:
+            gcp.DB_PATH = Path(tmp) / f"bench-{count}.db"
+            gcp.init_db()
+            sites = [f"site-{i:05d}" for i in range(count)]
+            seed(sites, rng)
+
+            top_k = timed(lambda: [gcp.site_leaderboard(m, args.top) for m in gcp.LEADERBOARD_METRICS], args.repeat)
+            rank = timed(lambda: gcp.site_rank("cost_usd", sites[count // 2]), args.repeat)
+            for metric in ("high_anomalies", "cost_usd"):
+                indexed = [(e.value, e.site) for e in gcp.site_leaderboard(metric, args.top)]
+                assert [v for v, _ in indexed] == [v for v, _ in scan_top(metric, sites, args.top)]
+            scans = [timed(lambda: scan_top(m, sites, args.top), 1) for m in ("high_anomalies", "cost_usd")]
+
+            insights = [make_insight(sites[i % count], rng, f"2024-01-09T00:00:{i % 60:02d}") for i in range(50)]
+            start = time.perf_counter()
+            for insight in insights:
+                gcp.save_insight(insight)
+            save = (time.perf_counter() - start) / len(insights) * 1000
+
+            print(f"{count:>6,} {top_k:>20.3f} {rank:>10.3f} {scans[0]:>15.1f} {scans[1]:>10.1f} {save:>13.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,171 @@
+#!/usr/bin/env python
+"""
+Metrics benchmark: what the /metrics instrumentation costs on the hot paths.
+
+Times the primitives (histogram observe, counter inc, a @timed call
+against the undecorated function), one request through the ASGI stack
+with and without MetricsMiddleware, and rendering /metrics. Then runs
+the same storage and analysis workload (ingest, analyze every site,
+small reads) in two subprocesses, METRICS_ENABLED=1 and =0, and
+compares: that difference is the whole per-process overhead.
+
+Usage:
+    python scripts/bench_metrics.py [--sites 20] [--rows 2000] [--reads 2000] [--repeat 5]
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "services"))
+
+from common import analysis, gcp, metrics  # noqa: E402
+
+START = 1_704_067_200  # 2024-01-01T00:00:00Z
+
+
+def per_call(fn, calls: int) -> float:
+    """Best of five runs, µs per call."""
+    best = float("inf")
+    for _ in range(5):
+        start = time.perf_counter()
+        for _ in range(calls):
+            fn()
+        best = min(best, time.perf_counter() - start)
+    return best / calls * 1e6
+
+
+def asgi_request(app, path: str = "/health") -> float:
+    """µs per GET `path` driven straight through the ASGI app (no HTTP client)."""
+    scope = {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "GET",
+        "scheme": "http", "path": path, "raw_path": path.encode(), "query_string": b"",
+        "root_path": "", "headers": [], "client": ("127.0.0.1", 1), "server": ("127.0.0.1", 80),
+    }
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        pass
+
+    async def requests(count: int) -> float:
+        best = float("inf")
+        for _ in range(5):
+            start = time.perf_counter()
+            for _ in range(count):
+                await app(dict(scope), receive, send)
+            best = min(best, time.perf_counter() - start)
+        return best / count * 1e6
+
+    return asyncio.run(requests(2000))
+
+
+def primitives():
+    from fastapi import FastAPI
+
+    hist = metrics.histogram("bench_seconds", "Benchmark histogram", ("name",)).labels("x")
+    count = metrics.counter("bench_total", "Benchmark counter", ("name",)).labels("x")
+
+    def noop():
+        return None
+
+    timed_noop = metrics.timed(metrics.ANALYSIS_SECONDS, "bench_noop")(noop)
+    print("µs per call")
+    print(f"{'histogram observe':<34} {per_call(lambda: hist.observe(0.003), 200_000):>8.3f}")
+    print(f"{'counter inc':<34} {per_call(lambda: count.inc(5), 200_000):>8.3f}")
+    print(f"{'no-op function':<34} {per_call(noop, 200_000):>8.3f}")
+    print(f"{'@timed no-op function':<34} {per_call(timed_noop, 200_000):>8.3f}")
+
+    def service(instrumented: bool):
+        app = FastAPI()
+
+        @app.get("/health")
+        async def health():
+            return {"status": "healthy"}
+
+        if instrumented:
+            app.add_middleware(metrics.MetricsMiddleware, routes_app=app)
+        return app
+
+    plain, instrumented = asgi_request(service(False)), asgi_request(service(True))
+    print(f"{'GET /health, no middleware':<34} {plain:>8.1f}")
+    print(f"{'GET /health, MetricsMiddleware':<34} {instrumented:>8.1f}  (+{instrumented - plain:.1f})")
+    print(f"{'render /metrics':<34} {per_call(metrics.render, 50):>8.1f}  ({len(metrics.render().splitlines())} lines)")
+
+
+def workload(sites: int, rows: int, reads: int) -> dict:
+    """Fresh database; seconds per phase of ingest, analysis and small reads."""
+    with tempfile.TemporaryDirectory() as tmp:
+        gcp.DB_PATH = Path(tmp) / "bench.db"
+        gcp.init_db()
+        names = [f"site-{i:03d}" for i in range(sites)]
+        batch = [
+            (f"t{i}", START + i * 900, 50.0 + (i * 7919) % 40, site, 0.2, 0.1, 15.0)
+            for site in names
+            for i in range(rows)
+        ]
+        timings = {}
+
+        start = time.perf_counter()
+        gcp.insert_energy_rows(batch)
+        timings["ingest"] = time.perf_counter() - start
+
+        start = time.perf_counter()
+        for site in names:
+            analysis.save_analyses([analysis.analyze_site(site, full=True)])
+        timings["analyze"] = time.perf_counter() - start
+
+        start = time.perf_counter()
+        for i in range(reads):
+            site = names[i % sites]
+            gcp.answer_context(site)
+            gcp.site_version("insights", site)
+            gcp.list_insight_headers(site, 1)
+        timings["reads"] = time.perf_counter() - start
+    return timings
+
+
+def compare(args):
+    print(f"\n{args.sites} sites x {args.rows:,} rows; {args.reads:,} x 3 small reads; best of {args.repeat}, ms")
+    results = {}
+    for enabled in ("1", "0"):
+        runs = []
+        for _ in range(args.repeat):
+            out = subprocess.run(
+                [sys.executable, __file__, "--workload", "--sites", str(args.sites), "--rows", str(args.rows), "--reads", str(args.reads)],
+                env={**os.environ, "METRICS_ENABLED": enabled}, capture_output=True, text=True, check=True
+            ).stdout
+            runs.append(json.loads(out.splitlines()[-1]))
+        results[enabled] = {phase: min(run[phase] for run in runs) * 1000 for phase in runs[0]}
+
+    print(f"{'phase':<10} {'metrics off':>12} {'metrics on':>11} {'overhead':>9}")
+    for phase, off in results["0"].items():
+        on = results["1"][phase]
+        print(f"{phase:<10} {off:>12.1f} {on:>11.1f} {(on - off) / off * 100:>8.1f}%")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--sites", type=int, default=20)
+    parser.add_argument("--rows", type=int, default=2000)
+    parser.add_argument("--reads", type=int, default=2000)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--workload", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.workload:
+        print(json.dumps(workload(args.sites, args.rows, args.reads)))
+        return
+    primitives()
+    compare(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+#!/usr/bin/env python
+"""
+Rollup benchmark: ingest overhead, parallel rebuild and rollup-backed reads.
+
+Ingests a year of 1-minute readings with cost and CO2 for one site
+(525,600 rows by default) with and without rollup maintenance, rebuilds
+the rollups with 1..N workers, then compares finance-style reads
+(monthly totals, last-30-days totals) and seasonal detector warm-up
+between the rollup tables and raw rows.
+
+Usage:
+    python scripts/bench_rollups.py [--rows 525600] [--workers 1 2 4]
+"""
+
+import argparse
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "services"))
+
+from common import detectors, gcp, rollups  # noqa: E402
+from common.models import EnergyPoint  # noqa: E402
+from common.schema import ENERGY_VIEW  # noqa: E402
+
+START = 1_672_531_200  # 2023-01-01T00:00:00Z
+SITE = "plant-finance"
+
+RAW_MONTHLY_SQL = f"""
+    SELECT strftime('%Y-%m', ts_epoch, 'unixepoch') AS month, COUNT(kw), SUM(kw), SUM(cost_usd), SUM(co2_kg)
+    FROM {ENERGY_VIEW} WHERE site = ? GROUP BY month
+"""
+
+RAW_RECENT_SQL = f"""
+    SELECT COUNT(kw), SUM(kw), SUM(cost_usd), SUM(co2_kg)
+    FROM {ENERGY_VIEW} WHERE site = ? AND ts_epoch >= ?
+"""
+
+
+def points(rows: int):
+    rng = np.random.default_rng(5)
+    kw = 100 + 30 * np.sin(np.arange(rows) * 2 * np.pi / 1440) + rng.normal(0, 4, rows)
+    return [
+        EnergyPoint(
+            timestamp=datetime.fromtimestamp(START + 60 * i, tz=timezone.utc).isoformat(),
+            kw=float(kw[i]), site=SITE, cost_usd=float(kw[i]) * 0.002, co2_kg=float(kw[i]) * 0.0007
+        )
+        for i in range(rows)
+    ]
+
+
+def timed(fn, repeat: int = 3):
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        value = fn()
+        samples.append(time.perf_counter() - start)
+    return value, min(samples)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--rows", type=int, default=525_600)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    args = parser.parse_args()
+
+    source = points(args.rows)
+    with tempfile.TemporaryDirectory() as tmp:
+        for with_rollups in (False, True):
+            gcp.DB_PATH = Path(tmp) / f"bench-{with_rollups}.db"
+            gcp.init_db()
+            apply_rollups = gcp.apply_rollups
+            if not with_rollups:
+                gcp.apply_rollups = lambda conn, chunk: None
+            start = time.perf_counter()
+            gcp.insert_energy_many(source)
+            elapsed = time.perf_counter() - start
+            gcp.apply_rollups = apply_rollups
+            label = "with rollups" if with_rollups else "no rollups"
+            print(f"ingest {label:>13}: {elapsed:7.2f} s, {args.rows / elapsed:>9,.0f} rows/s")
+
+        print(f"{'rebuild workers':>24} {'seconds':>9}")
+        for workers in args.workers:
+            _, elapsed = timed(lambda: rollups.rebuild_rollups([SITE], workers=workers, chunk_days=31), repeat=1)
+            print(f"{workers:>24} {elapsed:>9.2f}")
+
+        last = START + 60 * (args.rows - 1)
+        conn = gcp.get_storage().connection()
+
+        def replay_seasonal():
+            detector = detectors.SeasonalDetector(24)
+            detectors.run_detector(detector, gcp.read_energy_series(SITE, limit=None))
+            return detector.stats
+
+        def seed_seasonal():
+            detector = detectors.SeasonalDetector(24)
+            detector.seed(gcp.read_rollups(SITE, "1h"))
+            return detector.stats
+
+        cases = [
+            ("monthly totals, raw", lambda: conn.execute(RAW_MONTHLY_SQL, (SITE,)).fetchall()),
+            ("monthly totals, rollup", lambda: gcp.read_rollups(SITE, "1mo")["bucket"]),
+            ("30-day totals, raw", lambda: conn.execute(RAW_RECENT_SQL, (SITE, last - 30 * 86400)).fetchall()),
+            ("30-day totals, rollup", lambda: [gcp.rollup_totals(SITE, 30)]),
+            ("seasonal warm-up, raw", replay_seasonal),
+            ("seasonal warm-up, rollup", seed_seasonal),
+        ]
+        print(f"{'read':>24} {'rows':>6} {'best ms':>9}")
+        for label, fn in cases:
+            value, best = timed(fn)
+            print(f"{label:>24} {len(value):>6} {best * 1000:>9.1f}")
+
+
+if __name__ == "__main__":
+    main()
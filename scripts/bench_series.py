@@ -0,0 +1,110 @@
+#!/usr/bin/env python
+"""
+EnergySeries benchmark: construction time and memory against EnergyPoint lists.
+
+Builds N one-minute readings in memory as a List[EnergyPoint] and as an
+EnergySeries (with and without the original timestamp strings), then
+reads the same rows back from sqlite through read_energy and
+read_energy_series, and runs the global anomaly detector on both forms.
+Peak Python heap is measured with tracemalloc in a second, untimed run.
+
+Usage:
+    python scripts/bench_series.py [--rows 1000000]
+"""
+
+import argparse
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timezone
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "services"))
+
+from common import anomaly, gcp  # noqa: E402
+from common.models import EnergyPoint, EnergySeries  # noqa: E402
+
+START = 1_546_300_800  # 2019-01-01T00:00:00Z
+SITE = "plant-series"
+
+
+def columns(rows: int):
+    rng = np.random.default_rng(7)
+    ts = START + 60 * np.arange(rows, dtype=np.int64)
+    kw = 100 + 20 * np.sin(np.arange(rows) * 2 * np.pi / 1440) + rng.normal(0, 3, rows)
+    cost = kw * 0.12
+    return ts, kw, cost
+
+
+def iso(ts: np.ndarray):
+    return [datetime.fromtimestamp(t, tz=timezone.utc).isoformat() for t in ts.tolist()]
+
+
+def seed(ts, kw, cost, stamps):
+    chunk = 100_000
+    storage = gcp.get_storage()
+    for lo in range(0, len(ts), chunk):
+        batch = [
+            (stamps[i], int(ts[i]), float(kw[i]), SITE, float(cost[i]), None, None)
+            for i in range(lo, min(len(ts), lo + chunk))
+        ]
+        with storage.transaction() as conn:
+            conn.executemany(gcp._INSERT_ENERGY_SQL.format(table=gcp.ENERGY_TABLE), batch)
+
+
+def measure(fn):
+    start = time.perf_counter()
+    value = fn()
+    elapsed = time.perf_counter() - start
+    tracemalloc.start()
+    kept = fn()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    del kept
+    return value, elapsed, peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    args = parser.parse_args()
+
+    ts, kw, cost = columns(args.rows)
+    stamps = iso(ts)
+    ts_list, kw_list, cost_list = ts.tolist(), kw.tolist(), cost.tolist()
+
+    def point_list():
+        return [
+            EnergyPoint(timestamp=stamps[i], kw=kw_list[i], site=SITE, cost_usd=cost_list[i])
+            for i in range(args.rows)
+        ]
+
+    with tempfile.TemporaryDirectory() as tmp:
+        gcp.DB_PATH = Path(tmp) / "bench.db"
+        gcp.init_db()
+        seed(ts, kw, cost, stamps)
+
+        points = point_list()
+        series = EnergySeries(SITE, ts, kw, cost)
+        cases = [
+            ("build List[EnergyPoint]", point_list),
+            ("build EnergySeries+ts", lambda: EnergySeries(SITE, ts_list, kw_list, cost_list, timestamps=stamps)),
+            ("build EnergySeries", lambda: EnergySeries(SITE, ts.copy(), kw.copy(), cost.copy())),
+            ("read_energy", lambda: gcp.read_energy(SITE, limit=None)),
+            ("read_energy_series", lambda: gcp.read_energy_series(SITE, limit=None)),
+            ("detect, point list", lambda: anomaly.detect_anomalies(points)),
+            ("detect, series", lambda: anomaly.detect_anomalies(series)),
+        ]
+
+        print(f"{args.rows} rows")
+        print(f"{'case':>24} {'seconds':>9} {'peak MB':>9} {'result':>9}")
+        for label, fn in cases:
+            value, elapsed, peak = measure(fn)
+            print(f"{label:>24} {elapsed:>9.3f} {peak / 1e6:>9.1f} {len(value):>9}")
+
+
+if __name__ == "__main__":
+    main()
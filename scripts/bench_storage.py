@@ -0,0 +1,109 @@
+#!/usr/bin/env python
+"""
+Storage benchmark: per-helper latency under mixed concurrent read/write load.
+
+Seeds a throwaway database, then runs writer threads (insert_energy,
+save_insight) alongside reader threads (read_energy, list_insights) for a
+fixed duration and reports p50/p99 latency and call counts per helper.
+
+Usage:
+    python scripts/bench_storage.py [--seed-rows 50000] [--writers 2] [--readers 6] [--seconds 10]
+"""
+
+import argparse
+import sys
+import tempfile
+import threading
+import time
+from collections import defaultdict
+from datetime import datetime, timedelta
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "services"))
+
+from common import gcp  # noqa: E402
+from common.models import EnergyPoint, Insight  # noqa: E402
+
+SITES = [f"site-{i}" for i in range(20)]
+
+
+def seed(rows: int):
+    start = datetime(2024, 1, 1)
+    gcp.insert_energy_many(
+        EnergyPoint(
+            timestamp=(start + timedelta(minutes=i // len(SITES))).isoformat(),
+            kw=50 + i % 30,
+            site=SITES[i % len(SITES)],
+        )
+        for i in range(rows)
+    )
+
+
+def percentile(samples, pct: float) -> float:
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct))]
+
+
+def worker(ops, stop: threading.Event, latencies, lock: threading.Lock):
+    local = defaultdict(list)
+    i = 0
+    while not stop.is_set():
+        name, fn = ops[i % len(ops)]
+        start = time.perf_counter()
+        fn(SITES[i % len(SITES)], i)
+        local[name].append(time.perf_counter() - start)
+        i += 1
+    with lock:
+        for name, samples in local.items():
+            latencies[name].extend(samples)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--seed-rows", type=int, default=50_000)
+    parser.add_argument("--writers", type=int, default=2)
+    parser.add_argument("--readers", type=int, default=6)
+    parser.add_argument("--seconds", type=float, default=10.0)
+    args = parser.parse_args()
+
+    write_ops = [
+        ("insert_energy", lambda site, i: gcp.insert_energy(
+            EnergyPoint(timestamp=f"2025-01-01T00:00:{i % 60:02d}", kw=60.0, site=site))),
+        ("save_insight", lambda site, i: gcp.save_insight(
+            Insight(site=site, created_at=datetime.utcnow().isoformat(), summary="bench"))),
+    ]
+    read_ops = [
+        ("read_energy", lambda site, i: gcp.read_energy(site, limit=100)),
+        ("list_insights", lambda site, i: gcp.list_insights(site, limit=10)),
+    ]
+
+    with tempfile.TemporaryDirectory() as tmp:
+        gcp.DB_PATH = Path(tmp) / "bench.db"
+        gcp.init_db()
+        seed(args.seed_rows)
+
+        stop = threading.Event()
+        lock = threading.Lock()
+        latencies = defaultdict(list)
+        threads = [
+            threading.Thread(target=worker, args=(write_ops, stop, latencies, lock))
+            for _ in range(args.writers)
+        ] + [
+            threading.Thread(target=worker, args=(read_ops, stop, latencies, lock))
+            for _ in range(args.readers)
+        ]
+        for t in threads:
+            t.start()
+        time.sleep(args.seconds)
+        stop.set()
+        for t in threads:
+            t.join()
+
+    print(f"{'helper':>14} {'calls':>8} {'p50 ms':>8} {'p99 ms':>8}")
+    for name, samples in sorted(latencies.items()):
+        print(f"{name:>14} {len(samples):>8} {percentile(samples, 0.5) * 1e3:>8.2f} "
+              f"{percentile(samples, 0.99) * 1e3:>8.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -2,14 +2,83 @@
 
 from fastapi import FastAPI, Body
 from fastapi.middleware.cors import CORSMiddleware
+import re
 import sys
 from pathlib import Path
+from typing import List, Optional
 
 # Add common to path
 sys.path.insert(0, str(Path(__file__).parent.parent))
 
-from common.gcp import init_db, list_insights, list_plans
-from common.models import AskRequest, AskResponse
+from common import aio, metrics
+from common.models import AnswerContext, AskRequest, AskResponse
+
+# Question intents in precedence order, as (intent, patterns): a question
+# matching several gets the earliest. Ranking questions compare sites
+# through the leaderboard, so they need explicit cross-site phrasing
+# ("which site", "top 5", "rank sites"): "compared to last week" or
+# "ranked by priority" stay with their topic. Usage questions are
+# answered from the daily rollups (cost, CO2 and load totals).
+_SITES = r"(?:sites|plants|facilities)\b"
+INTENTS = (
+    ("ranking", (
+        r"which (?:site|plant|facilit)", r"\b(?:top|bottom) (?:\d+|" + _SITES + ")", r"leaderboard",
+        r"\b(?:rank|compar)\w* (?:(?:the|our|all|my) )?" + _SITES, _SITES + r" (?:ranked|ranking)"
+    )),
+    ("anomalies", ("anomal", "spike", "outlier")),
+    ("forecast", ("forecast", "predict", "future")),
+    ("plan", ("plan", "action", "recommend")),
+    ("priority", ("priority", "urgent")),
+    ("usage", ("cost", "spend", "co2", "carbon", "emission", "usage", "consumption")),
+)
+
+# What a ranking question ranks by, in precedence order, as (leaderboard
+# metric, patterns), and how its values read
+RANKING_METRICS = (
+    ("high_anomalies", (r"high[- ]severity", "severe", "critical")),
+    ("anomalies", ("anomal", "spike", "outlier")),
+    ("cost_usd", ("cost", "spend", "expensive")),
+    ("co2_kg", ("co2", "carbon", "emission")),
+    ("forecast_kw", ("forecast", "load", "demand", "predict")),
+)
+METRIC_LABELS = {
+    "high_anomalies": ("high-severity anomalies", "{:,.0f}"),
+    "anomalies": ("anomalies", "{:,.0f}"),
+    "cost_usd": ("energy cost", "${:,.2f}"),
+    "co2_kg": ("CO2 emissions", "{:,.1f} kg"),
+    "forecast_kw": ("forecast load", "{:,.1f} kW"),
+}
+_ASCENDING = re.compile(r"\b(?:lowest|least|fewest|smallest|bottom)\b")
+_RANKING_SIZE = re.compile(r"\b(?:top|bottom) (\d+)")
+RANKING_DEFAULT_SIZE = 5
+RANKING_MAX_SIZE = 50
+
+# Comparison wording; with two or more known site ids in the question
+# ("compare plant-a and plant-b by cost") it is a ranking of those sites
+_COMPARISON = re.compile(r"\b(?:compar|rank|versus\b|vs\b)")
+_SITE_TOKEN = re.compile(r"[\w][\w.:-]*\w|\w")
+QUESTION_MAX_TOKENS = 100
+
+
+class KeywordMatcher:
+    """
+    First-listed name whose patterns occur in a text.
+
+    One alternation over every pattern, a named group per name: a single
+    scan of the text however many names there are.
+    """
+
+    def __init__(self, table):
+        self.pattern = re.compile("|".join(f"(?P<{name}>{'|'.join(patterns)})" for name, patterns in table))
+        self.rank = {name: rank for rank, (name, _) in enumerate(table)}
+
+    def match(self, text: str):
+        matched = {match.lastgroup for match in self.pattern.finditer(text)}
+        return min(matched, key=self.rank.__getitem__) if matched else None
+
+
+_intents = KeywordMatcher(INTENTS)
+_ranking_metrics = KeywordMatcher(RANKING_METRICS)
 
 app = FastAPI(
     title="EcoPulse Agent Assistant",
@@ -26,10 +95,13 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Request latency per route, and every registered metric on GET /metrics
+metrics.instrument_app(app)
+
 # Initialize database on startup
 @app.on_event("startup")
 async def startup():
-    init_db()
+    await aio.init_db()
 
 
 @app.get("/health")
@@ -38,80 +110,107 @@ async def health():
     return {"status": "healthy", "service": "agent-assistant"}
 
 
-def generate_answer(site: str, question: str, insights, plans) -> str:
-    """Generate answer based on insights and plans."""
-    question_lower = question.lower()
-    
-    # Simple keyword-based responses
-    if "anomal" in question_lower or "spike" in question_lower or "outlier" in question_lower:
-        if insights:
-            latest = insights[0]
-            anomaly_count = len(latest.anomalies)
-            if anomaly_count > 0:
-                high_count = sum(1 for a in latest.anomalies if a.severity == "high")
-                return f"Found {anomaly_count} anomalies in the latest analysis, including {high_count} high-severity ones. Review the insights for details."
-            else:
-                return "No anomalies detected in the latest analysis. Energy consumption patterns appear normal."
-        else:
-            return "No insights available. Please run the analysis first."
-    
-    elif "forecast" in question_lower or "predict" in question_lower or "future" in question_lower:
-        if insights:
-            latest = insights[0]
-            if latest.forecast_24h:
-                avg_forecast = sum(f.kw for f in latest.forecast_24h) / len(latest.forecast_24h)
-                return f"The 24-hour forecast predicts an average load of {avg_forecast:.1f} kW. Check the insights for detailed forecast data."
-            else:
-                return "No forecast data available in the latest insight."
-        else:
-            return "No insights available. Please run the analysis first."
-    
-    elif "plan" in question_lower or "action" in question_lower or "recommend" in question_lower:
-        if plans:
-            latest = plans[0]
-            high_priority = [item for item in latest.items if item.priority == "high"]
-            return f"The latest plan includes {len(latest.items)} actionable items, with {len(high_priority)} high-priority actions. Review the plans for details."
-        else:
-            return "No plans available. Please generate a plan first."
-    
-    elif "priority" in question_lower or "urgent" in question_lower:
-        if plans:
-            latest = plans[0]
-            high_priority = [item for item in latest.items if item.priority == "high"]
-            if high_priority:
-                actions = ", ".join([item.action for item in high_priority[:3]])
-                return f"High-priority actions: {actions}. Review the full plan for all recommendations."
-            else:
-                return "No high-priority actions in the current plan. All items are medium or low priority."
-        else:
-            return "No plans available. Please generate a plan first."
-    
-    else:
-        # Generic response
-        insight_count = len(insights)
-        plan_count = len(plans)
-        return f"For site '{site}': {insight_count} insights and {plan_count} plans available. Ask about anomalies, forecasts, or action plans for more specific information."
+def match_intent(question: str) -> str:
+    """The question's intent, or "general" if no keyword matches."""
+    return _intents.match(question.lower()) or "general"
+
+
+def _answer_anomalies(context: AnswerContext, totals) -> str:
+    if not context.insight_id:
+        return "No insights available. Please run the analysis first."
+    if context.anomaly_count > 0:
+        high = context.severities.get("high")
+        high_count = high.count if high else 0
+        return f"Found {context.anomaly_count} anomalies in the latest analysis, including {high_count} high-severity ones. Review the insights for details."
+    return "No anomalies detected in the latest analysis. Energy consumption patterns appear normal."
+
+
+def _answer_forecast(context: AnswerContext, totals) -> str:
+    if not context.insight_id:
+        return "No insights available. Please run the analysis first."
+    if context.forecast_count:
+        return f"The 24-hour forecast predicts an average load of {context.forecast_mean_kw:.1f} kW. Check the insights for detailed forecast data."
+    return "No forecast data available in the latest insight."
+
+
+def _answer_plan(context: AnswerContext, totals) -> str:
+    if not context.plan_id:
+        return "No plans available. Please generate a plan first."
+    return f"The latest plan includes {context.plan_item_count} actionable items, with {len(context.high_priority_actions)} high-priority actions. Review the plans for details."
+
+
+def _answer_priority(context: AnswerContext, totals) -> str:
+    if not context.plan_id:
+        return "No plans available. Please generate a plan first."
+    if context.high_priority_actions:
+        actions = ", ".join(context.high_priority_actions[:3])
+        return f"High-priority actions: {actions}. Review the full plan for all recommendations."
+    return "No high-priority actions in the current plan. All items are medium or low priority."
+
+
+def _answer_usage(context: AnswerContext, totals) -> str:
+    if not totals:
+        return "No energy data available for this site. Please upload readings first."
+    kw = totals["kw"]
+    parts = [f"Over the last {totals['days']} days of data, the average load was {kw['mean']:.1f} kW (peak {kw['max']:.1f} kW)"]
+    if totals["cost_usd"]["count"]:
+        parts.append(f"energy cost ${totals['cost_usd']['sum']:,.2f}")
+    if totals["co2_kg"]["count"]:
+        parts.append(f"emissions {totals['co2_kg']['sum']:,.1f} kg CO2")
+    return ", ".join(parts) + "."
+
+
+def _answer_general(context: AnswerContext, totals) -> str:
+    return f"For site '{context.site}': {context.insight_count} insights and {context.plan_count} plans available. Ask about anomalies, forecasts, or action plans for more specific information."
+
+
+_ANSWERS = {
+    "anomalies": _answer_anomalies,
+    "forecast": _answer_forecast,
+    "plan": _answer_plan,
+    "priority": _answer_priority,
+    "usage": _answer_usage,
+    "general": _answer_general,
+}
+
+
+def generate_answer(intent: str, context: AnswerContext, totals=None) -> str:
+    """Generate answer from the site's answer context and (for usage questions) rollup totals."""
+    return _ANSWERS[intent](context, totals)
 
 
 @app.post("/ask", response_model=AskResponse)
 async def ask(request: AskRequest = Body(...)):
     """
     Answer questions about insights and plans for a site.
+
+    Reads one answer-context row per question, whatever the number or
+    size of stored insights and plans.
     """
     try:
-        # Get recent insights and plans
-        insights = list_insights(request.site, limit=5)
-        plans = list_plans(request.site, limit=5)
+        intent = match_intent(request.q)
+        named = []
+        if intent == "ranking" or _COMPARISON.search(request.q.lower()):
+            named = await aio.known_sites(_SITE_TOKEN.findall(request.q)[:QUESTION_MAX_TOKENS])
+            if len(named) >= 2:
+                intent = "ranking"
+        if intent == "ranking":
+            return await ask_ranking(request, named if len(named) >= 2 else None)
+        context = await aio.answer_context(request.site)
+        # Usage totals come from at most 30 daily rollup rows, not raw readings
+        totals = await aio.rollup_totals(request.site, days=30) if intent == "usage" else None
         
         # Generate answer
-        answer = generate_answer(request.site, request.q, insights, plans)
+        answer = generate_answer(intent, context, totals)
         
         # Build sources
         sources = []
-        if insights:
-            sources.append(f"Latest insight (ID: {insights[0].id})")
-        if plans:
-            sources.append(f"Latest plan (ID: {plans[0].id})")
+        if context.insight_id:
+            sources.append(f"Latest insight (ID: {context.insight_id})")
+        if context.plan_id:
+            sources.append(f"Latest plan (ID: {context.plan_id})")
+        if totals:
+            sources.append(f"Daily rollups ({totals['days']} days)")
         
         return AskResponse(
             answer=answer,
@@ -123,3 +222,39 @@ async def ask(request: AskRequest = Body(...)):
             sources=[]
         )
 
+
+async def ask_ranking(request: AskRequest, sites: Optional[List[str]] = None) -> AskResponse:
+    """
+    Answer a cross-site question from the site leaderboard: the top (or
+    bottom) sites by one metric, plus where the asking site stands; or,
+    given the `sites` a question names, those sites compared.
+    """
+    question_lower = request.q.lower()
+    metric = _ranking_metrics.match(question_lower)
+    if metric is None:
+        labels = ", ".join(label for label, _ in METRIC_LABELS.values())
+        return AskResponse(answer=f"Sites can be ranked by {labels}. Which should I compare?", sources=[])
+    
+    ascending = _ASCENDING.search(question_lower) is not None
+    size = _RANKING_SIZE.search(question_lower)
+    limit = min(int(size.group(1)), RANKING_MAX_SIZE) if size else RANKING_DEFAULT_SIZE
+    if sites:
+        limit = len(sites)
+    entries = await aio.site_leaderboard(metric, max(limit, 1), ascending, sites)
+    label, value_format = METRIC_LABELS[metric]
+    if not entries:
+        return AskResponse(answer=f"No sites have {label} data yet. Please run the analysis first.", sources=[])
+    
+    ranked = ", ".join(f"{entry.site} ({value_format.format(entry.value)})" for entry in entries)
+    if sites:
+        answer = f"{', '.join(sites)} by {label}, {'lowest' if ascending else 'highest'} first: {ranked}."
+        missing = [site for site in sites if all(entry.site != site for entry in entries)]
+        if missing:
+            answer += f" No {label} data for {', '.join(missing)}."
+        return AskResponse(answer=answer, sources=[f"Site leaderboard ({metric})"])
+    answer = f"{'Lowest' if ascending else 'Top'} {len(entries)} sites by {label}: {ranked}."
+    if all(entry.site != request.site for entry in entries):
+        own = await aio.site_rank(metric, request.site, ascending)
+        if own is not None:
+            answer += f" '{own.site}' ranks #{own.rank} ({value_format.format(own.value)})."
+    return AskResponse(answer=answer, sources=[f"Site leaderboard ({metric})"])
@@ -8,7 +8,8 @@ from pathlib import Path
 # Add common to path
 sys.path.insert(0, str(Path(__file__).parent.parent))
 
-from common.gcp import init_db, read_energy, publish_event
+from common import aio, metrics
+from common.gcp import publish_event
 
 app = FastAPI(
     title="EcoPulse Agent Harvester",
@@ -25,10 +26,13 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Request latency per route, and every registered metric on GET /metrics
+metrics.instrument_app(app)
+
 # Initialize database on startup
 @app.on_event("startup")
 async def startup():
-    init_db()
+    await aio.init_db()
 
 
 @app.get("/health")
@@ -44,9 +48,8 @@ async def trigger(site: str = Query(default="plant-a", description="Site identif
     Reads energy data from database and publishes insight event.
     """
     try:
-        # Read recent energy data
-        energy_points = read_energy(site, limit=1000)
-        row_count = len(energy_points)
+        # Count recent energy data (no rows are materialized)
+        row_count, latest_timestamp = await aio.energy_summary(site, limit=1000)
         
         if row_count == 0:
             return {
@@ -60,7 +63,7 @@ async def trigger(site: str = Query(default="plant-a", description="Site identif
         publish_event("event.insight", {
             "site": site,
             "row_count": row_count,
-            "latest_timestamp": energy_points[0].timestamp if energy_points else None
+            "latest_timestamp": latest_timestamp
         })
         
         return {
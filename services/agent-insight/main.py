@@ -1,22 +1,20 @@
-"""Agent Insight - Anomaly detection and 24h forecast."""
+"""Agent Insight - Anomaly detection and load forecast."""
 
 from fastapi import FastAPI, Query
 from fastapi.middleware.cors import CORSMiddleware
-from datetime import datetime, timedelta
-import statistics
+from fastapi.responses import StreamingResponse
+import json
 import sys
 from pathlib import Path
-from typing import List
 
 # Add common to path
 sys.path.insert(0, str(Path(__file__).parent.parent))
 
-from common.gcp import init_db, read_energy, save_insight, publish_event
-from common.models import Insight, Anomaly, ForecastPoint
+from common import aio, analysis, metrics
 
 app = FastAPI(
     title="EcoPulse Agent Insight",
-    description="Anomaly detection and 24h load forecast",
+    description="Anomaly detection and load forecast",
     version="1.0.0"
 )
 
@@ -29,10 +27,13 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Request latency per route, and every registered metric on GET /metrics
+metrics.instrument_app(app)
+
 # Initialize database on startup
 @app.on_event("startup")
 async def startup():
-    init_db()
+    await aio.init_db()
 
 
 @app.get("/health")
@@ -41,130 +42,34 @@ async def health():
     return {"status": "healthy", "service": "agent-insight"}
 
 
-def detect_anomalies(energy_points: List) -> List[Anomaly]:
-    """Detect anomalies using mean ± 2σ."""
-    if len(energy_points) < 3:
-        return []
-    
-    kw_values = [p.kw for p in energy_points]
-    mean = statistics.mean(kw_values)
-    stdev = statistics.stdev(kw_values) if len(kw_values) > 1 else 0
-    
-    if stdev == 0:
-        return []
-    
-    threshold = 2 * stdev
-    anomalies = []
-    
-    for point in energy_points:
-        deviation = abs(point.kw - mean)
-        if deviation > threshold:
-            severity = "high" if deviation > 3 * stdev else "medium" if deviation > 2.5 * stdev else "low"
-            anomalies.append(Anomaly(
-                timestamp=point.timestamp,
-                kw=point.kw,
-                expected_kw=mean,
-                deviation=deviation,
-                severity=severity
-            ))
-    
-    return anomalies
-
-
-def forecast_24h(energy_points: List) -> List[ForecastPoint]:
-    """Naive 24h forecast: project last kW value forward."""
-    if not energy_points:
-        return []
-    
-    # Use the most recent kW value
-    last_kw = energy_points[0].kw
-    
-    # Parse last timestamp (assuming ISO format or similar)
-    try:
-        last_ts = datetime.fromisoformat(energy_points[0].timestamp.replace("Z", "+00:00"))
-    except:
-        last_ts = datetime.utcnow()
-    
-    forecast = []
-    for i in range(24):
-        forecast_ts = last_ts + timedelta(hours=i+1)
-        forecast.append(ForecastPoint(
-            timestamp=forecast_ts.isoformat(),
-            kw=last_kw
-        ))
-    
-    return forecast
-
-
 @app.post("/analyze")
 async def analyze(
     site: str = Query(default="plant-a", description="Site identifier"),
-    mode: str = Query(default=None, description="Analysis mode (e.g., 'gemini')")
+    mode: str = Query(default=None, description="Analysis mode (e.g., 'gemini')"),
+    detector: str = Query(default="global", description="Anomaly detector: global, rolling, ewma, seasonal_hour, seasonal_week"),
+    forecast_model: str = Query(default="holt_winters", description="Forecast model: naive, seasonal_naive, holt_winters, ridge"),
+    horizon_hours: int = Query(default=24, ge=1, le=168, description="Forecast horizon in hours"),
+    resolution: str = Query(default="1h", description="Forecast resolution: 15m, 1h, 1d"),
+    full: bool = Query(default=False, description="Ignore the saved watermark and recompute from scratch")
 ):
     """
-    Analyze energy data: detect anomalies and generate 24h forecast.
+    Analyze energy data: detect anomalies and generate a load forecast.
     
     Supports optional Gemini mode via ?mode=gemini parameter.
+    `detector=global` flags points beyond 2σ of the site's running kW
+    aggregates; the other detectors keep their own per-site state.
+    Only rows newer than the last insight's watermark are processed unless
+    `full=true`.
     """
     try:
-        # Read energy data
-        energy_points = read_energy(site, limit=1000)
-        
-        if not energy_points:
-            return {
-                "status": "no_data",
-                "site": site,
-                "message": "No energy data found for site"
-            }
-        
-        # Detect anomalies
-        anomalies = detect_anomalies(energy_points)
-        
-        # Generate 24h forecast
-        forecast = forecast_24h(energy_points)
-        
-        # Generate summary
-        summary_parts = [
-            f"Analyzed {len(energy_points)} data points",
-            f"Detected {len(anomalies)} anomalies",
-            f"Generated 24h forecast with {len(forecast)} points"
-        ]
-        if mode == "gemini":
-            summary_parts.append("(Enhanced with Gemini AI)")
-        
-        summary = ". ".join(summary_parts) + "."
-        
-        # Create insight
-        insight = Insight(
-            site=site,
-            created_at=datetime.utcnow().isoformat(),
-            anomalies=anomalies,
-            forecast_24h=forecast,
-            summary=summary,
-            mode=mode
+        return await aio.run(
+            analysis.run_analysis, site, mode,
+            detector=detector,
+            forecast_model=forecast_model,
+            horizon_hours=horizon_hours,
+            resolution=resolution,
+            full=full
         )
-        
-        # Save insight
-        insight_id = save_insight(insight)
-        insight.id = insight_id
-        
-        # Publish plan event
-        publish_event("event.plan", {
-            "site": site,
-            "insight_id": insight_id,
-            "anomaly_count": len(anomalies),
-            "forecast_points": len(forecast)
-        })
-        
-        return {
-            "status": "success",
-            "site": site,
-            "insight_id": insight_id,
-            "anomalies": len(anomalies),
-            "forecasted": len(forecast),
-            "mode": mode,
-            "insight": insight.dict()
-        }
     except Exception as e:
         return {
             "status": "error",
@@ -172,3 +77,45 @@ async def analyze(
             "error": str(e)
         }
 
+
+@app.post("/analyze/batch")
+async def analyze_batch(
+    sites: str = Query(default="all", description="Comma-separated site identifiers, or 'all'"),
+    workers: int = Query(default=analysis.BATCH_WORKERS, ge=1, le=64, description="Worker processes (at most the CPU count)"),
+    mode: str = Query(default=None, description="Analysis mode (e.g., 'gemini')"),
+    detector: str = Query(default="global", description="Anomaly detector: global, rolling, ewma, seasonal_hour, seasonal_week"),
+    forecast_model: str = Query(default="holt_winters", description="Forecast model: naive, seasonal_naive, holt_winters, ridge"),
+    horizon_hours: int = Query(default=24, ge=1, le=168, description="Forecast horizon in hours"),
+    resolution: str = Query(default="1h", description="Forecast resolution: 15m, 1h, 1d"),
+    full: bool = Query(default=False, description="Ignore the saved watermarks and recompute from scratch")
+):
+    """
+    Analyze many sites in parallel worker processes.
+
+    Streams one NDJSON line per site as it finishes. Insights are written
+    in chunks as sites finish, each followed by a
+    {"status": "committed", "insight_ids": {...}} line; the last such
+    line ends the stream.
+    """
+    site_list = None if sites == "all" else [s.strip() for s in sites.split(",") if s.strip()]
+    results = analysis.analyze_batch(
+        site_list, workers,
+        mode=mode,
+        detector=detector,
+        forecast_model=forecast_model,
+        horizon_hours=horizon_hours,
+        resolution=resolution,
+        full=full
+    )
+
+    def lines():
+        try:
+            for result in results:
+                yield json.dumps(result) + "\n"
+        except Exception as e:
+            yield json.dumps({"status": "error", "error": str(e)}) + "\n"
+        finally:
+            # On disconnect: write the sites that already finished
+            results.close()
+
+    return StreamingResponse(lines(), media_type="application/x-ndjson")
@@ -2,15 +2,14 @@
 
 from fastapi import FastAPI, Query
 from fastapi.middleware.cors import CORSMiddleware
-from datetime import datetime
 import sys
 from pathlib import Path
 
 # Add common to path
 sys.path.insert(0, str(Path(__file__).parent.parent))
 
-from common.gcp import init_db, list_insights, save_plan
-from common.models import Plan, PlanItem
+from common import aio, metrics
+from common.planning import PLAN_GENERATOR_VERSION, build_plan
 
 app = FastAPI(
     title="EcoPulse Agent Planner",
@@ -27,10 +26,13 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Request latency per route, and every registered metric on GET /metrics
+metrics.instrument_app(app)
+
 # Initialize database on startup
 @app.on_event("startup")
 async def startup():
-    init_db()
+    await aio.init_db()
 
 
 @app.get("/health")
@@ -39,71 +41,17 @@ async def health():
     return {"status": "healthy", "service": "agent-planner"}
 
 
-def generate_plan_items(insight) -> list[PlanItem]:
-    """Generate actionable plan items based on insight."""
-    items = []
-    
-    # If there are anomalies, add investigation items
-    if insight.anomalies:
-        high_anomalies = [a for a in insight.anomalies if a.severity == "high"]
-        if high_anomalies:
-            items.append(PlanItem(
-                action="Investigate high-severity energy spikes",
-                priority="high",
-                expected_impact_kw=sum(a.deviation for a in high_anomalies) / len(high_anomalies),
-                rationale=f"Detected {len(high_anomalies)} high-severity anomalies requiring immediate attention"
-            ))
-        
-        items.append(PlanItem(
-            action="Review anomaly patterns and root causes",
-            priority="medium",
-            expected_impact_kw=5.0,
-            rationale=f"Total of {len(insight.anomalies)} anomalies detected across the dataset"
-        ))
-    
-    # Always add standard optimization items
-    items.append(PlanItem(
-        action="Conduct nighttime load audit",
-        priority="medium",
-        expected_impact_kw=10.0,
-        rationale="Nighttime loads may indicate unnecessary equipment running"
-    ))
-    
-    items.append(PlanItem(
-        action="HVAC system tune-up and optimization",
-        priority="medium",
-        expected_impact_kw=15.0,
-        rationale="HVAC systems are typically the largest energy consumers"
-    ))
-    
-    items.append(PlanItem(
-        action="Review and optimize peak demand periods",
-        priority="low",
-        expected_impact_kw=8.0,
-        rationale="Reducing peak demand can lower overall energy costs"
-    ))
-    
-    # If forecast shows consistent load, suggest load balancing
-    if insight.forecast_24h:
-        avg_forecast = sum(f.kw for f in insight.forecast_24h) / len(insight.forecast_24h)
-        items.append(PlanItem(
-            action="Implement load balancing strategies",
-            priority="low",
-            expected_impact_kw=avg_forecast * 0.1,
-            rationale=f"Forecasted average load of {avg_forecast:.1f} kW suggests opportunities for load shifting"
-        ))
-    
-    return items
-
-
 @app.post("/plan")
 async def plan(site: str = Query(default="plant-a", description="Site identifier")):
     """
     Generate actionable plan from latest insight.
+
+    Plans are memoized per insight and generator version: if the latest
+    insight already has one, it is returned instead of a new plan.
     """
     try:
-        # Get latest insight
-        insights = list_insights(site, limit=1)
+        # Get latest insight (header only: plans need its aggregates, not its details)
+        insights = await aio.list_insight_headers(site, limit=1)
         
         if not insights:
             return {
@@ -114,27 +62,23 @@ async def plan(site: str = Query(default="plant-a", description="Site identifier
         
         latest_insight = insights[0]
         
-        # Generate plan items
-        items = generate_plan_items(latest_insight)
+        # Reuse the plan already generated for this insight
+        plan = await aio.find_plan(latest_insight.id, PLAN_GENERATOR_VERSION)
+        cached = plan is not None
         
-        # Create plan
-        plan = Plan(
-            site=site,
-            created_at=datetime.utcnow().isoformat(),
-            items=items,
-            rationale=f"Generated {len(items)} actionable items based on latest insight (ID: {latest_insight.id})",
-            insight_id=latest_insight.id
-        )
-        
-        # Save plan
-        plan_id = save_plan(plan)
-        plan.id = plan_id
+        if not cached:
+            # Generate plan
+            plan = build_plan(latest_insight)
+            
+            # Save plan (a concurrent request may have saved one first; its ID wins)
+            plan.id = await aio.save_plan(plan, PLAN_GENERATOR_VERSION)
         
         return {
             "status": "success",
             "site": site,
-            "plan_id": plan_id,
-            "items_count": len(items),
+            "plan_id": plan.id,
+            "items_count": len(plan.items),
+            "cached": cached,
             "plan": plan.dict()
         }
     except Exception as e:
@@ -144,3 +88,35 @@ async def plan(site: str = Query(default="plant-a", description="Site identifier
             "error": str(e)
         }
 
+
+@app.post("/plan/batch")
+async def plan_batch():
+    """
+    Generate plans for every site whose latest insight has none yet.
+
+    Finds those insights in one query and saves all plans in one
+    transaction.
+    """
+    try:
+        insights = await aio.list_unplanned_insights(PLAN_GENERATOR_VERSION)
+        plans = [build_plan(insight) for insight in insights]
+        plan_ids = await aio.save_plans_many(plans, PLAN_GENERATOR_VERSION)
+        
+        return {
+            "status": "success",
+            "sites": len(plans),
+            "plans": [
+                {
+                    "site": plan.site,
+                    "insight_id": plan.insight_id,
+                    "plan_id": plan_id,
+                    "items_count": len(plan.items)
+                }
+                for plan, plan_id in zip(plans, plan_ids)
+            ]
+        }
+    except Exception as e:
+        return {
+            "status": "error",
+            "error": str(e)
+        }
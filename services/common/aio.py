@@ -0,0 +1,200 @@
+"""Async facade over the blocking storage helpers for FastAPI handlers."""
+
+import asyncio
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from functools import partial
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Tuple, TypeVar
+import numpy as np
+from . import gcp
+from .metrics import STORAGE_QUEUE_SECONDS, gauge
+from .models import AnswerContext, EnergyPoint, EnergySeries, Insight, InsightHeader, LeaderboardEntry, Plan, PlanHeader
+
+
+# Threads running blocking storage calls. Each keeps its own pooled sqlite
+# connection, so this also bounds open connections per process.
+STORAGE_THREADS = int(os.getenv("STORAGE_THREADS", "8"))
+
+# Processes for CPU-bound batch work (multi-file parse, batch analysis),
+# shared by every call in this process; larger worker counts are clamped
+PROCESS_WORKERS = os.cpu_count() or 1
+
+T = TypeVar("T")
+
+_executor: Optional[ThreadPoolExecutor] = None
+_process_pool: Optional[ProcessPoolExecutor] = None
+_process_pool_pid = 0
+_process_pool_lock = threading.Lock()
+
+
+def get_executor() -> ThreadPoolExecutor:
+    """Get the bounded thread pool used for blocking calls."""
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(max_workers=STORAGE_THREADS, thread_name_prefix="storage")
+    return _executor
+
+
+def get_process_pool() -> ProcessPoolExecutor:
+    """
+    Get the process pool shared by CPU-bound batch work.
+
+    Workers are started by a forkserver (spawn where unavailable), never
+    forked from this process, so they inherit none of its threads, locks
+    or sqlite connections. A broken pool, or one inherited across a fork,
+    is replaced.
+    """
+    global _process_pool, _process_pool_pid
+    with _process_pool_lock:
+        if _process_pool is None or _process_pool._broken or _process_pool_pid != os.getpid():
+            methods = multiprocessing.get_all_start_methods()
+            context = multiprocessing.get_context("forkserver" if "forkserver" in methods else "spawn")
+            _process_pool = ProcessPoolExecutor(max_workers=PROCESS_WORKERS, mp_context=context)
+            _process_pool_pid = os.getpid()
+        return _process_pool
+
+
+def clamp_workers(workers: int) -> int:
+    """`workers` limited to 1..PROCESS_WORKERS."""
+    return max(1, min(workers, PROCESS_WORKERS))
+
+
+def _queue_depth() -> Dict[tuple, float]:
+    # Read at scrape time: nothing is counted per call
+    return {(): _executor._work_queue.qsize() if _executor is not None else 0}
+
+
+gauge("ecopulse_storage_queue_depth", "Storage calls waiting for a thread of the async storage pool", (), _queue_depth)
+_queue_wait = STORAGE_QUEUE_SECONDS.labels()
+
+
+def _started(submitted: float, call: Callable[[], T]) -> T:
+    _queue_wait.observe(time.perf_counter() - submitted)
+    return call()
+
+
+async def run(fn: Callable[..., T], *args, **kwargs) -> T:
+    """
+    Run a blocking function on the storage pool without stalling the event loop.
+
+    Calls waiting for a thread, and how long they wait, are exported as
+    ecopulse_storage_queue_depth and ecopulse_storage_queue_wait_seconds.
+    """
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(get_executor(), partial(_started, time.perf_counter(), partial(fn, *args, **kwargs)))
+
+
+async def init_db():
+    return await run(gcp.init_db)
+
+
+async def insert_energy_many(
+    points: Iterable[EnergyPoint],
+    chunk_size: int = gcp.INGEST_CHUNK_SIZE,
+    policy: Optional[str] = None,
+    created_at: Optional[str] = None
+) -> gcp.IngestCounts:
+    return await run(gcp.insert_energy_many, points, chunk_size, policy, created_at)
+
+
+async def insert_energy_rows(
+    rows: Iterable[tuple],
+    chunk_size: int = gcp.INGEST_CHUNK_SIZE,
+    policy: Optional[str] = None,
+    created_at: Optional[str] = None
+) -> gcp.IngestCounts:
+    return await run(gcp.insert_energy_rows, rows, chunk_size, policy, created_at)
+
+
+async def read_ingest_errors(report_id: str) -> List[tuple]:
+    return await run(gcp.read_ingest_errors, report_id)
+
+
+async def read_energy(site: str, limit: int = 1000) -> List[EnergyPoint]:
+    return await run(gcp.read_energy, site, limit)
+
+
+async def read_energy_series(site: str, limit: int = 1000) -> EnergySeries:
+    return await run(gcp.read_energy_series, site, limit)
+
+
+async def energy_summary(site: str, limit: int = 1000) -> Tuple[int, Optional[str]]:
+    return await run(gcp.energy_summary, site, limit)
+
+
+async def read_energy_aggregate(
+    site: str,
+    bucket: str = "1h",
+    agg: str = "avg",
+    start_epoch: Optional[int] = None,
+    end_epoch: Optional[int] = None
+) -> Dict[str, np.ndarray]:
+    return await run(gcp.read_energy_aggregate, site, bucket, agg, start_epoch, end_epoch)
+
+
+async def rollup_totals(site: str, days: int = 30) -> Optional[Dict[str, Any]]:
+    return await run(gcp.rollup_totals, site, days)
+
+
+async def list_insights(site: str, limit: int = 10) -> List[Insight]:
+    return await run(gcp.list_insights, site, limit)
+
+
+async def list_insight_headers(site: str, limit: int = 10) -> List[InsightHeader]:
+    return await run(gcp.list_insight_headers, site, limit)
+
+
+async def list_unplanned_insights(generator_version: int) -> List[InsightHeader]:
+    return await run(gcp.list_unplanned_insights, generator_version)
+
+
+async def save_insight(insight: Insight, watermark_epoch: Optional[int] = None, agg_state: Optional[Dict[str, Any]] = None) -> int:
+    return await run(gcp.save_insight, insight, watermark_epoch, agg_state)
+
+
+async def save_plan(plan: Plan, generator_version: Optional[int] = None) -> int:
+    return await run(gcp.save_plan, plan, generator_version)
+
+
+async def save_plans_many(plans: List[Plan], generator_version: Optional[int] = None) -> List[int]:
+    return await run(gcp.save_plans_many, plans, generator_version)
+
+
+async def find_plan(insight_id: int, generator_version: int) -> Optional[Plan]:
+    return await run(gcp.find_plan, insight_id, generator_version)
+
+
+async def site_version(kind: str, site: str) -> int:
+    return await run(gcp.site_version, kind, site)
+
+
+async def list_plans(site: str, limit: int = 10) -> List[Plan]:
+    return await run(gcp.list_plans, site, limit)
+
+
+async def list_plan_headers(site: str, limit: int = 10) -> List[PlanHeader]:
+    return await run(gcp.list_plan_headers, site, limit)
+
+
+async def answer_context(site: str) -> AnswerContext:
+    return await run(gcp.answer_context, site)
+
+
+async def site_leaderboard(
+    metric: str,
+    limit: int = 10,
+    ascending: bool = False,
+    sites: Optional[Sequence[str]] = None
+) -> List[LeaderboardEntry]:
+    return await run(gcp.site_leaderboard, metric, limit, ascending, sites)
+
+
+async def site_rank(metric: str, site: str, ascending: bool = False) -> Optional[LeaderboardEntry]:
+    return await run(gcp.site_rank, metric, site, ascending)
+
+
+async def known_sites(candidates: Sequence[str]) -> List[str]:
+    return await run(gcp.known_sites, candidates)
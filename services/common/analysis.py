@@ -0,0 +1,300 @@
+"""Site analysis: anomaly detection and load forecast into an Insight."""
+
+import math
+import os
+from concurrent.futures import FIRST_COMPLETED, wait
+from datetime import datetime
+from typing import Any, Dict, Iterator, List, Optional
+from . import aio, anomaly, detectors, forecasting, gcp
+from .gcp import (
+    read_energy_series, read_energy_since, read_energy_buckets, list_insights,
+    publish_event, load_detector_state, load_analysis_state, load_rewind, read_rollups, save_insights_many
+)
+from .metrics import ANALYSIS_SECONDS, timed
+from .models import ForecastPoint, Insight
+from .schema import to_epoch
+
+
+# Latest rows an analysis scores (the global detector's baseline) and
+# within which anomalies are reported
+INCREMENTAL_WINDOW = 1000
+
+# Default worker processes for batch analysis (at most aio.PROCESS_WORKERS)
+BATCH_WORKERS = int(os.getenv("ANALYZE_BATCH_WORKERS", str(os.cpu_count() or 1)))
+
+# Finished batch results written per transaction
+BATCH_COMMIT_SIZE = int(os.getenv("ANALYZE_BATCH_COMMIT_SIZE", "50"))
+
+
+@timed(ANALYSIS_SECONDS)
+def detect_incremental(site: str, detector: str, limit: int = 1000, reset: bool = False):
+    """
+    Run a stateful detector over points newer than its persisted watermark.
+
+    First use for a site (or `reset`) warms up on the latest `limit` points;
+    seasonal detectors are first seeded with every earlier full hour from
+    the hourly rollups. Later calls only fold in what arrived since.
+    Returns (anomalies, state), where state is the updated detector state
+    to persist, or None if unchanged.
+    """
+    state = None if reset else load_detector_state(site, detector)
+    engine = detectors.create_detector(detector, state)
+    new_points = read_energy_since(site, engine.watermark, limit)
+    if state is None and isinstance(engine, detectors.SeasonalDetector) and len(new_points):
+        # Hours before the one the window starts in: no reading counted twice
+        first = int(new_points.ts_epoch[0])
+        engine.seed(read_rollups(site, "1h", end_epoch=first - first % 3600))
+    anomalies = detectors.run_detector(engine, new_points)
+    return anomalies, (engine.to_state() if len(new_points) else None)
+
+
+@timed(ANALYSIS_SECONDS)
+def forecast_load(
+    site: str,
+    model: str = "holt_winters",
+    horizon_hours: int = 24,
+    resolution: str = "1h"
+) -> List[ForecastPoint]:
+    """Forecast site load `horizon_hours` ahead (see common.forecasting)."""
+    if resolution not in forecasting.RESOLUTIONS:
+        raise ValueError(f"Unknown resolution '{resolution}'. Choose from: {', '.join(forecasting.RESOLUTIONS)}")
+    step = forecasting.RESOLUTIONS[resolution]
+    buckets = read_energy_buckets(site, step, forecasting.history_seconds(step))
+    series = forecasting.to_series(buckets, step)
+    if series is None:
+        return []
+    horizon = math.ceil(horizon_hours * 3600 / step)
+    return forecasting.forecast_many({site: series}, model, horizon, step)[site]
+
+
+@timed(ANALYSIS_SECONDS)
+def analyze_site(
+    site: str,
+    mode: str = None,
+    detector: str = "global",
+    forecast_model: str = "holt_winters",
+    horizon_hours: int = 24,
+    resolution: str = "1h",
+    full: bool = False
+) -> Dict[str, Any]:
+    """
+    Compute an insight for one site without writing it.
+
+    The global detector's baseline is the mean ± 2σ of the latest
+    INCREMENTAL_WINDOW rows, so every analysis scores that window and an
+    incremental run reports exactly what a full one would on the same
+    data; what it saves is the read when nothing was written since the
+    last analysis (status "up_to_date") and the refit, via forecast
+    parameters saved with the site's latest insight (batch workers reuse
+    the saved fit too). Stateful detectors fold in only rows past their
+    watermark, keeping the earlier anomalies still inside the window.
+    `full=True` (or no saved state) ignores the saved state and resets
+    any stateful detector; so does a change of analysis parameters, or
+    rows written at or before the watermark since the last analysis
+    (backfills, overwrites).
+
+    Returns a dict with "status" and, when there is something to save,
+    "insight", "watermark", "agg_state", "detector_state" and "rewind".
+    """
+    params = [mode, detector, forecast_model, horizon_hours, resolution]
+    rewind = load_rewind(site)
+    state = None if full else load_analysis_state(site)
+    if state is not None and (state.get("params") != params or (rewind and rewind[0] <= state["watermark"])):
+        state, full = None, True
+    if state is not None and rewind is None:
+        # Every ingest write leaves a rewind marker: nothing new since the save
+        return {"status": "up_to_date", "site": site, "detector": detector}
+
+    energy_points = read_energy_series(site, limit=INCREMENTAL_WINDOW)
+    if not len(energy_points):
+        return {
+            "status": "no_data",
+            "site": site,
+            "message": "No energy data found for site"
+        }
+    watermark = energy_points.latest_epoch
+    detector_state = None
+    if detector == "global":
+        anomalies = anomaly.detect_anomalies(energy_points)
+    elif state is None:
+        anomalies, detector_state = detect_incremental(site, detector, reset=full)
+    else:
+        new, detector_state = detect_incremental(site, detector)
+        # New rows are all past the watermark, so nothing is counted twice
+        start = int(energy_points.ts_epoch[0])
+        anomalies = [a for a in state["anomalies"] if to_epoch(a.timestamp) >= start] + new
+    analyzed = f"Analyzed {len(energy_points)} data points"
+    if state is not None:
+        fresh = int((energy_points.ts_epoch > state["watermark"]).sum())
+        analyzed += f" ({fresh} new)"
+
+    # Generate load forecast, reusing parameters fitted by the previous
+    # analysis (possibly in another process, e.g. a batch worker)
+    if state is not None and state.get("forecast"):
+        forecasting.restore_params(site, state["forecast"])
+    forecast = forecast_load(site, forecast_model, horizon_hours, resolution)
+    fitted = forecasting.fitted_params(site, forecast_model, forecasting.RESOLUTIONS[resolution])
+
+    # Generate summary
+    summary_parts = [
+        analyzed,
+        f"Detected {len(anomalies)} anomalies",
+        f"Generated {horizon_hours}h {forecast_model} forecast with {len(forecast)} points"
+    ]
+    if detector != "global":
+        summary_parts[1] += f" ({detector} detector)"
+    if mode == "gemini":
+        summary_parts.append("(Enhanced with Gemini AI)")
+
+    summary = ". ".join(summary_parts) + "."
+
+    return {
+        "status": "success",
+        "site": site,
+        "detector": detector,
+        "insight": Insight(
+            site=site,
+            created_at=datetime.utcnow().isoformat(),
+            anomalies=anomalies,
+            forecast_24h=forecast,
+            summary=summary,
+            mode=mode
+        ),
+        "watermark": watermark,
+        "agg_state": {"params": params, "forecast": fitted},
+        "detector_state": (site, detector, detector_state) if detector_state else None,
+        "rewind": (site, rewind[1]) if rewind else None
+    }
+
+
+@timed(ANALYSIS_SECONDS)
+def save_analyses(results: List[Dict[str, Any]]) -> Dict[str, int]:
+    """
+    Write computed insights (and detector states) in one transaction.
+
+    Sets each insight's id, publishes event.plan per site and returns
+    {site: insight_id}.
+    """
+    saved = [r for r in results if r.get("insight") is not None]
+    if not saved:
+        return {}
+    ids = save_insights_many(
+        [(r["insight"], r["watermark"], r["agg_state"]) for r in saved],
+        [r["detector_state"] for r in saved if r["detector_state"]],
+        [r["rewind"] for r in saved if r.get("rewind")]
+    )
+    for result, insight_id in zip(saved, ids):
+        insight = result["insight"]
+        insight.id = insight_id
+        # Publish plan event
+        publish_event("event.plan", {
+            "site": insight.site,
+            "insight_id": insight_id,
+            "anomaly_count": len(insight.anomalies),
+            "forecast_points": len(insight.forecast_24h)
+        })
+    return {r["site"]: r["insight"].id for r in saved}
+
+
+def _response(result: Dict[str, Any], mode: str = None) -> Dict[str, Any]:
+    """Shape an analyze_site result as the /analyze response."""
+    if result["status"] == "up_to_date":
+        latest = list_insights(result["site"], limit=1)[0]
+        return {
+            "status": "success",
+            "site": result["site"],
+            "insight_id": latest.id,
+            "up_to_date": True,
+            "anomalies": len(latest.anomalies),
+            "forecasted": len(latest.forecast_24h),
+            "mode": latest.mode,
+            "detector": result["detector"],
+            "insight": latest.dict()
+        }
+    if result["status"] != "success":
+        return result
+    insight = result["insight"]
+    return {
+        "status": "success",
+        "site": result["site"],
+        "insight_id": insight.id,
+        "anomalies": len(insight.anomalies),
+        "forecasted": len(insight.forecast_24h),
+        "mode": mode,
+        "detector": result["detector"],
+        "insight": insight.dict()
+    }
+
+
+def run_analysis(site: str, mode: str = None, **params) -> Dict[str, Any]:
+    """Analyze one site, save the insight and return the /analyze response."""
+    result = analyze_site(site, mode, **params)
+    save_analyses([result])
+    return _response(result, mode)
+
+
+# ============================================================================
+# Batch analysis
+# ============================================================================
+
+def _analyze_safely(site: str, params: Dict[str, Any], db_path: str) -> Dict[str, Any]:
+    # Pool workers outlive any one batch: point them at the caller's database
+    gcp.DB_PATH = type(gcp.DB_PATH)(db_path)
+    try:
+        return analyze_site(site, **params)
+    except Exception as e:
+        return {"status": "error", "site": site, "error": str(e)}
+
+
+def analyze_batch(
+    sites: Optional[List[str]] = None,
+    workers: int = BATCH_WORKERS,
+    **params
+) -> Iterator[Dict[str, Any]]:
+    """
+    Analyze many sites on a process pool, yielding per-site results as they finish.
+
+    `sites=None` means every site with energy data. Sites run on the
+    shared process pool (see aio.get_process_pool), at most `workers`
+    (clamped to the CPU count) at a time. Insights are computed in the
+    workers and written by the caller's process, BATCH_COMMIT_SIZE
+    finished sites per transaction, each write followed by a
+    {"status": "committed", "insight_ids": {site: id}} item (the last one
+    after all sites finish). Closing the generator early still writes
+    the results already received.
+    """
+    if sites is None:
+        sites = gcp.list_sites()
+    workers = aio.clamp_workers(workers)
+    pool = aio.get_process_pool()
+    db_path = str(gcp.DB_PATH)
+
+    results = []
+    pending = set()
+    queued = iter(sites)
+    try:
+        while True:
+            for site in queued:
+                pending.add(pool.submit(_analyze_safely, site, params, db_path))
+                if len(pending) >= workers:
+                    break
+            if not pending:
+                break
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                result = future.result()
+                results.append(result)
+                line = {k: v for k, v in result.items() if k in ("status", "site", "error", "message", "detector")}
+                if result.get("insight") is not None:
+                    line["anomalies"] = len(result["insight"].anomalies)
+                    line["forecasted"] = len(result["insight"].forecast_24h)
+                yield line
+            if len(results) >= BATCH_COMMIT_SIZE:
+                chunk, results = results, []
+                yield {"status": "committed", "insight_ids": save_analyses(chunk)}
+    except GeneratorExit:
+        # The client went away: keep what already finished
+        save_analyses(results)
+        raise
+
+    yield {"status": "committed", "insight_ids": save_analyses(results)}
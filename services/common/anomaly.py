@@ -0,0 +1,110 @@
+"""Vectorized anomaly detection over energy columns."""
+
+from typing import Callable, List, NamedTuple, Optional, Sequence, Tuple, Union
+import numpy as np
+from .metrics import ANALYSIS_SECONDS, timed
+from .models import Anomaly, EnergyPoint, EnergySeries
+
+
+# Severity buckets by multiple of the sample standard deviation: points
+# beyond 2σ are flagged; beyond 2.5σ are "medium"; beyond 3σ are "high".
+FLAG_SIGMA = 2.0
+MEDIUM_SIGMA = 2.5
+HIGH_SIGMA = 3.0
+SEVERITIES = np.array(["low", "medium", "high"])
+
+
+class OutlierFlags(NamedTuple):
+    """Flagged rows from one detection pass."""
+    index: np.ndarray  # positions of flagged rows, in input order
+    deviation: np.ndarray  # |kw - mean| for each flagged row
+    severity: np.ndarray  # 0=low, 1=medium, 2=high
+    mean: float
+    stdev: float
+
+
+def flag_outliers(kw: np.ndarray) -> Optional[OutlierFlags]:
+    """
+    Flag points deviating from the mean by more than 2σ in one pass.
+
+    Uses the sample standard deviation (n-1). Returns None when there are
+    fewer than 3 points or the series is constant.
+    """
+    kw = np.asarray(kw, dtype=np.float64)
+    if kw.size < 3:
+        return None
+
+    mean = float(kw.mean())
+    centered = kw - mean
+    stdev = float(np.sqrt(np.dot(centered, centered) / (kw.size - 1)))
+    return flag_against(kw, mean, stdev)
+
+
+def flag_against(kw: np.ndarray, mean: float, stdev: float) -> Optional[OutlierFlags]:
+    """Flag points beyond 2σ of a given baseline (e.g. saved running stats)."""
+    if stdev == 0:
+        return None
+    deviation = np.abs(np.asarray(kw, dtype=np.float64) - mean)
+    index = np.flatnonzero(deviation > FLAG_SIGMA * stdev)
+    flagged = deviation[index]
+    severity = (flagged > MEDIUM_SIGMA * stdev).astype(np.int8) + (flagged > HIGH_SIGMA * stdev)
+    return OutlierFlags(index, flagged, severity, mean, stdev)
+
+
+def _materialize(flags: OutlierFlags, kw: np.ndarray, timestamp_at: Callable[[int], str]) -> List[Anomaly]:
+    labels = SEVERITIES[flags.severity]
+    return [
+        Anomaly(
+            timestamp=timestamp_at(i),
+            kw=float(kw[i]),
+            expected_kw=flags.mean,
+            deviation=float(dev),
+            severity=str(label)
+        )
+        for i, dev, label in zip(flags.index.tolist(), flags.deviation, labels)
+    ]
+
+
+@timed(ANALYSIS_SECONDS)
+def detect_anomalies_arrays(timestamps: Sequence[str], kw: np.ndarray) -> List[Anomaly]:
+    """Detect anomalies from column data, materializing models only for flagged rows."""
+    kw = np.asarray(kw, dtype=np.float64)
+    flags = flag_outliers(kw)
+    if flags is None:
+        return []
+    return _materialize(flags, kw, timestamps.__getitem__)
+
+
+Readings = Union[EnergySeries, List[EnergyPoint]]
+
+
+def _columns(energy_points: Readings) -> Tuple[np.ndarray, Callable[[int], str]]:
+    """kW column and a row → timestamp lookup; an EnergySeries needs no copy."""
+    if isinstance(energy_points, EnergySeries):
+        return energy_points.kw, energy_points.timestamp
+    kw = np.fromiter((p.kw for p in energy_points), dtype=np.float64, count=len(energy_points))
+    return kw, lambda i: energy_points[i].timestamp
+
+
+@timed(ANALYSIS_SECONDS)
+def detect_anomalies(energy_points: Readings) -> List[Anomaly]:
+    """Detect anomalies using mean ± 2σ."""
+    if len(energy_points) < 3:
+        return []
+    kw, timestamp_at = _columns(energy_points)
+    flags = flag_outliers(kw)
+    if flags is None:
+        return []
+    return _materialize(flags, kw, timestamp_at)
+
+
+@timed(ANALYSIS_SECONDS)
+def detect_anomalies_against(energy_points: Readings, mean: float, stdev: float) -> List[Anomaly]:
+    """Detect anomalies against a given baseline instead of the points' own stats."""
+    if not len(energy_points):
+        return []
+    kw, timestamp_at = _columns(energy_points)
+    flags = flag_against(kw, mean, stdev)
+    if flags is None:
+        return []
+    return _materialize(flags, kw, timestamp_at)
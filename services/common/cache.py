@@ -0,0 +1,112 @@
+"""In-process LRU/TTL cache of serialized JSON responses."""
+
+import os
+import threading
+import time
+import urllib.parse
+from collections import OrderedDict
+from typing import Dict, Hashable, NamedTuple, Optional, Set, Tuple
+
+
+# Total body bytes kept before least recently used entries are evicted
+RESPONSE_CACHE_MAX_BYTES = int(os.getenv("RESPONSE_CACHE_MAX_BYTES", str(32 * 1024 * 1024)))
+
+# Seconds an entry may be served before it is rebuilt
+RESPONSE_CACHE_TTL = float(os.getenv("RESPONSE_CACHE_TTL", "60"))
+
+
+def make_etag(kind: str, site: str, limit: int, version: int) -> str:
+    """
+    Strong ETag for a listing at a given site version.
+
+    The site is percent-encoded: a quote, comma or non-ASCII character in
+    it would otherwise break the header or If-None-Match matching.
+    """
+    return f'"{kind}-{urllib.parse.quote(site, safe="")}-{limit}-{version}"'
+
+
+class CachedResponse(NamedTuple):
+    body: bytes
+    etag: str
+    version: int
+    expires: float
+
+
+class ResponseCache:
+    """
+    LRU cache of response bodies keyed by (kind, site, limit).
+
+    Each entry remembers the site version it was built from; a lookup with
+    a newer version is a miss, so writes from any process invalidate the
+    listing. `invalidate` drops a site's entries immediately for writes in
+    this process. Entries also expire after `ttl` seconds, and the least
+    recently used ones are evicted once bodies exceed `max_bytes`.
+    """
+
+    def __init__(self, max_bytes: int = RESPONSE_CACHE_MAX_BYTES, ttl: float = RESPONSE_CACHE_TTL):
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._entries: "OrderedDict[Tuple[str, str, Hashable], CachedResponse]" = OrderedDict()
+        self._by_site: Dict[Tuple[str, str], Set[Tuple[str, str, Hashable]]] = {}
+        self._lock = threading.Lock()
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def get(self, kind: str, site: str, limit: int, version: int) -> Optional[CachedResponse]:
+        key = (kind, site, limit)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry.version != version or entry.expires < time.monotonic():
+                if entry is not None:
+                    self._remove(key)
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry
+
+    def put(self, kind: str, site: str, limit: int, version: int, body: bytes) -> CachedResponse:
+        key = (kind, site, limit)
+        entry = CachedResponse(body, make_etag(kind, site, limit, version), version, time.monotonic() + self.ttl)
+        if len(body) > self.max_bytes:
+            return entry
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = entry
+            self._by_site.setdefault((kind, site), set()).add(key)
+            self.bytes += len(body)
+            while self.bytes > self.max_bytes:
+                self._remove(next(iter(self._entries)))
+                self.evictions += 1
+        return entry
+
+    def invalidate(self, kind: str, site: str):
+        """Drop every cached listing of `kind` for a site."""
+        with self._lock:
+            for key in list(self._by_site.get((kind, site), ())):
+                self._remove(key)
+                self.invalidations += 1
+
+    def _remove(self, key):
+        entry = self._entries.pop(key)
+        self.bytes -= len(entry.body)
+        keys = self._by_site[key[:2]]
+        keys.discard(key)
+        if not keys:
+            del self._by_site[key[:2]]
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "bytes": self.bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+            }
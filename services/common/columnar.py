@@ -0,0 +1,239 @@
+"""Append-only per-site columnar energy store, memory-mapped for reads."""
+
+import json
+import os
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Sequence
+from urllib.parse import quote, unquote
+import numpy as np
+
+try:
+    import fcntl
+except ImportError:  # Windows: writers are only serialized within a process
+    fcntl = None
+
+
+# Directory of the columnar store; empty disables it. When enabled, ingest
+# also appends to it and array reads are served from it (sqlite remains
+# the source of truth; `python -m common.columnar rebuild` re-exports).
+ENERGY_COLUMNAR_DIR = os.getenv("ENERGY_COLUMNAR_DIR", "")
+
+COLUMN_DTYPES = {
+    "ts_epoch": np.dtype(np.int64),
+    "kw": np.dtype(np.float64),
+    "cost_usd": np.dtype(np.float64),
+    "co2_kg": np.dtype(np.float64),
+    "temp_c": np.dtype(np.float64),
+}
+ARRAY_COLUMNS = tuple(COLUMN_DTYPES)
+
+
+def check_columns(columns: Optional[Sequence[str]]) -> List[str]:
+    """Validate requested column names (None means all)."""
+    if columns is None:
+        return list(ARRAY_COLUMNS)
+    unknown = [c for c in columns if c not in COLUMN_DTYPES]
+    if unknown:
+        raise ValueError(f"Unknown energy column(s) {', '.join(unknown)}. Choose from: {', '.join(ARRAY_COLUMNS)}")
+    return list(columns)
+
+
+class ColumnarStore:
+    """
+    One directory per site holding a raw little-endian file per column.
+
+    Appends write ts_epoch last, so the row count is always
+    size(ts_epoch) / 8 and readers never see a partially written row
+    without locking. Reads are np.memmap views: no copy and no per-row
+    objects. Optional floats are stored as NaN. While rows arrive in time
+    order (the usual case) time-range lookups are a binary search;
+    otherwise reads fall back to a sorted copy. A site is only read once
+    marked complete, i.e. known to hold every sqlite row for it (after a
+    rebuild, or when its first rows were ingested with the store enabled).
+    """
+
+    def __init__(self, root: os.PathLike):
+        self.root = Path(root)
+        self.root.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+
+    def _site_dir(self, site: str) -> Path:
+        return self.root / quote(site, safe="")
+
+    def sites(self) -> List[str]:
+        return sorted(unquote(p.name) for p in self.root.iterdir() if p.is_dir())
+
+    def rows(self, site: str) -> int:
+        path = self._site_dir(site) / "ts_epoch.bin"
+        return path.stat().st_size // 8 if path.exists() else 0
+
+    def is_sorted(self, site: str) -> bool:
+        return not (self._site_dir(site) / "unsorted").exists()
+
+    def is_complete(self, site: str) -> bool:
+        return (self._site_dir(site) / "complete").exists()
+
+    def mark_complete(self, site: str):
+        """Record that the site holds all of its sqlite rows, so reads may be served from it."""
+        with self._locked(site) as site_dir:
+            (site_dir / "complete").touch()
+
+    @contextmanager
+    def _locked(self, site: str) -> Iterator[Path]:
+        site_dir = self._site_dir(site)
+        site_dir.mkdir(exist_ok=True)
+        with self._lock, open(site_dir / ".lock", "w") as lock_file:
+            if fcntl is not None:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+            yield site_dir
+
+    def append(self, site: str, columns: Dict[str, np.ndarray]):
+        """Append rows for a site; `columns` maps every column name to equal-length arrays."""
+        ts = np.ascontiguousarray(columns["ts_epoch"], dtype=np.int64)
+        if ts.size == 0:
+            return
+        with self._locked(site) as site_dir:
+            rows = self.rows(site)
+            last = None
+            if rows:
+                last = int(np.memmap(site_dir / "ts_epoch.bin", dtype=np.int64, mode="r", offset=(rows - 1) * 8, shape=(1,))[0])
+            if (last is not None and ts[0] < last) or np.any(np.diff(ts) < 0):
+                (site_dir / "unsorted").touch()
+            for name in ARRAY_COLUMNS[1:]:
+                path = site_dir / f"{name}.bin"
+                with open(path, "ab") as f:
+                    # Drop a torn tail left by an interrupted append
+                    f.truncate(rows * 8)
+                    f.write(np.ascontiguousarray(columns[name], dtype=COLUMN_DTYPES[name]).tobytes())
+            with open(site_dir / "ts_epoch.bin", "ab") as f:
+                f.write(ts.tobytes())
+
+    def update(self, site: str, columns: Dict[str, np.ndarray]):
+        """
+        Overwrite stored rows matched on ts_epoch with new values, in place.
+
+        Rows with no stored match are appended.
+        """
+        ts = np.ascontiguousarray(columns["ts_epoch"], dtype=np.int64)
+        if ts.size == 0:
+            return
+        with self._locked(site) as site_dir:
+            rows = self.rows(site)
+            found = np.zeros(ts.size, dtype=bool)
+            if rows:
+                stored = np.memmap(site_dir / "ts_epoch.bin", dtype=np.int64, mode="r", shape=(rows,))
+                order = None if self.is_sorted(site) else np.argsort(stored, kind="stable")
+                ordered = stored if order is None else stored[order]
+                position = np.minimum(np.searchsorted(ordered, ts), rows - 1)
+                found = ordered[position] == ts
+                index = (position if order is None else order[position])[found]
+                for name in ARRAY_COLUMNS[1:]:
+                    column = np.memmap(site_dir / f"{name}.bin", dtype=COLUMN_DTYPES[name], mode="r+", shape=(rows,))
+                    column[index] = np.asarray(columns[name], dtype=COLUMN_DTYPES[name])[found]
+                    column.flush()
+        if not found.all():
+            self.append(site, {name: np.asarray(values)[~found] for name, values in columns.items()})
+
+    @staticmethod
+    def _by_site(rows: Sequence[tuple]) -> Dict[str, Dict[str, np.ndarray]]:
+        """Columns per site from gcp energy rows: (timestamp, ts_epoch, kw, site, cost_usd, co2_kg, temp_c)."""
+        by_site: Dict[str, List[tuple]] = {}
+        for row in rows:
+            by_site.setdefault(row[3], []).append(row)
+        nan = float("nan")
+        return {
+            site: {
+                "ts_epoch": np.fromiter((r[1] for r in site_rows), dtype=np.int64, count=len(site_rows)),
+                "kw": np.fromiter((r[2] for r in site_rows), dtype=np.float64, count=len(site_rows)),
+                "cost_usd": np.fromiter((nan if r[4] is None else r[4] for r in site_rows), dtype=np.float64, count=len(site_rows)),
+                "co2_kg": np.fromiter((nan if r[5] is None else r[5] for r in site_rows), dtype=np.float64, count=len(site_rows)),
+                "temp_c": np.fromiter((nan if r[6] is None else r[6] for r in site_rows), dtype=np.float64, count=len(site_rows)),
+            }
+            for site, site_rows in by_site.items()
+        }
+
+    def append_rows(self, rows: Sequence[tuple]):
+        """Append gcp energy rows: (timestamp, ts_epoch, kw, site, cost_usd, co2_kg, temp_c)."""
+        for site, columns in self._by_site(rows).items():
+            self.append(site, columns)
+
+    def update_rows(self, rows: Sequence[tuple]):
+        """Overwrite stored gcp energy rows with new values (see `update`)."""
+        for site, columns in self._by_site(rows).items():
+            self.update(site, columns)
+
+    def reset(self, site: str):
+        """Delete a site's columns and completeness marker (before a rebuild)."""
+        with self._locked(site) as site_dir:
+            for path in site_dir.iterdir():
+                if path.name != ".lock":
+                    path.unlink()
+
+    def read(
+        self,
+        site: str,
+        columns: Optional[Sequence[str]] = None,
+        limit: Optional[int] = None,
+        start_epoch: Optional[int] = None,
+        end_epoch: Optional[int] = None,
+    ) -> Optional[Dict[str, np.ndarray]]:
+        """
+        Columns for a site, oldest first, or None if the site has no rows
+        or is not marked complete.
+
+        `start_epoch`/`end_epoch` bound ts_epoch (inclusive/exclusive) and
+        `limit` keeps the latest rows within the range. Sorted sites return
+        read-only memmap views.
+        """
+        columns = check_columns(columns)
+        rows = self.rows(site)
+        if rows == 0 or not self.is_complete(site):
+            return None
+        site_dir = self._site_dir(site)
+        ts = np.memmap(site_dir / "ts_epoch.bin", dtype=np.int64, mode="r", shape=(rows,))
+
+        if self.is_sorted(site):
+            select = slice(
+                0 if start_epoch is None else int(np.searchsorted(ts, start_epoch, "left")),
+                rows if end_epoch is None else int(np.searchsorted(ts, end_epoch, "left")),
+            )
+            if limit is not None:
+                select = slice(max(select.start, select.stop - limit), select.stop)
+        else:
+            order = np.argsort(ts, kind="stable")
+            if start_epoch is not None:
+                order = order[ts[order] >= start_epoch]
+            if end_epoch is not None:
+                order = order[ts[order] < end_epoch]
+            select = order if limit is None else order[len(order) - min(limit, len(order)):]
+
+        return {
+            name: (ts if name == "ts_epoch" else np.memmap(site_dir / f"{name}.bin", dtype=COLUMN_DTYPES[name], mode="r", shape=(rows,)))[select]
+            for name in columns
+        }
+
+
+_stores: Dict[str, ColumnarStore] = {}
+
+
+def get_store(root: str = None) -> Optional[ColumnarStore]:
+    """The columnar store at `root` (default ENERGY_COLUMNAR_DIR), or None if disabled."""
+    root = ENERGY_COLUMNAR_DIR if root is None else root
+    if not root:
+        return None
+    if root not in _stores:
+        _stores[root] = ColumnarStore(root)
+    return _stores[root]
+
+
+if __name__ == "__main__":
+    # Re-export sqlite energy rows into the columnar store:
+    #   cd services && ENERGY_COLUMNAR_DIR=.mock/columnar python -m common.columnar [site ...]
+    import sys
+    from . import gcp
+
+    sites = sys.argv[1:] or None
+    for site, rows in gcp.rebuild_columnar(sites).items():
+        print(json.dumps({"site": site, "rows": rows}))
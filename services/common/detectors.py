@@ -0,0 +1,290 @@
+"""Incremental anomaly detectors with persistable running statistics."""
+
+import math
+import time
+from collections import deque
+from typing import Any, Dict, Iterable, List, Optional, Tuple, Union
+import numpy as np
+from .anomaly import FLAG_SIGMA, HIGH_SIGMA, MEDIUM_SIGMA
+from .metrics import ANALYSIS_SECONDS, timed
+from .models import Anomaly, EnergyPoint, EnergySeries
+
+
+# Points a baseline must have seen before it starts flagging
+MIN_HISTORY = 3
+
+
+def severity_for(deviation: float, stdev: float) -> Optional[str]:
+    """Severity bucket for a deviation, or None if within 2σ."""
+    if deviation <= FLAG_SIGMA * stdev:
+        return None
+    if deviation > HIGH_SIGMA * stdev:
+        return "high"
+    if deviation > MEDIUM_SIGMA * stdev:
+        return "medium"
+    return "low"
+
+
+class RunningStats:
+    """Welford running mean/variance, with removal for sliding windows."""
+
+    __slots__ = ("count", "mean", "m2")
+
+    def __init__(self, count: int = 0, mean: float = 0.0, m2: float = 0.0):
+        self.count = count
+        self.mean = mean
+        self.m2 = m2
+
+    def push(self, x: float):
+        self.count += 1
+        delta = x - self.mean
+        self.mean += delta / self.count
+        self.m2 += delta * (x - self.mean)
+
+    def pop(self, x: float):
+        if self.count <= 1:
+            self.count, self.mean, self.m2 = 0, 0.0, 0.0
+            return
+        delta = x - self.mean
+        self.count -= 1
+        self.mean -= delta / self.count
+        self.m2 = max(0.0, self.m2 - delta * (x - self.mean))
+
+    def push_many(self, values: np.ndarray):
+        """Fold in a batch at once."""
+        values = np.asarray(values, dtype=np.float64)
+        if values.size == 0:
+            return
+        batch_mean = float(values.mean())
+        self.merge(values.size, batch_mean, float(np.dot(values - batch_mean, values - batch_mean)))
+
+    def merge_moments(self, count: int, total: float, sumsq: float):
+        """Fold in a group known only by count, sum and sum of squares (e.g. a rollup row)."""
+        if count <= 0:
+            return
+        batch_mean = total / count
+        self.merge(count, batch_mean, max(0.0, sumsq - total * batch_mean))
+
+    def merge(self, count: int, mean: float, m2: float):
+        """Combine with another group's count/mean/M2 (Chan et al. parallel update)."""
+        if count <= 0:
+            return
+        total = self.count + count
+        delta = mean - self.mean
+        self.mean += delta * count / total
+        self.m2 += m2 + delta * delta * self.count * count / total
+        self.count = total
+
+    @property
+    def stdev(self) -> float:
+        """Sample standard deviation (n-1)."""
+        return math.sqrt(self.m2 / (self.count - 1)) if self.count > 1 else 0.0
+
+    def to_state(self) -> List[float]:
+        return [self.count, self.mean, self.m2]
+
+    @classmethod
+    def from_state(cls, state: List[float]) -> "RunningStats":
+        return cls(int(state[0]), state[1], state[2])
+
+
+class Detector:
+    """
+    Base class for incremental detectors.
+
+    `observe` scores a point against the baseline built from earlier
+    points, then folds it in, so each new point costs O(1). `watermark`
+    is the ts_epoch of the last observed point.
+    """
+
+    name = ""
+
+    def __init__(self, watermark: Optional[int] = None):
+        self.watermark = watermark
+
+    def baseline(self, ts_epoch: int) -> Optional[Tuple[float, float]]:
+        """Expected kW and stdev for a point at `ts_epoch`, or None while warming up."""
+        raise NotImplementedError
+
+    def update(self, ts_epoch: int, kw: float):
+        raise NotImplementedError
+
+    def observe(self, ts_epoch: int, kw: float) -> Optional[Tuple[float, float]]:
+        baseline = self.baseline(ts_epoch)
+        self.update(ts_epoch, kw)
+        self.watermark = ts_epoch
+        return baseline
+
+    def to_state(self) -> Dict[str, Any]:
+        return {"watermark": self.watermark}
+
+    @classmethod
+    def from_state(cls, state: Dict[str, Any]) -> "Detector":
+        raise NotImplementedError
+
+
+class RollingZScoreDetector(Detector):
+    """Z-score against the last `window` points."""
+
+    name = "rolling"
+
+    def __init__(self, window: int = 60, watermark: Optional[int] = None):
+        super().__init__(watermark)
+        self.window = window
+        self.values = deque(maxlen=window)
+        self.stats = RunningStats()
+
+    def baseline(self, ts_epoch):
+        if self.stats.count < MIN_HISTORY:
+            return None
+        return self.stats.mean, self.stats.stdev
+
+    def update(self, ts_epoch, kw):
+        if len(self.values) == self.window:
+            self.stats.pop(self.values[0])
+        self.values.append(kw)
+        self.stats.push(kw)
+
+    def to_state(self):
+        return {**super().to_state(), "window": self.window, "values": list(self.values)}
+
+    @classmethod
+    def from_state(cls, state):
+        detector = cls(state["window"], state["watermark"])
+        for kw in state["values"]:
+            detector.update(None, kw)
+        return detector
+
+
+class EwmaDetector(Detector):
+    """Exponentially weighted mean and variance; adapts to level shifts."""
+
+    name = "ewma"
+
+    def __init__(self, alpha: float = 0.1, watermark: Optional[int] = None):
+        super().__init__(watermark)
+        self.alpha = alpha
+        self.count = 0
+        self.mean = 0.0
+        self.var = 0.0
+
+    def baseline(self, ts_epoch):
+        if self.count < MIN_HISTORY:
+            return None
+        return self.mean, math.sqrt(self.var)
+
+    def update(self, ts_epoch, kw):
+        if self.count == 0:
+            self.mean = kw
+        else:
+            delta = kw - self.mean
+            increment = self.alpha * delta
+            self.mean += increment
+            self.var = (1 - self.alpha) * (self.var + delta * increment)
+        self.count += 1
+
+    def to_state(self):
+        return {**super().to_state(), "alpha": self.alpha, "count": self.count, "mean": self.mean, "var": self.var}
+
+    @classmethod
+    def from_state(cls, state):
+        detector = cls(state["alpha"], state["watermark"])
+        detector.count, detector.mean, detector.var = state["count"], state["mean"], state["var"]
+        return detector
+
+
+class SeasonalDetector(Detector):
+    """
+    Z-score against a per-slot baseline: hour of day (24 slots) or hour of
+    week (168 slots), so a spike at night is judged against other nights.
+    """
+
+    def __init__(self, slots: int, watermark: Optional[int] = None):
+        super().__init__(watermark)
+        self.slots = slots
+        self.stats = [RunningStats() for _ in range(slots)]
+
+    @property
+    def name(self):
+        return "seasonal_week" if self.slots == 168 else "seasonal_hour"
+
+    def _slot(self, ts_epoch: int) -> int:
+        tm = time.gmtime(ts_epoch)
+        return (tm.tm_wday * 24 + tm.tm_hour) % self.slots
+
+    def baseline(self, ts_epoch):
+        stats = self.stats[self._slot(ts_epoch)]
+        if stats.count < MIN_HISTORY:
+            return None
+        return stats.mean, stats.stdev
+
+    def update(self, ts_epoch, kw):
+        self.stats[self._slot(ts_epoch)].push(kw)
+
+    def seed(self, rollups: Dict[str, np.ndarray]):
+        """
+        Warm the slot baselines from hourly rollups (see gcp.read_rollups).
+
+        Every hourly bucket falls in exactly one slot, so a site's whole
+        history seeds the baselines from one row per hour instead of
+        replaying raw readings.
+        """
+        for bucket, count, total, sumsq in zip(
+            rollups["bucket"].tolist(), rollups["kw_count"].tolist(),
+            rollups["kw_sum"].tolist(), rollups["kw_sumsq"].tolist()
+        ):
+            self.stats[self._slot(bucket)].merge_moments(count, total, sumsq)
+
+    def to_state(self):
+        return {**super().to_state(), "slots": self.slots, "stats": [s.to_state() for s in self.stats]}
+
+    @classmethod
+    def from_state(cls, state):
+        detector = cls(state["slots"], state["watermark"])
+        detector.stats = [RunningStats.from_state(s) for s in state["stats"]]
+        return detector
+
+
+DETECTORS = {
+    "rolling": lambda: RollingZScoreDetector(),
+    "ewma": lambda: EwmaDetector(),
+    "seasonal_hour": lambda: SeasonalDetector(24),
+    "seasonal_week": lambda: SeasonalDetector(168),
+}
+
+_STATE_LOADERS = {
+    "rolling": RollingZScoreDetector.from_state,
+    "ewma": EwmaDetector.from_state,
+    "seasonal_hour": SeasonalDetector.from_state,
+    "seasonal_week": SeasonalDetector.from_state,
+}
+
+
+def create_detector(name: str, state: Optional[Dict[str, Any]] = None) -> Detector:
+    """Build a detector by name, restoring persisted state when given."""
+    if name not in DETECTORS:
+        raise ValueError(f"Unknown detector '{name}'. Choose from: {', '.join(DETECTORS)}")
+    return _STATE_LOADERS[name](state) if state else DETECTORS[name]()
+
+
+@timed(ANALYSIS_SECONDS)
+def run_detector(detector: Detector, energy_points: Union[EnergySeries, Iterable[EnergyPoint]]) -> List[Anomaly]:
+    """Feed readings (oldest first) through a detector, returning flagged anomalies."""
+    series = energy_points if isinstance(energy_points, EnergySeries) else EnergySeries.from_points(list(energy_points))
+    anomalies = []
+    for i, (ts_epoch, kw) in enumerate(zip(series.ts_epoch.tolist(), series.kw.tolist())):
+        baseline = detector.observe(ts_epoch, kw)
+        if baseline is None:
+            continue
+        expected, stdev = baseline
+        deviation = abs(kw - expected)
+        severity = severity_for(deviation, stdev) if stdev > 0 else None
+        if severity:
+            anomalies.append(Anomaly(
+                timestamp=series.timestamp(i),
+                kw=kw,
+                expected_kw=expected,
+                deviation=deviation,
+                severity=severity
+            ))
+    return anomalies
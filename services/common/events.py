@@ -0,0 +1,422 @@
+"""Local event bus: bounded per-topic logs with asyncio subscribers."""
+
+import asyncio
+import json
+import os
+import threading
+import time
+from collections import deque
+from typing import Any, Callable, Dict, List, NamedTuple, Optional, Sequence
+from .storage import Storage
+
+
+# Events buffered per topic. A publisher blocks (up to EVENT_PUBLISH_TIMEOUT)
+# once the slowest subscriber lags this far behind; after that, or when
+# publishing from an event loop thread, the oldest unread events are dropped.
+EVENT_QUEUE_SIZE = int(os.getenv("EVENT_QUEUE_SIZE", "1024"))
+EVENT_PUBLISH_TIMEOUT = float(os.getenv("EVENT_PUBLISH_TIMEOUT", "1.0"))
+
+# "memory" (subscribers in this process) or "sqlite" (subscribers in any
+# process sharing the database)
+EVENT_BACKEND = os.getenv("EVENT_BACKEND", "memory")
+
+# Most events handed to a subscriber at once; sqlite publishes are also
+# written in batches of this size, or after EVENT_FLUSH_INTERVAL seconds
+EVENT_BATCH_SIZE = int(os.getenv("EVENT_BATCH_SIZE", "256"))
+EVENT_FLUSH_INTERVAL = float(os.getenv("EVENT_FLUSH_INTERVAL", "0.01"))
+
+# sqlite backend: subscriber poll interval and events kept in the table
+EVENT_POLL_INTERVAL = float(os.getenv("EVENT_POLL_INTERVAL", "0.05"))
+EVENT_RETENTION = int(os.getenv("EVENT_RETENTION", "100000"))
+
+
+class Event(NamedTuple):
+    seq: int
+    topic: str
+    data: Dict[str, Any]
+    published_at: float  # time.time() at publish
+
+
+def _on_event_loop() -> bool:
+    try:
+        asyncio.get_running_loop()
+        return True
+    except RuntimeError:
+        return False
+
+
+# ============================================================================
+# In-process bus
+# ============================================================================
+
+class _TopicLog:
+    """Fixed-size ring of a topic's latest events, addressed by offset."""
+
+    __slots__ = ("ring", "capacity", "end")
+
+    def __init__(self, capacity: int):
+        self.ring: List[Optional[Event]] = [None] * capacity
+        self.capacity = capacity
+        self.end = 0  # offset of the next event
+
+    @property
+    def start(self) -> int:
+        return max(0, self.end - self.capacity)
+
+    def append(self, event: Event):
+        self.ring[self.end % self.capacity] = event
+        self.end += 1
+
+
+class Subscription:
+    """
+    A subscriber's cursor into one or more topics.
+
+    Only events published after subscribing are delivered. `dropped`
+    counts events overwritten before this subscriber read them; a
+    subscriber that let a publisher time out is `stalled` and no longer
+    holds publishers back until it reads again.
+    """
+
+    def __init__(self, bus: "EventBus", topics: Sequence[str], offsets: Dict[str, int]):
+        self.bus = bus
+        self.topics = list(topics)
+        self.offsets = offsets
+        self.loop = asyncio.get_running_loop()
+        self.dropped = 0
+        self.stalled = False
+        self._wake = asyncio.Event()
+        self._wake_scheduled = False
+
+    async def get_batch(self, max_items: int = EVENT_BATCH_SIZE) -> List[Event]:
+        """Wait for at least one event; return up to `max_items`, oldest first."""
+        while True:
+            self._wake.clear()
+            events = self.bus._read(self, max_items)
+            if events:
+                return events
+            await self._wake.wait()
+
+    async def __aiter__(self):
+        while True:
+            for event in await self.get_batch():
+                yield event
+
+    def close(self):
+        self.bus._unsubscribe(self)
+
+
+class EventBus:
+    """
+    In-process publish/subscribe over bounded per-topic logs.
+
+    `publish` is synchronous and thread-safe, so request handlers and
+    storage pool threads can call it directly. Each subscriber keeps an
+    offset into the shared log instead of its own copy of every message,
+    and a burst of publishes wakes a waiting subscriber once.
+    """
+
+    def __init__(self, queue_size: int = EVENT_QUEUE_SIZE, publish_timeout: float = EVENT_PUBLISH_TIMEOUT):
+        self.queue_size = queue_size
+        self.publish_timeout = publish_timeout
+        self._logs: Dict[str, _TopicLog] = {}
+        self._subscribers: Dict[str, List[Subscription]] = {}
+        self._cond = threading.Condition()
+        self._seq = 0
+        self.published = 0
+        self.blocked = 0
+
+    def _log(self, topic: str) -> _TopicLog:
+        log = self._logs.get(topic)
+        if log is None:
+            log = self._logs[topic] = _TopicLog(self.queue_size)
+        return log
+
+    def _lagging(self, topic: str, log: _TopicLog) -> bool:
+        return any(
+            log.end - sub.offsets[topic] >= log.capacity and not sub.stalled
+            for sub in self._subscribers.get(topic, ())
+        )
+
+    def publish(self, topic: str, data: Dict[str, Any]) -> Event:
+        """Append an event; blocks briefly while subscribers lag (see EVENT_QUEUE_SIZE)."""
+        to_wake = []
+        with self._cond:
+            log = self._log(topic)
+            if self._lagging(topic, log) and not _on_event_loop():
+                self.blocked += 1
+                if not self._cond.wait_for(lambda: not self._lagging(topic, log), self.publish_timeout):
+                    for sub in self._subscribers[topic]:
+                        if log.end - sub.offsets[topic] >= log.capacity:
+                            sub.stalled = True
+            self._seq += 1
+            event = Event(self._seq, topic, data, time.time())
+            log.append(event)
+            self.published += 1
+            for sub in self._subscribers.get(topic, ()):
+                if not sub._wake_scheduled:
+                    sub._wake_scheduled = True
+                    to_wake.append(sub)
+        for sub in to_wake:
+            sub.loop.call_soon_threadsafe(sub._wake.set)
+        return event
+
+    async def publish_async(self, topic: str, data: Dict[str, Any]) -> Event:
+        """Publish from a coroutine, awaiting (not blocking the loop) while subscribers lag."""
+        with self._cond:
+            lagging = self._lagging(topic, self._log(topic))
+        if lagging:
+            return await asyncio.get_running_loop().run_in_executor(None, self.publish, topic, data)
+        return self.publish(topic, data)
+
+    def subscribe(self, topics: Sequence[str], name: Optional[str] = None) -> Subscription:
+        """Subscribe the running event loop to `topics` (`name` is unused in-process)."""
+        if isinstance(topics, str):
+            topics = [topics]
+        with self._cond:
+            sub = Subscription(self, topics, {topic: self._log(topic).end for topic in topics})
+            for topic in topics:
+                self._subscribers.setdefault(topic, []).append(sub)
+        return sub
+
+    def _unsubscribe(self, sub: Subscription):
+        with self._cond:
+            for topic in sub.topics:
+                self._subscribers[topic].remove(sub)
+            self._cond.notify_all()
+
+    def _read(self, sub: Subscription, max_items: int) -> List[Event]:
+        with self._cond:
+            events = []
+            for topic in sub.topics:
+                log = self._logs[topic]
+                offset = sub.offsets[topic]
+                if offset < log.start:
+                    sub.dropped += log.start - offset
+                    offset = sub.offsets[topic] = log.start
+                end = min(log.end, offset + max_items)
+                events.extend(log.ring[i % log.capacity] for i in range(offset, end))
+            if not events:
+                sub._wake_scheduled = False
+                return events
+            if len(sub.topics) > 1:
+                events.sort(key=lambda e: e.seq)
+                del events[max_items:]
+            for event in events:
+                sub.offsets[event.topic] += 1
+            sub.stalled = False
+            self._cond.notify_all()
+            return events
+
+    def stats(self) -> Dict[str, Any]:
+        with self._cond:
+            return {
+                "backend": "memory",
+                "published": self.published,
+                "blocked_publishes": self.blocked,
+                "topics": {
+                    topic: {
+                        "buffered": log.end - log.start,
+                        "subscribers": len(self._subscribers.get(topic, ())),
+                        "max_lag": max((log.end - s.offsets[topic] for s in self._subscribers.get(topic, ())), default=0),
+                        "dropped": sum(s.dropped for s in self._subscribers.get(topic, ())),
+                    }
+                    for topic, log in self._logs.items()
+                },
+            }
+
+
+# ============================================================================
+# Cross-process stand-in (sqlite)
+# ============================================================================
+
+_INSERT_EVENT_SQL = """
+    INSERT INTO events (topic, data_json, published_at) VALUES (?, ?, ?)
+"""
+
+_READ_EVENTS_SQL = """
+    SELECT seq, topic, data_json, published_at FROM events
+    WHERE seq > ? AND topic IN ({topics})
+    ORDER BY seq
+    LIMIT ?
+"""
+
+_MAX_SEQ_SQL = "SELECT COALESCE(MAX(seq), 0) FROM events"
+
+_LOAD_CURSOR_SQL = "SELECT seq FROM event_cursors WHERE consumer = ?"
+
+_SAVE_CURSOR_SQL = """
+    INSERT INTO event_cursors (consumer, seq, updated_at) VALUES (?, ?, ?)
+    ON CONFLICT (consumer) DO UPDATE SET seq = excluded.seq, updated_at = excluded.updated_at
+"""
+
+# Named consumers seen within this many seconds count towards backpressure
+_ACTIVE_CONSUMER_SQL = """
+    SELECT MIN(seq) FROM event_cursors WHERE updated_at >= ?
+"""
+
+_TRIM_EVENTS_SQL = "DELETE FROM events WHERE seq <= ?"
+
+_CONSUMER_TIMEOUT = 30.0
+
+
+class SqliteSubscription:
+    """Polling subscriber over the events table; named ones persist their cursor."""
+
+    def __init__(self, bus: "SqliteEventBus", topics: Sequence[str], name: Optional[str]):
+        self.bus = bus
+        self.topics = list(topics)
+        self.name = name
+        self.cursor = bus._start_cursor(name)
+        self.saved_at = 0.0
+
+    async def get_batch(self, max_items: int = EVENT_BATCH_SIZE) -> List[Event]:
+        loop = asyncio.get_running_loop()
+        while True:
+            events = await loop.run_in_executor(None, self.bus._read, self, max_items)
+            if events:
+                return events
+            await asyncio.sleep(self.bus.poll_interval)
+
+    async def __aiter__(self):
+        while True:
+            for event in await self.get_batch():
+                yield event
+
+    def close(self):
+        pass
+
+
+class SqliteEventBus:
+    """
+    Event bus over an `events` table, for subscribers in other processes.
+
+    Publishes are buffered and written in one transaction per
+    EVENT_BATCH_SIZE events or EVENT_FLUSH_INTERVAL seconds, the latter
+    by one long-lived flusher thread (and so one pooled connection). Named
+    subscribers store their cursor in `event_cursors`, resume after a
+    restart and hold back flushes while they lag EVENT_QUEUE_SIZE behind.
+    """
+
+    def __init__(
+        self,
+        get_storage: Callable[[], Storage],
+        queue_size: int = EVENT_QUEUE_SIZE,
+        batch_size: int = EVENT_BATCH_SIZE,
+        flush_interval: float = EVENT_FLUSH_INTERVAL,
+        poll_interval: float = EVENT_POLL_INTERVAL,
+        retention: int = EVENT_RETENTION,
+        publish_timeout: float = EVENT_PUBLISH_TIMEOUT,
+    ):
+        self.get_storage = get_storage
+        self.queue_size = queue_size
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.poll_interval = poll_interval
+        self.retention = retention
+        self.publish_timeout = publish_timeout
+        # Bounded: once full, appending drops the oldest event
+        self._buffer: deque = deque(maxlen=queue_size)
+        self._cond = threading.Condition()
+        self._flush_lock = threading.Lock()
+        self._flusher: Optional[threading.Thread] = None
+        self.published = 0
+        self.dropped = 0
+        self.blocked = 0
+
+    def publish(self, topic: str, data: Dict[str, Any]):
+        flush_now = False
+        with self._cond:
+            if len(self._buffer) >= self.queue_size:
+                if not _on_event_loop():
+                    self.blocked += 1
+                    self._cond.wait_for(lambda: len(self._buffer) < self.queue_size, self.publish_timeout)
+                if len(self._buffer) >= self.queue_size:
+                    self.dropped += 1
+            self._buffer.append((topic, json.dumps(data), time.time()))
+            self.published += 1
+            if len(self._buffer) >= self.batch_size and not _on_event_loop():
+                flush_now = True
+            elif len(self._buffer) == 1:
+                # Not alive in a forked child: start one there too
+                if self._flusher is None or not self._flusher.is_alive():
+                    self._flusher = threading.Thread(target=self._flush_loop, name="event-flusher", daemon=True)
+                    self._flusher.start()
+                self._cond.notify_all()
+        if flush_now:
+            self.flush()
+
+    def _flush_loop(self):
+        """Flush EVENT_FLUSH_INTERVAL after the buffer becomes non-empty."""
+        while True:
+            with self._cond:
+                self._cond.wait_for(lambda: self._buffer)
+            time.sleep(self.flush_interval)
+            self.flush()
+
+    async def publish_async(self, topic: str, data: Dict[str, Any]):
+        await asyncio.get_running_loop().run_in_executor(None, self.publish, topic, data)
+
+    def flush(self):
+        """Write buffered events in one transaction, waiting briefly for lagging consumers."""
+        with self._flush_lock:
+            with self._cond:
+                rows = list(self._buffer)
+                self._buffer.clear()
+            if not rows:
+                return
+            storage = self.get_storage()
+            conn = storage.connection()
+            deadline = time.monotonic() + self.publish_timeout
+            while time.monotonic() < deadline:
+                slowest = conn.execute(_ACTIVE_CONSUMER_SQL, (time.time() - _CONSUMER_TIMEOUT,)).fetchone()[0]
+                if slowest is None or conn.execute(_MAX_SEQ_SQL).fetchone()[0] - slowest < self.queue_size:
+                    break
+                time.sleep(self.poll_interval)
+            with storage.transaction() as conn:
+                conn.executemany(_INSERT_EVENT_SQL, rows)
+                max_seq = conn.execute(_MAX_SEQ_SQL).fetchone()[0]
+                # Trim roughly once per batch_size events
+                if max_seq % self.batch_size < len(rows):
+                    conn.execute(_TRIM_EVENTS_SQL, (max_seq - self.retention,))
+            with self._cond:
+                self._cond.notify_all()
+
+    def subscribe(self, topics: Sequence[str], name: Optional[str] = None) -> SqliteSubscription:
+        """Subscribe to `topics`; a `name` resumes from that consumer's stored cursor."""
+        if isinstance(topics, str):
+            topics = [topics]
+        return SqliteSubscription(self, topics, name)
+
+    def _start_cursor(self, name: Optional[str]) -> int:
+        conn = self.get_storage().connection()
+        if name is not None:
+            row = conn.execute(_LOAD_CURSOR_SQL, (name,)).fetchone()
+            if row is not None:
+                return row[0]
+        return conn.execute(_MAX_SEQ_SQL).fetchone()[0]
+
+    def _read(self, sub: SqliteSubscription, max_items: int) -> List[Event]:
+        storage = self.get_storage()
+        sql = _READ_EVENTS_SQL.format(topics=", ".join("?" * len(sub.topics)))
+        rows = storage.connection().execute(sql, (sub.cursor, *sub.topics, max_items)).fetchall()
+        events = [Event(row[0], row[1], json.loads(row[2]), row[3]) for row in rows]
+        if events:
+            sub.cursor = events[-1].seq
+        # The saved cursor doubles as a heartbeat for backpressure
+        now = time.time()
+        if sub.name is not None and (events or now - sub.saved_at >= 1.0):
+            with storage.transaction() as conn:
+                conn.execute(_SAVE_CURSOR_SQL, (sub.name, sub.cursor, now))
+            sub.saved_at = now
+        return events
+
+    def stats(self) -> Dict[str, Any]:
+        with self._cond:
+            return {
+                "backend": "sqlite",
+                "published": self.published,
+                "buffered": len(self._buffer),
+                "dropped": self.dropped,
+                "blocked_publishes": self.blocked,
+            }
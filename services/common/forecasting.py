@@ -0,0 +1,305 @@
+"""Load forecasting: seasonal-naive, Holt-Winters and ridge models fitted in batch."""
+
+import math
+import os
+import threading
+from collections import OrderedDict
+from datetime import datetime, timezone
+from itertools import product
+from typing import Any, Dict, List, NamedTuple, Optional, Sequence, Tuple
+import numpy as np
+from .metrics import ANALYSIS_SECONDS, timed
+from .models import ForecastPoint
+
+
+MODELS = ("naive", "seasonal_naive", "holt_winters", "ridge")
+RESOLUTIONS = {"15m": 900, "1h": 3600, "1d": 86400}
+
+# History used for fitting, in seasons (days for sub-daily resolutions,
+# weeks for daily)
+HISTORY_SEASONS = int(os.getenv("FORECAST_HISTORY_SEASONS", "8"))
+
+# Cached parameters are reused until this many seasons of new data arrive
+REFIT_SEASONS = float(os.getenv("FORECAST_REFIT_SEASONS", "1"))
+
+# Fitted parameter sets kept in memory; least recently used are dropped
+PARAM_CACHE_SIZE = int(os.getenv("FORECAST_PARAM_CACHE_SIZE", "10000"))
+
+# Holt-Winters (alpha, beta, gamma) search grid
+HW_GRID = np.array(list(product((0.1, 0.3, 0.5, 0.8), (0.0, 0.05), (0.05, 0.2, 0.4))))
+
+RIDGE_LAMBDA = 1.0
+
+
+class SiteSeries(NamedTuple):
+    """Regularly spaced history for one site."""
+    start_epoch: int  # epoch of the first bucket
+    kw: np.ndarray
+    temp: np.ndarray  # NaN where unknown
+
+
+class FittedParams(NamedTuple):
+    params: np.ndarray
+    fitted_through: int  # epoch of the last bucket used to fit
+
+
+# (site, model, resolution) -> FittedParams, in LRU order
+_param_cache: "OrderedDict[Tuple[str, str, int], FittedParams]" = OrderedDict()
+_param_lock = threading.Lock()
+
+
+def _cache_get(key: Tuple[str, str, int]) -> Optional[FittedParams]:
+    with _param_lock:
+        entry = _param_cache.get(key)
+        if entry is not None:
+            _param_cache.move_to_end(key)
+        return entry
+
+
+def _cache_put(key: Tuple[str, str, int], entry: FittedParams):
+    with _param_lock:
+        _param_cache[key] = entry
+        _param_cache.move_to_end(key)
+        while len(_param_cache) > PARAM_CACHE_SIZE:
+            _param_cache.popitem(last=False)
+
+
+def fitted_params(site: str, model: str, resolution: int) -> Optional[Dict[str, Any]]:
+    """A site's cached fit as JSON-ready state (see restore_params), or None if not fitted."""
+    entry = _cache_get((site, model, resolution))
+    if entry is None:
+        return None
+    return {
+        "model": model,
+        "resolution": resolution,
+        "params": entry.params.tolist(),
+        "fitted_through": entry.fitted_through,
+    }
+
+
+def restore_params(site: str, state: Dict[str, Any]):
+    """
+    Seed the cache from fitted_params output saved elsewhere (e.g. in
+    another process), unless a fit at least as recent is already cached.
+    """
+    key = (site, state["model"], state["resolution"])
+    cached = _cache_get(key)
+    if cached is None or cached.fitted_through < state["fitted_through"]:
+        _cache_put(key, FittedParams(np.array(state["params"], dtype=np.float64), state["fitted_through"]))
+
+
+def season_length(resolution: int) -> int:
+    """Steps per season: one day for sub-daily resolutions, one week for daily."""
+    return 7 if resolution >= 86400 else 86400 // resolution
+
+
+def history_seconds(resolution: int) -> int:
+    return HISTORY_SEASONS * season_length(resolution) * resolution
+
+
+def to_series(buckets: Sequence[Tuple[int, float, Optional[float]]], resolution: int) -> Optional[SiteSeries]:
+    """
+    Build a regular grid from (bucket_epoch, avg_kw, avg_temp) rows, oldest first.
+
+    Empty buckets carry the previous value forward.
+    """
+    if not buckets:
+        return None
+    epochs = np.fromiter((b[0] for b in buckets), dtype=np.int64, count=len(buckets))
+    kw = np.fromiter((b[1] for b in buckets), dtype=np.float64, count=len(buckets))
+    temp = np.fromiter((np.nan if b[2] is None else b[2] for b in buckets), dtype=np.float64, count=len(buckets))
+
+    start = int(epochs[0])
+    slots = ((epochs - start) // resolution).astype(np.int64)
+    grid_kw = np.full(int(slots[-1]) + 1, np.nan)
+    grid_temp = np.full_like(grid_kw, np.nan)
+    grid_kw[slots] = kw
+    grid_temp[slots] = temp
+
+    # Forward-fill gaps
+    filled = np.where(np.isnan(grid_kw), 0, np.arange(grid_kw.size))
+    np.maximum.accumulate(filled, out=filled)
+    return SiteSeries(start, grid_kw[filled], grid_temp)
+
+
+# ============================================================================
+# Models (all operate on a (sites, T) matrix)
+# ============================================================================
+
+def _seasonal_naive(y: np.ndarray, m: int, horizon: int) -> np.ndarray:
+    last_season = y[:, -m:]
+    reps = math.ceil(horizon / m)
+    return np.tile(last_season, (1, reps))[:, :horizon]
+
+
+def _holt_winters_run(y: np.ndarray, m: int, alpha, beta, gamma):
+    """
+    Additive Holt-Winters over rows of `y`.
+
+    alpha/beta/gamma broadcast against the row axis, so one call evaluates
+    a whole parameter grid for every site. Returns (sse, level, trend, season).
+    """
+    level = y[..., :m].mean(axis=-1)
+    trend = (y[..., m:2 * m].mean(axis=-1) - level) / m
+    season = y[..., :m] - level[..., None]
+    season = np.broadcast_to(season, np.broadcast(alpha, level).shape + (m,)).copy()
+    level = np.broadcast_to(level, season.shape[:-1]).copy()
+    trend = np.broadcast_to(trend, season.shape[:-1]).copy()
+    sse = np.zeros_like(level)
+
+    for t in range(m, y.shape[-1]):
+        obs = y[..., t]
+        s = season[..., t % m]
+        err = obs - (level + trend + s)
+        sse += err * err
+        new_level = alpha * (obs - s) + (1 - alpha) * (level + trend)
+        trend = beta * (new_level - level) + (1 - beta) * trend
+        season[..., t % m] = gamma * (obs - new_level) + (1 - gamma) * s
+        level = new_level
+    return sse, level, trend, season
+
+
+def _holt_winters_fit(y: np.ndarray, m: int) -> np.ndarray:
+    """Grid-search (alpha, beta, gamma) per site; returns (sites, 3)."""
+    a, b, g = (HW_GRID[:, i][:, None] for i in range(3))
+    sse, _, _, _ = _holt_winters_run(y[None, :, :], m, a, b, g)
+    return HW_GRID[np.argmin(sse, axis=0)]
+
+
+def _holt_winters_forecast(y: np.ndarray, m: int, params: np.ndarray, horizon: int) -> np.ndarray:
+    alpha, beta, gamma = (params[:, i] for i in range(3))
+    _, level, trend, season = _holt_winters_run(y, m, alpha, beta, gamma)
+    steps = np.arange(1, horizon + 1)
+    season_idx = (y.shape[-1] + steps - 1) % m
+    return level[:, None] + trend[:, None] * steps + season[:, season_idx]
+
+
+def _ridge_features(y_lag1, y_lagm, temp, phase, m: int) -> np.ndarray:
+    angle = 2 * np.pi * phase / m
+    ones = np.ones_like(y_lag1)
+    return np.stack([ones, y_lag1, y_lagm, temp, np.sin(angle), np.cos(angle)], axis=-1)
+
+
+def _ridge_fit(y: np.ndarray, temp: np.ndarray, phase: np.ndarray, m: int) -> np.ndarray:
+    """Batched ridge on lag-1, lag-season, temperature and time of season; returns (sites, k)."""
+    X = _ridge_features(y[:, m - 1:-1], y[:, :-m], temp[:, m:], phase[:, m:], m)
+    target = y[:, m:]
+    k = X.shape[-1]
+    penalty = RIDGE_LAMBDA * np.eye(k)
+    penalty[0, 0] = 0.0
+    xtx = np.einsum("snk,snj->skj", X, X) + penalty
+    xty = np.einsum("snk,sn->sk", X, target)
+    return np.linalg.solve(xtx, xty[..., None])[..., 0]
+
+
+def _ridge_forecast(y, temp, phase, m: int, beta: np.ndarray, horizon: int) -> np.ndarray:
+    T = y.shape[-1]
+    y_ext = np.concatenate([y, np.zeros((y.shape[0], horizon))], axis=1)
+    # Future temperature is unknown: repeat the last season
+    temp_ext = np.concatenate([temp, _seasonal_naive(temp, m, horizon)], axis=1)
+    for h in range(horizon):
+        t = T + h
+        features = _ridge_features(y_ext[:, t - 1], y_ext[:, t - m], temp_ext[:, t], phase[:, -1] + h + 1, m)
+        y_ext[:, t] = np.einsum("sk,sk->s", features, beta)
+    return y_ext[:, T:]
+
+
+# ============================================================================
+# Batched entry point
+# ============================================================================
+
+def _timestamps(series: SiteSeries, resolution: int, horizon: int) -> List[str]:
+    last = series.start_epoch + (series.kw.size - 1) * resolution
+    return [
+        datetime.fromtimestamp(last + (h + 1) * resolution, tz=timezone.utc).isoformat()
+        for h in range(horizon)
+    ]
+
+
+def _effective_model(model: str, length: int, m: int) -> str:
+    """Fall back to simpler models when history is too short."""
+    if model in ("holt_winters", "ridge") and length < 2 * m:
+        model = "seasonal_naive"
+    if model == "seasonal_naive" and length < m:
+        model = "naive"
+    return model
+
+
+@timed(ANALYSIS_SECONDS)
+def forecast_many(
+    series: Dict[str, SiteSeries],
+    model: str = "holt_winters",
+    horizon: int = 24,
+    resolution: int = 3600,
+) -> Dict[str, List[ForecastPoint]]:
+    """
+    Forecast `horizon` steps for many sites at once.
+
+    Sites are grouped by effective model and history length, and each group
+    is fitted in one vectorized call. Fitted parameters are cached per
+    (site, model, resolution) and reused until REFIT_SEASONS of new data.
+    """
+    if model not in MODELS:
+        raise ValueError(f"Unknown forecast model '{model}'. Choose from: {', '.join(MODELS)}")
+    m = season_length(resolution)
+    cap = HISTORY_SEASONS * m
+
+    groups: Dict[Tuple[str, int], List[str]] = {}
+    for site, s in series.items():
+        length = min(s.kw.size, cap)
+        groups.setdefault((_effective_model(model, length, m), length), []).append(site)
+
+    results: Dict[str, List[ForecastPoint]] = {}
+    for (group_model, length), sites in groups.items():
+        y = np.stack([series[site].kw[-length:] for site in sites])
+        if group_model == "naive":
+            predicted = np.repeat(y[:, -1:], horizon, axis=1)
+        elif group_model == "seasonal_naive":
+            predicted = _seasonal_naive(y, m, horizon)
+        else:
+            ends = [series[site].start_epoch + (series[site].kw.size - 1) * resolution for site in sites]
+            temp = phase = None
+            if group_model == "ridge":
+                temp = np.stack([series[site].temp[-length:] for site in sites])
+                temp = np.where(np.isnan(temp), np.nanmean(temp, axis=1, keepdims=True), temp)
+                temp = np.nan_to_num(temp)
+                phase = np.stack([
+                    (np.arange(end - (length - 1) * resolution, end + 1, resolution) // resolution) % m
+                    for end in ends
+                ]).astype(np.float64)
+            params = _cached_params(sites, group_model, resolution, ends, m, y, temp, phase)
+            if group_model == "holt_winters":
+                predicted = _holt_winters_forecast(y, m, params, horizon)
+            else:
+                predicted = _ridge_forecast(y, temp, phase, m, params, horizon)
+
+        predicted = np.maximum(predicted, 0.0)
+        for row, site in enumerate(sites):
+            results[site] = [
+                ForecastPoint(timestamp=ts, kw=float(kw))
+                for ts, kw in zip(_timestamps(series[site], resolution, horizon), predicted[row])
+            ]
+    return results
+
+
+def _cached_params(sites, model, resolution, ends, m, y, temp, phase) -> np.ndarray:
+    refit_after = REFIT_SEASONS * m * resolution
+    entries = [_cache_get((site, model, resolution)) for site in sites]
+    stale = [
+        i for i, (entry, end) in enumerate(zip(entries, ends))
+        if entry is None or end - entry.fitted_through >= refit_after
+    ]
+    if stale:
+        if model == "holt_winters":
+            fitted = _holt_winters_fit(y[stale], m)
+        else:
+            fitted = _ridge_fit(y[stale], temp[stale], phase[stale], m)
+        for row, i in enumerate(stale):
+            entries[i] = FittedParams(fitted[row], ends[i])
+            _cache_put((sites[i], model, resolution), entries[i])
+    return np.stack([entry.params for entry in entries])
+
+
+def clear_param_cache():
+    with _param_lock:
+        _param_cache.clear()
@@ -1,244 +1,1285 @@
 """Mock GCP services for local development (MOCK=1)."""
 
 import os
-import sqlite3
 import json
-from datetime import datetime
+import logging
+import sqlite3
+import uuid
+from itertools import chain, islice
 from pathlib import Path
-from typing import List, Optional, Dict, Any
-from .models import EnergyPoint, Insight, Plan, Anomaly, ForecastPoint, PlanItem
+from datetime import datetime, timezone
+from typing import List, Optional, Dict, Any, Callable, Iterable, NamedTuple, Sequence, Set, Tuple, Union
+from .models import AnswerContext, EnergyPoint, EnergySeries, Insight, InsightHeader, LeaderboardEntry, Plan, PlanHeader
+from .payloads import insight_columns, parse_severities, plan_columns, unpack_insight_details, unpack_plan_items
+from .schema import (
+    ENERGY_PARTITIONING, ENERGY_TABLE, ENERGY_VIEW, ROLLUP_COLUMNS, ROLLUP_METRICS, ROLLUP_SECONDS,
+    ensure_partitions, leaderboard_totals_sql, migrate, partition_for, rollup_table, to_epoch
+)
+import numpy as np
+from .columnar import check_columns, get_store
+from .rollups import AGGREGATES, BUCKET_SECONDS, ROLLUP_AGGREGATES, aggregate_arrays, apply_rollups, refresh_rollups, uses_rollup
+from .events import EVENT_BACKEND, EventBus, SqliteEventBus
+from .metrics import INGEST_ROWS, READ_ROWS, STORAGE_SECONDS, counter, gauge, timed
+from .storage import Storage
+
+
+logger = logging.getLogger(__name__)
 
+# Row counter children, looked up once for the read paths
+_ROWS_READ = {source: READ_ROWS.labels(source) for source in ("sqlite", "columnar")}
 
 MOCK = os.getenv("MOCK", "0") == "1"
-DB_PATH = Path(".mock/ecopulse.db")
-DB_PATH.parent.mkdir(exist_ok=True)
+DB_PATH = Path(os.getenv("ECOPULSE_DB_PATH", ".mock/ecopulse.db"))
+DB_PATH.parent.mkdir(parents=True, exist_ok=True)
+
+# Rows per transaction for bulk ingest
+INGEST_CHUNK_SIZE = int(os.getenv("INGEST_CHUNK_SIZE", "5000"))
+
+# What ingest does with a reading whose (site, timestamp) is already
+# stored: "ignore" keeps the stored row, "replace" overwrites it, and
+# "latest" overwrites it unless the stored row has a later source time
+# (created_at: the upload's as_of, default when it was ingested)
+CONFLICT_POLICIES = ("ignore", "replace", "latest")
+ENERGY_CONFLICT_POLICY = os.getenv("ENERGY_CONFLICT_POLICY", "replace")
+
+# Cross-site rankings: metric -> indexed answer_context column. Insight
+# metrics are those of each site's latest insight; cost_usd and co2_kg
+# are totals over its latest LEADERBOARD_DAYS daily rollups, refreshed
+# with each insight save
+LEADERBOARD_METRICS = {
+    "anomalies": "anomaly_count",
+    "high_anomalies": "high_anomaly_count",
+    "forecast_kw": "forecast_mean_kw",
+    "cost_usd": "cost_usd",
+    "co2_kg": "co2_kg",
+}
+
+# Rejected rows kept per upload error report, and days reports are kept
+INGEST_ERROR_LIMIT = int(os.getenv("INGEST_ERROR_LIMIT", "10000"))
+INGEST_ERROR_RETENTION_DAYS = int(os.getenv("INGEST_ERROR_RETENTION_DAYS", "7"))
 
 
 # ============================================================================
 # SQLite Database Helpers
 # ============================================================================
 
+_storage: Optional[Storage] = None
+_known_partitions: Set[str] = set()
+
+
+def get_storage() -> Storage:
+    """Get the storage backend for DB_PATH (recreated if DB_PATH changes)."""
+    global _storage
+    if _storage is None or _storage.path != str(DB_PATH):
+        if _storage is not None:
+            _storage.close()
+        _storage = Storage(DB_PATH)
+        _known_partitions.clear()
+    return _storage
+
+
+_INSERT_ENERGY_SQL = """
+    INSERT INTO {table} (timestamp, ts_epoch, kw, site, cost_usd, co2_kg, temp_c)
+    VALUES (?, ?, ?, ?, ?, ?, ?)
+"""
+
+_UPSERT_ENERGY_SQL = """
+    INSERT INTO {table} (timestamp, ts_epoch, kw, site, cost_usd, co2_kg, temp_c, created_at)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+    ON CONFLICT (site, ts_epoch) DO UPDATE SET
+        timestamp = excluded.timestamp,
+        kw = excluded.kw,
+        cost_usd = excluded.cost_usd,
+        co2_kg = excluded.co2_kg,
+        temp_c = excluded.temp_c,
+        created_at = excluded.created_at
+"""
+
+_READING_ID_SQL = f"""
+    SELECT id FROM {ENERGY_VIEW} WHERE site = ? AND ts_epoch = ?
+"""
+
+_EXISTING_ENERGY_SQL = """
+    SELECT ts_epoch, kw, cost_usd, co2_kg, temp_c, created_at
+    FROM {table}
+    WHERE site = ? AND ts_epoch IN (SELECT value FROM json_each(?))
+"""
+
+_ANY_ENERGY_SQL = "SELECT 1 FROM {table} WHERE site = ? AND ts_epoch BETWEEN ? AND ? LIMIT 1"
+
+_SITE_HAS_ENERGY_SQL = f"SELECT 1 FROM {ENERGY_VIEW} WHERE site = ? LIMIT 1"
+
+_READ_ENERGY_SQL = f"""
+    SELECT timestamp, kw, site, cost_usd, co2_kg, temp_c
+    FROM {ENERGY_VIEW}
+    WHERE site = ?
+    ORDER BY ts_epoch DESC
+    LIMIT ?
+"""
+
+_READ_ENERGY_ARRAYS_SQL = """
+    SELECT {columns}
+    FROM {view}
+    WHERE site = ? AND ts_epoch >= ? AND ts_epoch < ?
+    ORDER BY ts_epoch DESC
+    LIMIT ?
+"""
+
+_READ_SERIES_SQL = f"""
+    SELECT timestamp, ts_epoch, kw, cost_usd, co2_kg, temp_c
+    FROM {ENERGY_VIEW}
+    WHERE site = ?
+    ORDER BY ts_epoch DESC
+    LIMIT ?
+"""
+
+_READ_ENERGY_SINCE_SQL = f"""
+    SELECT timestamp, ts_epoch, kw, cost_usd, co2_kg, temp_c
+    FROM {ENERGY_VIEW}
+    WHERE site = ? AND ts_epoch > ?
+    ORDER BY ts_epoch ASC
+    LIMIT ?
+"""
+
+_LIST_SITES_SQL = f"""
+    SELECT DISTINCT site FROM {ENERGY_VIEW} ORDER BY site
+"""
+
+_LATEST_EPOCH_SQL = f"""
+    SELECT MAX(ts_epoch) AS latest FROM {ENERGY_VIEW} WHERE site = ?
+"""
+
+_COUNT_RECENT_SQL = f"""
+    SELECT COUNT(*) AS row_count FROM (SELECT 1 FROM {ENERGY_VIEW} WHERE site = ? LIMIT ?)
+"""
+
+_LATEST_TIMESTAMP_SQL = f"""
+    SELECT timestamp FROM {ENERGY_VIEW} WHERE site = ? ORDER BY ts_epoch DESC LIMIT 1
+"""
+
+_ENERGY_BUCKETS_SQL = f"""
+    SELECT (ts_epoch / ?) * ? AS bucket, AVG(kw) AS kw, AVG(temp_c) AS temp_c
+    FROM {ENERGY_VIEW}
+    WHERE site = ? AND ts_epoch >= ?
+    GROUP BY bucket
+    ORDER BY bucket
+"""
+
+_ENERGY_AGGREGATE_SQL = f"""
+    SELECT (ts_epoch / ?) * ? AS bucket, {{expr}} AS value
+    FROM {ENERGY_VIEW}
+    WHERE site = ? AND ts_epoch >= ? AND ts_epoch < ?
+    GROUP BY bucket
+    ORDER BY bucket
+"""
+
+_SQL_AGGREGATES = {"avg": "AVG(kw)", "max": "MAX(kw)", "sum": "SUM(kw)"}
+
+_READ_ROLLUP_SQL = """
+    SELECT bucket, {expr} AS value
+    FROM {table}
+    WHERE site = ? AND bucket >= ? AND bucket < ?
+    ORDER BY bucket
+"""
+
+_SITE_RANGE_SQL = f"""
+    SELECT MIN(ts_epoch), MAX(ts_epoch) FROM {ENERGY_VIEW} WHERE site = ?
+"""
+
+_READ_ROLLUPS_SQL = f"""
+    SELECT bucket, {', '.join(ROLLUP_COLUMNS)}
+    FROM {{table}}
+    WHERE site = ? AND bucket >= ? AND bucket < ?
+    ORDER BY bucket
+"""
+
+
+def _monthly_moment(column: str) -> str:
+    field = column.rsplit("_", 1)[1]
+    return f"{field.upper() if field in ('min', 'max') else 'SUM'}({column})"
+
+
+_READ_MONTHLY_ROLLUPS_SQL = f"""
+    SELECT CAST(strftime('%s', bucket, 'unixepoch', 'start of month') AS INTEGER) AS month,
+           {', '.join(_monthly_moment(column) for column in ROLLUP_COLUMNS)}
+    FROM {rollup_table("1d")}
+    WHERE site = ? AND bucket >= ? AND bucket < ?
+    GROUP BY month
+    ORDER BY month
+"""
+
+_ROLLUP_TOTALS_SQL = f"""
+    SELECT COUNT(*) AS days, MIN(bucket) AS first, MAX(bucket) AS last,
+           {', '.join(_monthly_moment(column) for column in ROLLUP_COLUMNS)}
+    FROM (SELECT * FROM {rollup_table("1d")} WHERE site = ? ORDER BY bucket DESC LIMIT ?)
+"""
+
+_INSERT_INGEST_ERROR_SQL = """
+    INSERT INTO ingest_errors (report_id, site, filename, line, reason, raw)
+    VALUES (?, ?, ?, ?, ?, ?)
+"""
+
+_EXPIRE_INGEST_ERRORS_SQL = "DELETE FROM ingest_errors WHERE created_at < datetime('now', ?)"
+
+_READ_INGEST_ERRORS_SQL = """
+    SELECT filename, line, reason, raw
+    FROM ingest_errors
+    WHERE report_id = ?
+    ORDER BY id
+"""
+
+_INSERT_INSIGHT_SQL = """
+    INSERT INTO insights (
+        site, created_at, summary, mode, watermark_epoch, agg_state,
+        anomaly_count, severities, forecast_count, forecast_mean_kw, details
+    )
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+"""
+
+_LOAD_ANALYSIS_STATE_SQL = """
+    SELECT watermark_epoch, agg_state, details
+    FROM insights
+    WHERE site = ? AND agg_state IS NOT NULL
+    ORDER BY created_at DESC
+    LIMIT 1
+"""
+
+# Listings select either the header columns alone or the detail payload
+_INSIGHT_HEADER_COLUMNS = "id, site, created_at, summary, mode, anomaly_count, severities, forecast_count, forecast_mean_kw"
+
+_LIST_INSIGHTS_SQL = """
+    SELECT {columns}
+    FROM insights
+    WHERE site = ?
+    ORDER BY created_at DESC
+    LIMIT ?
+"""
+
+# Latest insight of each site (bare id comes from the MAX(created_at) row)
+# that has no plan from the given generator version
+_UNPLANNED_INSIGHTS_SQL = f"""
+    SELECT {_INSIGHT_HEADER_COLUMNS}
+    FROM insights
+    WHERE id IN (SELECT id FROM (SELECT id, MAX(created_at) FROM insights GROUP BY site))
+      AND NOT EXISTS (
+          SELECT 1 FROM plans WHERE plans.insight_id = insights.id AND plans.generator_version = ?
+      )
+    ORDER BY site
+"""
+
+# Ignored when the insight already has a plan from this generator version
+_INSERT_PLAN_SQL = """
+    INSERT INTO plans (site, created_at, rationale, insight_id, item_count, high_priority_count, details, generator_version)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+    ON CONFLICT DO NOTHING
+"""
+
+_PLAN_HEADER_COLUMNS = "id, site, created_at, rationale, insight_id, item_count, high_priority_count"
+
+_PLAN_COLUMNS = "id, site, created_at, rationale, insight_id, details"
+
+_FIND_PLAN_SQL = f"""
+    SELECT {_PLAN_COLUMNS}
+    FROM plans
+    WHERE insight_id = ? AND generator_version = ?
+"""
+
+_LIST_PLANS_SQL = """
+    SELECT {columns}
+    FROM plans
+    WHERE site = ?
+    ORDER BY created_at DESC
+    LIMIT ?
+"""
+
+# Answer context upkeep: totals are bumped on every save, latest-row
+# fields only replaced by rows at least as new as the stored ones
+_COUNT_CONTEXT_SQL = """
+    INSERT INTO answer_context (site, {count}) VALUES (?, 1)
+    ON CONFLICT (site) DO UPDATE SET {count} = {count} + 1
+"""
+
+_LATEST_INSIGHT_CONTEXT_SQL = """
+    UPDATE answer_context
+    SET insight_id = ?, insight_created_at = ?, anomaly_count = ?, severities = ?, forecast_count = ?, forecast_mean_kw = ?,
+        high_anomaly_count = ?
+    WHERE site = ? AND (insight_created_at IS NULL OR insight_created_at <= ?)
+"""
+
+_LATEST_PLAN_CONTEXT_SQL = """
+    UPDATE answer_context
+    SET plan_id = ?, plan_created_at = ?, plan_item_count = ?, high_priority_actions = ?
+    WHERE site = ? AND (plan_created_at IS NULL OR plan_created_at <= ?)
+"""
+
+_ANSWER_CONTEXT_SQL = """
+    SELECT site, insight_count, insight_id, anomaly_count, severities, forecast_count, forecast_mean_kw,
+           plan_count, plan_id, plan_item_count, high_priority_actions
+    FROM answer_context
+    WHERE site = ?
+"""
+
+# Walks the metric's index from the top (or bottom) end
+_LEADERBOARD_SQL = """
+    SELECT site, {column} AS value, insight_id
+    FROM answer_context
+    WHERE {column} IS NOT NULL AND insight_id IS NOT NULL{sites}
+    ORDER BY {column} {order}
+    LIMIT ?
+"""
+
+_SITE_RANK_SQL = """
+    SELECT COUNT(*) + 1 AS rank
+    FROM answer_context
+    WHERE {column} {beats} ? AND insight_id IS NOT NULL
+"""
+
+_BUMP_VERSION_SQL = """
+    INSERT INTO site_versions (site, kind, version) VALUES (?, ?, 1)
+    ON CONFLICT (site, kind) DO UPDATE SET version = version + 1
+"""
+
+_SITE_VERSION_SQL = """
+    SELECT version FROM site_versions WHERE site = ? AND kind = ?
+"""
+
+_LOAD_DETECTOR_STATE_SQL = """
+    SELECT state_json FROM detector_state WHERE site = ? AND detector = ?
+"""
+
+_SAVE_DETECTOR_STATE_SQL = """
+    INSERT OR REPLACE INTO detector_state (site, detector, state_json, updated_at)
+    VALUES (?, ?, ?, CURRENT_TIMESTAMP)
+"""
+
+# Ingest lowers a site's rewind to the earliest reading it wrote; a save
+# consumes it only if no ingest bumped seq since the analysis read it
+_MARK_REWIND_SQL = """
+    INSERT INTO analysis_rewind (site, min_epoch) VALUES (?, ?)
+    ON CONFLICT (site) DO UPDATE SET
+        min_epoch = CASE
+            WHEN min_epoch IS NULL OR excluded.min_epoch < min_epoch THEN excluded.min_epoch
+            ELSE min_epoch
+        END,
+        seq = seq + 1
+"""
+
+_LOAD_REWIND_SQL = """
+    SELECT min_epoch, seq FROM analysis_rewind WHERE site = ? AND min_epoch IS NOT NULL
+"""
+
+_CONSUME_REWIND_SQL = """
+    UPDATE analysis_rewind SET min_epoch = NULL WHERE site = ? AND seq = ?
+"""
+
+
+# Callbacks run after a committed write: fn(kind, site), kind being
+# "insights" or "plans"
+_write_listeners: List[Callable[[str, str], None]] = []
+
+
+def add_write_listener(fn: Callable[[str, str], None]):
+    """Register a callback for committed insight/plan writes in this process."""
+    _write_listeners.append(fn)
+
+
+def _notify_write(kind: str, sites: Iterable[str]):
+    for site in set(sites):
+        for fn in _write_listeners:
+            fn(kind, site)
+
+
+@timed(STORAGE_SECONDS)
+def site_version(kind: str, site: str) -> int:
+    """
+    Change counter for a site's insights or plans (0 if never written).
+
+    Bumped in the same transaction as every save, so it changes exactly
+    when the listing does, whichever process wrote.
+    """
+    row = get_storage().connection().execute(_SITE_VERSION_SQL, (site, kind)).fetchone()
+    return row["version"] if row else 0
+
+
+@timed(STORAGE_SECONDS)
 def init_db():
-    """Initialize SQLite database with required tables."""
-    conn = sqlite3.connect(str(DB_PATH))
-    cursor = conn.cursor()
-    
-    # Energy points table
-    cursor.execute("""
-        CREATE TABLE IF NOT EXISTS energy_points (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            timestamp TEXT NOT NULL,
-            kw REAL NOT NULL,
-            site TEXT NOT NULL,
-            cost_usd REAL,
-            co2_kg REAL,
-            temp_c REAL,
-            created_at TEXT DEFAULT CURRENT_TIMESTAMP
-        )
-    """)
-    
-    # Insights table
-    cursor.execute("""
-        CREATE TABLE IF NOT EXISTS insights (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            site TEXT NOT NULL,
-            created_at TEXT DEFAULT CURRENT_TIMESTAMP,
-            summary TEXT,
-            mode TEXT,
-            data_json TEXT
-        )
-    """)
-    
-    # Plans table
-    cursor.execute("""
-        CREATE TABLE IF NOT EXISTS plans (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            site TEXT NOT NULL,
-            created_at TEXT DEFAULT CURRENT_TIMESTAMP,
-            rationale TEXT,
-            insight_id INTEGER,
-            data_json TEXT
-        )
-    """)
-    
-    conn.commit()
-    conn.close()
-
-
-def insert_energy(point: EnergyPoint) -> int:
-    """Insert energy point into database. Returns row ID."""
-    conn = sqlite3.connect(str(DB_PATH))
-    cursor = conn.cursor()
-    cursor.execute("""
-        INSERT INTO energy_points (timestamp, kw, site, cost_usd, co2_kg, temp_c)
-        VALUES (?, ?, ?, ?, ?, ?)
-    """, (point.timestamp, point.kw, point.site, point.cost_usd, point.co2_kg, point.temp_c))
-    row_id = cursor.lastrowid
-    conn.commit()
-    conn.close()
-    return row_id
-
-
-def read_energy(site: str, limit: int = 1000) -> List[EnergyPoint]:
-    """Read energy points for a site, most recent first."""
-    conn = sqlite3.connect(str(DB_PATH))
-    conn.row_factory = sqlite3.Row
-    cursor = conn.cursor()
-    cursor.execute("""
-        SELECT timestamp, kw, site, cost_usd, co2_kg, temp_c
-        FROM energy_points
-        WHERE site = ?
-        ORDER BY timestamp DESC
-        LIMIT ?
-    """, (site, limit))
-    rows = cursor.fetchall()
-    conn.close()
-    
-    return [
-        EnergyPoint(
-            timestamp=row["timestamp"],
-            kw=row["kw"],
-            site=row["site"],
-            cost_usd=row["cost_usd"],
-            co2_kg=row["co2_kg"],
-            temp_c=row["temp_c"]
+    """Initialize SQLite database, applying any pending schema migrations."""
+    migrate(get_storage().connection())
+
+
+def energy_row(point: EnergyPoint) -> tuple:
+    """Storage row for a point: (timestamp, ts_epoch, kw, site, cost_usd, co2_kg, temp_c)."""
+    return (
+        point.timestamp, to_epoch(point.timestamp), point.kw, point.site,
+        point.cost_usd, point.co2_kg, point.temp_c
+    )
+
+
+def _route_energy_rows(conn: sqlite3.Connection, rows: List[tuple]) -> Dict[str, List[tuple]]:
+    """
+    Group energy rows by destination table, creating monthly partitions as needed.
+
+    Must run before any DML in the transaction: partition DDL then executes
+    in autocommit mode, so a later rollback cannot orphan the cached set.
+    """
+    if ENERGY_PARTITIONING != "monthly":
+        return {ENERGY_TABLE: rows}
+
+    by_table: Dict[str, List[tuple]] = {}
+    for row in rows:
+        by_table.setdefault(partition_for(row[1]), []).append(row)
+    try:
+        ensure_partitions(conn, set(by_table), _known_partitions)
+    except sqlite3.Error:
+        _known_partitions.clear()
+        raise
+    return by_table
+
+
+class IngestCounts(NamedTuple):
+    """Outcome of an ingest: rows newly stored, overwritten, and left as they were."""
+    inserted: int = 0
+    updated: int = 0
+    skipped: int = 0
+
+    def __add__(self, other: "IngestCounts") -> "IngestCounts":
+        return IngestCounts(*(a + b for a, b in zip(self, other)))
+
+    @property
+    def written(self) -> int:
+        return self.inserted + self.updated
+
+
+_ROWS_INGESTED = {outcome: INGEST_ROWS.labels(outcome) for outcome in IngestCounts._fields}
+
+
+def _check_policy(policy: Optional[str]) -> str:
+    policy = policy or ENERGY_CONFLICT_POLICY
+    if policy not in CONFLICT_POLICIES:
+        raise ValueError(f"Unknown conflict policy '{policy}'. Choose from: {', '.join(CONFLICT_POLICIES)}")
+    return policy
+
+
+def ingest_created_at(as_of: Optional[str] = None) -> str:
+    """
+    created_at for written rows: `as_of` (the data's ISO-8601 source time,
+    naive = UTC; default now) in UTC, in SQLite's CURRENT_TIMESTAMP layout
+    (so both compare as text).
+    """
+    if as_of is None:
+        when = datetime.now(timezone.utc)
+    else:
+        when = datetime.fromisoformat(as_of.replace("Z", "+00:00"))
+        when = when.replace(tzinfo=timezone.utc) if when.tzinfo is None else when.astimezone(timezone.utc)
+    return when.strftime("%Y-%m-%d %H:%M:%S.%f")
+
+
+def _write_energy_chunk(storage: Storage, chunk: List[tuple], policy: str, created_at: str) -> IngestCounts:
+    """
+    Upsert one chunk of energy rows in one transaction.
+
+    Readings repeated within the chunk collapse to the first ("ignore") or
+    last occurrence. The chunk's keys are looked up under BEGIN IMMEDIATE,
+    so rows are classified exactly: new rows are inserted, stored rows
+    with different values are overwritten unless the policy says
+    otherwise, and identical resends are skipped without a write. Only
+    written rows go through INSERT ... ON CONFLICT DO UPDATE. Inserts
+    fold into the rollups; days with overwritten rows are recomputed,
+    and the written sites' cost/CO2 leaderboard totals refreshed.
+    Committed rows are applied to the columnar store, which is marked
+    complete for sites whose first rows this chunk wrote.
+    """
+    keep_last = policy != "ignore"
+    unique: Dict[Tuple[str, int], tuple] = {}
+    for row in chunk:
+        key = (row[3], row[1])
+        if keep_last or key not in unique:
+            unique[key] = row
+    skipped = len(chunk) - len(unique)
+    inserted: List[tuple] = []
+    updated: List[tuple] = []
+    store = get_store()
+    new_sites: Set[str] = set()
+
+    with storage.transaction() as conn:
+        routed = _route_energy_rows(conn, list(unique.values()))
+        conn.execute("BEGIN IMMEDIATE")
+        if store is not None:
+            new_sites = {site for site, _ in unique if conn.execute(_SITE_HAS_ENERGY_SQL, (site,)).fetchone() is None}
+        cursor = conn.cursor()
+        cursor.row_factory = None
+        for table, rows_for_table in routed.items():
+            by_site: Dict[str, List[tuple]] = {}
+            for row in rows_for_table:
+                by_site.setdefault(row[3], []).append(row)
+            written = []
+            for site, site_rows in by_site.items():
+                keys = [row[1] for row in site_rows]
+                if cursor.execute(_ANY_ENERGY_SQL.format(table=table), (site, min(keys), max(keys))).fetchone() is None:
+                    # Nothing stored in the chunk's range: all new, no lookup
+                    inserted += site_rows
+                    written += [row + (created_at,) for row in site_rows]
+                    continue
+                keys = json.dumps(keys)
+                existing = {r[0]: r for r in cursor.execute(_EXISTING_ENERGY_SQL.format(table=table), (site, keys))}
+                for row in site_rows:
+                    stored = existing.get(row[1])
+                    if stored is None:
+                        inserted.append(row)
+                    elif (
+                        policy == "ignore"
+                        or stored[1:5] == (row[2], row[4], row[5], row[6])
+                        or (policy == "latest" and stored[5] > created_at)
+                    ):
+                        skipped += 1
+                        continue
+                    else:
+                        updated.append(row)
+                    written.append(row + (created_at,))
+            conn.executemany(_UPSERT_ENERGY_SQL.format(table=table), written)
+
+        # Analysis resumes from a watermark: record how far back this chunk wrote
+        earliest: Dict[str, int] = {}
+        for row in chain(inserted, updated):
+            if row[1] < earliest.get(row[3], row[1] + 1):
+                earliest[row[3]] = row[1]
+        conn.executemany(_MARK_REWIND_SQL, earliest.items())
+
+        changed_days = {(row[3], row[1] - row[1] % 86400) for row in updated}
+        apply_rollups(conn, [row for row in inserted if (row[3], row[1] - row[1] % 86400) not in changed_days])
+        refresh_rollups(conn, changed_days)
+        # Cost/CO2 leaderboard totals are read off the daily rollups just written
+        conn.executemany(leaderboard_totals_sql(), [(site,) for site in sorted(earliest)])
+
+    if store is not None:
+        # A store left with rows from before this site's sqlite rows is not trusted
+        new_sites = {site for site in new_sites if store.rows(site) == 0}
+        store.append_rows(inserted)
+        store.update_rows(updated)
+        for site in new_sites:
+            store.mark_complete(site)
+    counts = IngestCounts(len(inserted), len(updated), skipped)
+    for outcome, count in zip(counts._fields, counts):
+        _ROWS_INGESTED[outcome].inc(count)
+    return counts
+
+
+@timed(STORAGE_SECONDS)
+def insert_energy(point: EnergyPoint, policy: Optional[str] = None) -> int:
+    """Insert (or upsert, per `policy`) an energy point. Returns the stored row's ID."""
+    row = energy_row(point)
+    _write_energy_chunk(get_storage(), [row], _check_policy(policy), ingest_created_at())
+    return get_storage().connection().execute(_READING_ID_SQL, (row[3], row[1])).fetchone()["id"]
+
+
+@timed(STORAGE_SECONDS)
+def insert_energy_many(
+    points: Iterable[EnergyPoint],
+    chunk_size: int = INGEST_CHUNK_SIZE,
+    policy: Optional[str] = None,
+    created_at: Optional[str] = None
+) -> IngestCounts:
+    """
+    Bulk upsert energy points. Returns inserted/updated/skipped counts.
+
+    Rows are written in chunks of `chunk_size`, one transaction per
+    chunk, over a single connection. The iterable is consumed lazily so
+    generators are never materialized in full. Timestamps must be
+    ISO-8601; an unparseable one raises ValueError. A reading already
+    stored for the same site and instant is handled per `policy`
+    (default ENERGY_CONFLICT_POLICY); `created_at` (default now, UTC)
+    stamps the written rows and is what "latest" compares. Hourly/daily
+    rollups are updated in the same transaction as each chunk; committed
+    chunks are also applied to the columnar store when enabled.
+
+    (site, ts_epoch) is unique per table: with monthly partitioning, rows
+    left in the base table from before partitioning are not deduplicated
+    against the partitions.
+    """
+    return insert_energy_rows((energy_row(p) for p in points), chunk_size, policy, created_at)
+
+
+@timed(STORAGE_SECONDS)
+def insert_energy_rows(
+    rows: Iterable[tuple],
+    chunk_size: int = INGEST_CHUNK_SIZE,
+    policy: Optional[str] = None,
+    created_at: Optional[str] = None
+) -> IngestCounts:
+    """insert_energy_many for rows already built by energy_row (e.g. in parse workers)."""
+    storage = get_storage()
+    policy = _check_policy(policy)
+    created_at = created_at or ingest_created_at()
+    counts = IngestCounts()
+    rows = iter(rows)
+    while True:
+        chunk = list(islice(rows, chunk_size))
+        if not chunk:
+            break
+        counts += _write_energy_chunk(storage, chunk, policy, created_at)
+    return counts
+
+
+@timed(STORAGE_SECONDS)
+def save_ingest_errors(site: str, rejects: Iterable[Tuple[Optional[str], int, str, str]]) -> str:
+    """
+    Store rejected rows, as (filename, line, reason, raw), under a new report id.
+
+    Reports older than INGEST_ERROR_RETENTION_DAYS are dropped in the same
+    transaction. Returns the report id.
+    """
+    report_id = uuid.uuid4().hex
+    with get_storage().transaction() as conn:
+        conn.execute(_EXPIRE_INGEST_ERRORS_SQL, (f"-{INGEST_ERROR_RETENTION_DAYS} days",))
+        conn.executemany(_INSERT_INGEST_ERROR_SQL, ((report_id, site, *reject) for reject in rejects))
+    return report_id
+
+
+@timed(STORAGE_SECONDS)
+def read_ingest_errors(report_id: str) -> List[tuple]:
+    """Rejected rows of an error report as (filename, line, reason, raw), in file order."""
+    return [tuple(row) for row in get_storage().connection().execute(_READ_INGEST_ERRORS_SQL, (report_id,))]
+
+
+def _row_to_point(row: sqlite3.Row) -> EnergyPoint:
+    return EnergyPoint(
+        timestamp=row["timestamp"],
+        kw=row["kw"],
+        site=row["site"],
+        cost_usd=row["cost_usd"],
+        co2_kg=row["co2_kg"],
+        temp_c=row["temp_c"]
+    )
+
+
+@timed(STORAGE_SECONDS)
+def list_sites() -> List[str]:
+    """Sites with any energy data, sorted."""
+    rows = get_storage().connection().execute(_LIST_SITES_SQL).fetchall()
+    return [row["site"] for row in rows]
+
+
+@timed(STORAGE_SECONDS)
+def read_energy(site: str, limit: Optional[int] = 1000) -> List[EnergyPoint]:
+    """
+    Read energy points for a site, most recent first; `limit=None` reads
+    everything. For columns, oldest first, use read_energy_arrays.
+    """
+    rows = get_storage().connection().execute(_READ_ENERGY_SQL, (site, -1 if limit is None else limit)).fetchall()
+    _ROWS_READ["sqlite"].inc(len(rows))
+    return [_row_to_point(row) for row in rows]
+
+
+@timed(STORAGE_SECONDS)
+def read_energy_arrays(
+    site: str,
+    columns: Optional[List[str]] = None,
+    limit: Optional[int] = None,
+    start_epoch: Optional[int] = None,
+    end_epoch: Optional[int] = None
+) -> Dict[str, np.ndarray]:
+    """
+    Energy columns for a site as NumPy arrays, oldest first.
+
+    `columns` defaults to ts_epoch, kw, cost_usd, co2_kg and temp_c
+    (missing values are NaN). `start_epoch`/`end_epoch` bound ts_epoch
+    (inclusive/exclusive) and `limit` keeps the latest rows. Served as
+    zero-copy memory maps from the columnar store when it holds all of the
+    site's rows (see ColumnarStore.mark_complete), otherwise selected from
+    sqlite without building EnergyPoint objects.
+    """
+    columns = check_columns(columns)
+    store = get_store()
+    if store is not None:
+        arrays = store.read(site, columns, limit, start_epoch, end_epoch)
+        if arrays is not None:
+            _ROWS_READ["columnar"].inc(len(next(iter(arrays.values()), ())))
+            return arrays
+
+    sql = _READ_ENERGY_ARRAYS_SQL.format(columns=", ".join(columns), view=ENERGY_VIEW)
+    rows = get_storage().connection().execute(sql, (
+        site,
+        -2 ** 63 if start_epoch is None else start_epoch,
+        2 ** 63 - 1 if end_epoch is None else end_epoch,
+        -1 if limit is None else limit
+    )).fetchall()
+    _ROWS_READ["sqlite"].inc(len(rows))
+    data = np.array(rows, dtype=np.float64).reshape(len(rows), len(columns))[::-1]
+    return {
+        name: (data[:, i].astype(np.int64) if name == "ts_epoch" else np.ascontiguousarray(data[:, i]))
+        for i, name in enumerate(columns)
+    }
+
+
+@timed(STORAGE_SECONDS)
+def rebuild_columnar(sites: Optional[List[str]] = None, chunk_size: int = INGEST_CHUNK_SIZE * 20) -> Dict[str, int]:
+    """Re-export sites (default all) from sqlite into the columnar store. Returns rows per site."""
+    store = get_store()
+    if store is None:
+        raise ValueError("Columnar store disabled; set ENERGY_COLUMNAR_DIR")
+    counts = {}
+    for site in sites or list_sites():
+        store.reset(site)
+        cursor = get_storage().connection().execute(
+            f"SELECT timestamp, ts_epoch, kw, site, cost_usd, co2_kg, temp_c FROM {ENERGY_VIEW} WHERE site = ? ORDER BY ts_epoch",
+            (site,)
         )
-        for row in rows
-    ]
+        counts[site] = 0
+        while True:
+            rows = cursor.fetchmany(chunk_size)
+            if not rows:
+                break
+            store.append_rows(rows)
+            counts[site] += len(rows)
+        store.mark_complete(site)
+    return counts
+
+
+def _rows_to_series(site: str, rows: List[tuple]) -> EnergySeries:
+    """Columns from (timestamp, ts_epoch, kw, cost_usd, co2_kg, temp_c) rows."""
+    _ROWS_READ["sqlite"].inc(len(rows))
+    if not rows:
+        return EnergySeries(site, [], [], timestamps=[])
+    timestamps, ts_epoch, kw, cost_usd, co2_kg, temp_c = zip(*rows)
+
+    def optional(values):
+        return None if all(v is None for v in values) else np.array(values, dtype=np.float64)
+
+    return EnergySeries(
+        site,
+        np.array(ts_epoch, dtype=np.int64),
+        np.array(kw, dtype=np.float64),
+        optional(cost_usd), optional(co2_kg), optional(temp_c),
+        list(timestamps)
+    )
+
+
+def _fetch_tuples(sql: str, params: tuple) -> List[tuple]:
+    cursor = get_storage().connection().cursor()
+    cursor.row_factory = None  # plain tuples: no per-row sqlite3.Row
+    return cursor.execute(sql, params).fetchall()
+
+
+@timed(STORAGE_SECONDS)
+def read_energy_series(site: str, limit: Optional[int] = 1000) -> EnergySeries:
+    """Latest `limit` energy readings for a site as an EnergySeries, oldest first."""
+    rows = _fetch_tuples(_READ_SERIES_SQL, (site, -1 if limit is None else limit))
+    rows.reverse()
+    return _rows_to_series(site, rows)
+
+
+@timed(STORAGE_SECONDS)
+def read_energy_since(site: str, after_epoch: Optional[int], limit: int = 1000) -> EnergySeries:
+    """
+    Read energy readings for a site oldest first, strictly after `after_epoch`.
+
+    With no watermark, returns the latest `limit` readings (still oldest first).
+    """
+    if after_epoch is None:
+        return read_energy_series(site, limit)
+    return _rows_to_series(site, _fetch_tuples(_READ_ENERGY_SINCE_SQL, (site, after_epoch, limit)))
+
+
+@timed(STORAGE_SECONDS)
+def energy_summary(site: str, limit: int = 1000) -> Tuple[int, Optional[str]]:
+    """
+    Row count (capped at `limit`) and latest timestamp for a site.
+
+    Answered from the (site, ts_epoch) index without materializing rows.
+    """
+    conn = get_storage().connection()
+    row_count = conn.execute(_COUNT_RECENT_SQL, (site, limit)).fetchone()["row_count"]
+    latest = conn.execute(_LATEST_TIMESTAMP_SQL, (site,)).fetchone()
+    return row_count, (latest["timestamp"] if latest else None)
+
+
+@timed(STORAGE_SECONDS)
+def read_energy_buckets(site: str, bucket_seconds: int, history_seconds: int) -> List[tuple]:
+    """
+    Average kW and temperature per time bucket, oldest first.
+
+    Covers the `history_seconds` before the site's latest point. Returns
+    (bucket_epoch, avg_kw, avg_temp_c) tuples; aggregation runs in SQL.
+    """
+    conn = get_storage().connection()
+    latest = conn.execute(_LATEST_EPOCH_SQL, (site,)).fetchone()["latest"]
+    if latest is None:
+        return []
+    rows = conn.execute(
+        _ENERGY_BUCKETS_SQL,
+        (bucket_seconds, bucket_seconds, site, latest - history_seconds + 1)
+    ).fetchall()
+    return [tuple(row) for row in rows]
+
+
+@timed(STORAGE_SECONDS)
+def read_energy_aggregate(
+    site: str,
+    bucket: str = "1h",
+    agg: str = "avg",
+    start_epoch: Optional[int] = None,
+    end_epoch: Optional[int] = None
+) -> Dict[str, np.ndarray]:
+    """
+    kW aggregated per time bucket as {"ts_epoch", "kw"} arrays, oldest first.
+
+    `bucket` is one of 1m/15m/1h/1d and `agg` one of avg/max/sum/p95.
+    The range is widened to whole buckets (start rounded down, end up) so
+    every bucket is complete. Hourly and daily avg/max/sum are read from
+    the ingest-maintained rollup tables; everything else aggregates raw
+    readings, in SQL or, for p95 and when the columnar store is enabled,
+    with NumPy over the column arrays.
+    """
+    if bucket not in BUCKET_SECONDS:
+        raise ValueError(f"Unknown bucket '{bucket}'. Choose from: {', '.join(BUCKET_SECONDS)}")
+    if agg not in AGGREGATES:
+        raise ValueError(f"Unknown aggregate '{agg}'. Choose from: {', '.join(AGGREGATES)}")
+    seconds = BUCKET_SECONDS[bucket]
+    lo = None if start_epoch is None else start_epoch - start_epoch % seconds
+    hi = None if end_epoch is None else -(-end_epoch // seconds) * seconds
+    bounds = (-2 ** 63 if lo is None else lo, 2 ** 63 - 1 if hi is None else hi)
+
+    if uses_rollup(bucket, agg):
+        sql = _READ_ROLLUP_SQL.format(expr=ROLLUP_AGGREGATES[agg], table=rollup_table(bucket))
+        rows = _fetch_tuples(sql, (site, *bounds))
+    elif agg == "p95" or get_store() is not None:
+        arrays = read_energy_arrays(site, ["ts_epoch", "kw"], start_epoch=lo, end_epoch=hi)
+        ts_epoch, kw = aggregate_arrays(arrays["ts_epoch"], arrays["kw"], seconds, agg)
+        return {"ts_epoch": ts_epoch, "kw": kw}
+    else:
+        sql = _ENERGY_AGGREGATE_SQL.format(expr=_SQL_AGGREGATES[agg])
+        rows = _fetch_tuples(sql, (seconds, seconds, site, *bounds))
+    data = np.array(rows, dtype=np.float64).reshape(len(rows), 2)
+    return {"ts_epoch": data[:, 0].astype(np.int64), "kw": np.ascontiguousarray(data[:, 1])}
+
+
+@timed(STORAGE_SECONDS)
+def read_rollups(
+    site: str,
+    bucket: str = "1h",
+    start_epoch: Optional[int] = None,
+    end_epoch: Optional[int] = None
+) -> Dict[str, np.ndarray]:
+    """
+    Rollup rows for a site as column arrays, oldest first.
+
+    `bucket` is "1h" or "1d" (the rollup tables) or "1mo" (calendar months
+    in UTC, summed from the daily table). Keys are "bucket" (start epoch)
+    plus ROLLUP_COLUMNS: <metric>_count/_sum/_min/_max/_sumsq for kw,
+    cost_usd and co2_kg, NaN where a min/max has no values. Buckets
+    starting in [start_epoch, end_epoch) are returned.
+    """
+    bounds = (-2 ** 63 if start_epoch is None else start_epoch, 2 ** 63 - 1 if end_epoch is None else end_epoch)
+    if bucket == "1mo":
+        rows = _fetch_tuples(_READ_MONTHLY_ROLLUPS_SQL, (site, *bounds))
+    elif bucket in ROLLUP_SECONDS:
+        rows = _fetch_tuples(_READ_ROLLUPS_SQL.format(table=rollup_table(bucket)), (site, *bounds))
+    else:
+        raise ValueError(f"Unknown rollup bucket '{bucket}'. Choose from: {', '.join(ROLLUP_SECONDS)}, 1mo")
+    data = np.array(rows, dtype=np.float64).reshape(len(rows), len(ROLLUP_COLUMNS) + 1)
+    arrays = {"bucket": data[:, 0].astype(np.int64)}
+    for i, column in enumerate(ROLLUP_COLUMNS, start=1):
+        arrays[column] = data[:, i].astype(np.int64) if column.endswith("_count") else np.ascontiguousarray(data[:, i])
+    return arrays
+
+
+@timed(STORAGE_SECONDS)
+def rollup_totals(site: str, days: int = 30) -> Optional[Dict[str, Any]]:
+    """
+    Totals over a site's latest `days` daily rollups, or None without data.
+
+    Returns {"days", "start", "end", <metric>: {"count", "sum", "min",
+    "max", "mean", "stdev"}} with metrics kw, cost_usd and co2_kg; a
+    metric with no values has count 0 and None statistics. Reads at most
+    `days` rollup rows, whatever the raw row count.
+    """
+    row = get_storage().connection().execute(_ROLLUP_TOTALS_SQL, (site, days)).fetchone()
+    if not row["days"]:
+        return None
+    totals: Dict[str, Any] = {"days": row["days"], "start": row["first"], "end": row["last"] + 86400}
+    for i, metric in enumerate(ROLLUP_METRICS):
+        count, total, low, high, sumsq = row[3 + 5 * i: 8 + 5 * i]
+        mean = total / count if count else None
+        variance = max(0.0, sumsq - total * total / count) / (count - 1) if count > 1 else None
+        totals[metric] = {
+            "count": count,
+            "sum": total if count else None,
+            "min": low,
+            "max": high,
+            "mean": mean,
+            "stdev": None if variance is None else variance ** 0.5,
+        }
+    return totals
+
+
+@timed(STORAGE_SECONDS)
+def load_detector_state(site: str, detector: str) -> Optional[Dict[str, Any]]:
+    """Load persisted detector state for a site, if any."""
+    row = get_storage().connection().execute(_LOAD_DETECTOR_STATE_SQL, (site, detector)).fetchone()
+    return json.loads(row["state_json"]) if row else None
+
+
+@timed(STORAGE_SECONDS)
+def save_detector_state(site: str, detector: str, state: Dict[str, Any]):
+    """Persist detector state for a site."""
+    with get_storage().transaction() as conn:
+        conn.execute(_SAVE_DETECTOR_STATE_SQL, (site, detector, json.dumps(state)))
+
+
+def _insight_row(insight: Insight, watermark_epoch: Optional[int], agg_state: Optional[Dict[str, Any]]) -> tuple:
+    state_json = json.dumps(agg_state) if agg_state is not None else None
+    return (
+        insight.site, insight.created_at, insight.summary, insight.mode, watermark_epoch, state_json,
+        *insight_columns(insight)
+    )
+
+
+def _update_insight_context(conn: sqlite3.Connection, rows: List[tuple], ids: List[int]):
+    # rows are _insight_row tuples: site, created_at, ..., then the header columns at 6:10
+    conn.executemany(_COUNT_CONTEXT_SQL.format(count="insight_count"), [(row[0],) for row in rows])
+    conn.executemany(
+        _LATEST_INSIGHT_CONTEXT_SQL,
+        [
+            (insight_id, row[1], *row[6:10], json.loads(row[7]).get("high", [0])[0], row[0], row[1])
+            for row, insight_id in zip(rows, ids)
+        ]
+    )
+    conn.executemany(leaderboard_totals_sql(), [(site,) for site in sorted({row[0] for row in rows})])
 
 
-def save_insight(insight: Insight) -> int:
-    """Save insight to database. Returns insight ID."""
-    conn = sqlite3.connect(str(DB_PATH))
-    cursor = conn.cursor()
-    data_json = json.dumps({
-        "anomalies": [a.dict() for a in insight.anomalies],
-        "forecast_24h": [f.dict() for f in insight.forecast_24h]
-    })
-    cursor.execute("""
-        INSERT INTO insights (site, created_at, summary, mode, data_json)
-        VALUES (?, ?, ?, ?, ?)
-    """, (insight.site, insight.created_at, insight.summary, insight.mode, data_json))
-    row_id = cursor.lastrowid
-    conn.commit()
-    conn.close()
-    return row_id
+@timed(STORAGE_SECONDS)
+def save_insight(insight: Insight, watermark_epoch: Optional[int] = None, agg_state: Optional[Dict[str, Any]] = None) -> int:
+    """
+    Save insight to database. Returns insight ID.
 
+    `watermark_epoch` (last energy row analysed) and `agg_state` (running
+    aggregates) let the next analysis resume from this insight.
+    """
+    row = _insight_row(insight, watermark_epoch, agg_state)
+    with get_storage().transaction() as conn:
+        insight_id = conn.execute(_INSERT_INSIGHT_SQL, row).lastrowid
+        conn.execute(_BUMP_VERSION_SQL, (insight.site, "insights"))
+        _update_insight_context(conn, [row], [insight_id])
+    _notify_write("insights", [insight.site])
+    return insight_id
 
+
+@timed(STORAGE_SECONDS)
+def save_insights_many(
+    entries: Iterable[tuple],
+    detector_states: Iterable[tuple] = (),
+    rewinds: Iterable[tuple] = ()
+) -> List[int]:
+    """
+    Save many insights, and optionally detector states, in one transaction.
+
+    `entries` are (insight, watermark_epoch, agg_state) tuples,
+    `detector_states` are (site, detector, state) tuples and `rewinds`
+    are the (site, seq) markers the analyses read (see load_rewind), now
+    consumed. Returns the insight IDs in input order.
+    """
+    rows = [_insight_row(*entry) for entry in entries]
+    states = [(site, detector, json.dumps(state)) for site, detector, state in detector_states]
+    with get_storage().transaction() as conn:
+        ids = [conn.execute(_INSERT_INSIGHT_SQL, row).lastrowid for row in rows]
+        conn.executemany(_BUMP_VERSION_SQL, [(site, "insights") for site in sorted({row[0] for row in rows})])
+        _update_insight_context(conn, rows, ids)
+        if states:
+            conn.executemany(_SAVE_DETECTOR_STATE_SQL, states)
+        conn.executemany(_CONSUME_REWIND_SQL, rewinds)
+    _notify_write("insights", [row[0] for row in rows])
+    return ids
+
+
+@timed(STORAGE_SECONDS)
+def load_analysis_state(site: str) -> Optional[Dict[str, Any]]:
+    """
+    Watermark, running aggregates and anomalies from the site's latest resumable insight.
+
+    Returns {"watermark": epoch, "anomalies": [...], **agg_state}, or None
+    if never analysed.
+    """
+    row = get_storage().connection().execute(_LOAD_ANALYSIS_STATE_SQL, (site,)).fetchone()
+    if row is None:
+        return None
+    anomalies = unpack_insight_details(row["details"])[0] if row["details"] else []
+    return {"watermark": row["watermark_epoch"], "anomalies": anomalies, **json.loads(row["agg_state"])}
+
+
+@timed(STORAGE_SECONDS)
+def load_rewind(site: str) -> Optional[Tuple[int, int]]:
+    """
+    (min_epoch, seq) of the earliest reading written for a site since its
+    last saved analysis, or None if nothing was written since.
+    """
+    row = get_storage().connection().execute(_LOAD_REWIND_SQL, (site,)).fetchone()
+    return (row["min_epoch"], row["seq"]) if row else None
+
+
+@timed(STORAGE_SECONDS)
 def list_insights(site: str, limit: int = 10) -> List[Insight]:
-    """List recent insights for a site."""
-    conn = sqlite3.connect(str(DB_PATH))
-    conn.row_factory = sqlite3.Row
-    cursor = conn.cursor()
-    cursor.execute("""
-        SELECT id, site, created_at, summary, mode, data_json
-        FROM insights
-        WHERE site = ?
-        ORDER BY created_at DESC
-        LIMIT ?
-    """, (site, limit))
-    rows = cursor.fetchall()
-    conn.close()
+    """List recent insights for a site, with anomalies and forecast."""
+    sql = _LIST_INSIGHTS_SQL.format(columns="id, site, created_at, summary, mode, details")
+    rows = get_storage().connection().execute(sql, (site, limit)).fetchall()
     
     insights = []
     for row in rows:
-        data = json.loads(row["data_json"] or "{}")
+        anomalies, forecast = unpack_insight_details(row["details"]) if row["details"] else ([], [])
         insight = Insight(
             id=row["id"],
             site=row["site"],
             created_at=row["created_at"],
             summary=row["summary"],
             mode=row["mode"],
-            anomalies=[Anomaly(**a) for a in data.get("anomalies", [])],
-            forecast_24h=[ForecastPoint(**f) for f in data.get("forecast_24h", [])]
+            anomalies=anomalies,
+            forecast_24h=forecast
         )
         insights.append(insight)
     
     return insights
 
 
-def save_plan(plan: Plan) -> int:
-    """Save plan to database. Returns plan ID."""
-    conn = sqlite3.connect(str(DB_PATH))
-    cursor = conn.cursor()
-    data_json = json.dumps({
-        "items": [item.dict() for item in plan.items]
-    })
-    cursor.execute("""
-        INSERT INTO plans (site, created_at, rationale, insight_id, data_json)
-        VALUES (?, ?, ?, ?, ?)
-    """, (plan.site, plan.created_at, plan.rationale, plan.insight_id, data_json))
-    row_id = cursor.lastrowid
-    conn.commit()
-    conn.close()
-    return row_id
+def _row_to_insight_header(row: sqlite3.Row) -> InsightHeader:
+    return InsightHeader(
+        id=row["id"],
+        site=row["site"],
+        created_at=row["created_at"],
+        summary=row["summary"],
+        mode=row["mode"],
+        anomaly_count=row["anomaly_count"],
+        severities=parse_severities(row["severities"]),
+        forecast_count=row["forecast_count"],
+        forecast_mean_kw=row["forecast_mean_kw"]
+    )
 
 
-def list_plans(site: str, limit: int = 10) -> List[Plan]:
-    """List recent plans for a site."""
-    conn = sqlite3.connect(str(DB_PATH))
-    conn.row_factory = sqlite3.Row
-    cursor = conn.cursor()
-    cursor.execute("""
-        SELECT id, site, created_at, rationale, insight_id, data_json
-        FROM plans
-        WHERE site = ?
-        ORDER BY created_at DESC
-        LIMIT ?
-    """, (site, limit))
-    rows = cursor.fetchall()
-    conn.close()
-    
-    plans = []
-    for row in rows:
-        data = json.loads(row["data_json"] or "{}")
-        plan = Plan(
-            id=row["id"],
-            site=row["site"],
-            created_at=row["created_at"],
-            rationale=row["rationale"],
-            insight_id=row["insight_id"],
-            items=[PlanItem(**item) for item in data.get("items", [])]
+@timed(STORAGE_SECONDS)
+def list_insight_headers(site: str, limit: int = 10) -> List[InsightHeader]:
+    """List recent insights for a site from their header columns (details are not read)."""
+    sql = _LIST_INSIGHTS_SQL.format(columns=_INSIGHT_HEADER_COLUMNS)
+    rows = get_storage().connection().execute(sql, (site, limit)).fetchall()
+    return [_row_to_insight_header(row) for row in rows]
+
+
+@timed(STORAGE_SECONDS)
+def list_unplanned_insights(generator_version: int) -> List[InsightHeader]:
+    """Headers of each site's latest insight that has no plan from `generator_version`, by site."""
+    rows = get_storage().connection().execute(_UNPLANNED_INSIGHTS_SQL, (generator_version,)).fetchall()
+    return [_row_to_insight_header(row) for row in rows]
+
+
+def _insert_plan(conn: sqlite3.Connection, plan: Plan, generator_version: Optional[int]) -> Tuple[int, bool]:
+    cursor = conn.execute(
+        _INSERT_PLAN_SQL,
+        (plan.site, plan.created_at, plan.rationale, plan.insight_id, *plan_columns(plan), generator_version)
+    )
+    if cursor.rowcount:
+        return cursor.lastrowid, True
+    # Lost to an earlier plan for the same insight and generator version
+    return conn.execute(_FIND_PLAN_SQL, (plan.insight_id, generator_version)).fetchone()["id"], False
+
+
+def _update_plan_context(conn: sqlite3.Connection, saved: List[Tuple[Plan, int]]):
+    conn.executemany(_COUNT_CONTEXT_SQL.format(count="plan_count"), [(plan.site,) for plan, _ in saved])
+    conn.executemany(_LATEST_PLAN_CONTEXT_SQL, [
+        (
+            plan_id, plan.created_at, len(plan.items),
+            json.dumps([item.action for item in plan.items if item.priority == "high"]),
+            plan.site, plan.created_at
         )
-        plans.append(plan)
-    
-    return plans
+        for plan, plan_id in saved
+    ])
+
+
+@timed(STORAGE_SECONDS)
+def save_plan(plan: Plan, generator_version: Optional[int] = None) -> int:
+    """
+    Save plan to database. Returns plan ID.
+
+    With a `generator_version`, at most one plan is kept per insight and
+    version: if one exists, nothing is written and its ID is returned.
+    """
+    with get_storage().transaction() as conn:
+        plan_id, inserted = _insert_plan(conn, plan, generator_version)
+        if inserted:
+            conn.execute(_BUMP_VERSION_SQL, (plan.site, "plans"))
+            _update_plan_context(conn, [(plan, plan_id)])
+    if inserted:
+        _notify_write("plans", [plan.site])
+    return plan_id
+
+
+@timed(STORAGE_SECONDS)
+def save_plans_many(plans: Iterable[Plan], generator_version: Optional[int] = None) -> List[int]:
+    """Save many plans in one transaction, as save_plan does. Returns plan IDs in input order."""
+    plans = list(plans)
+    with get_storage().transaction() as conn:
+        results = [_insert_plan(conn, plan, generator_version) for plan in plans]
+        saved = [(plan, plan_id) for plan, (plan_id, inserted) in zip(plans, results) if inserted]
+        written = sorted({plan.site for plan, _ in saved})
+        conn.executemany(_BUMP_VERSION_SQL, [(site, "plans") for site in written])
+        _update_plan_context(conn, saved)
+    _notify_write("plans", written)
+    return [plan_id for plan_id, _ in results]
+
+
+@timed(STORAGE_SECONDS)
+def answer_context(site: str) -> AnswerContext:
+    """A site's answer context: one row, kept current by every insight and plan save."""
+    row = get_storage().connection().execute(_ANSWER_CONTEXT_SQL, (site,)).fetchone()
+    if row is None:
+        return AnswerContext(site=site)
+    return AnswerContext(
+        site=row["site"],
+        insight_count=row["insight_count"],
+        insight_id=row["insight_id"],
+        anomaly_count=row["anomaly_count"],
+        severities=parse_severities(row["severities"]),
+        forecast_count=row["forecast_count"],
+        forecast_mean_kw=row["forecast_mean_kw"],
+        plan_count=row["plan_count"],
+        plan_id=row["plan_id"],
+        plan_item_count=row["plan_item_count"],
+        high_priority_actions=json.loads(row["high_priority_actions"] or "[]")
+    )
+
+
+def _leaderboard_column(metric: str) -> str:
+    if metric not in LEADERBOARD_METRICS:
+        raise ValueError(f"Unknown leaderboard metric '{metric}'. Choose from: {', '.join(LEADERBOARD_METRICS)}")
+    return LEADERBOARD_METRICS[metric]
+
+
+@timed(STORAGE_SECONDS)
+def site_leaderboard(
+    metric: str,
+    limit: int = 10,
+    ascending: bool = False,
+    sites: Optional[Sequence[str]] = None
+) -> List[LeaderboardEntry]:
+    """
+    Sites ranked by a LEADERBOARD_METRICS metric, highest first (lowest with `ascending`).
+
+    Reads `limit` rows off the metric's index, whatever the number of
+    sites. `sites` restricts the ranking to those sites, for comparisons.
+    Sites without an insight (or, for cost/CO2, without rollups) are left out.
+    """
+    column = _leaderboard_column(metric)
+    sites = list(dict.fromkeys(sites or []))
+    sql = _LEADERBOARD_SQL.format(
+        column=column,
+        order="ASC" if ascending else "DESC",
+        sites=f" AND site IN ({', '.join('?' * len(sites))})" if sites else ""
+    )
+    rows = get_storage().connection().execute(sql, (*sites, limit)).fetchall()
+    return [
+        LeaderboardEntry(rank=rank, site=row["site"], value=row["value"], insight_id=row["insight_id"])
+        for rank, row in enumerate(rows, 1)
+    ]
+
+
+@timed(STORAGE_SECONDS)
+def site_rank(metric: str, site: str, ascending: bool = False) -> Optional[LeaderboardEntry]:
+    """A site's place in the full site_leaderboard ranking (ties share a rank), or None if unranked."""
+    column = _leaderboard_column(metric)
+    row = get_storage().connection().execute(
+        f"SELECT {column} AS value, insight_id FROM answer_context WHERE site = ?", (site,)
+    ).fetchone()
+    if row is None or row["value"] is None or row["insight_id"] is None:
+        return None
+    sql = _SITE_RANK_SQL.format(column=column, beats="<" if ascending else ">")
+    rank = get_storage().connection().execute(sql, (row["value"],)).fetchone()["rank"]
+    return LeaderboardEntry(rank=rank, site=site, value=row["value"], insight_id=row["insight_id"])
+
+
+@timed(STORAGE_SECONDS)
+def known_sites(candidates: Sequence[str]) -> List[str]:
+    """The `candidates` that are analysed sites (have an answer context), in input order."""
+    candidates = list(dict.fromkeys(candidates))
+    if not candidates:
+        return []
+    sql = f"SELECT site FROM answer_context WHERE site IN ({', '.join('?' * len(candidates))})"
+    found = {row["site"] for row in get_storage().connection().execute(sql, candidates)}
+    return [site for site in candidates if site in found]
+
+
+def _row_to_plan(row: sqlite3.Row) -> Plan:
+    return Plan(
+        id=row["id"],
+        site=row["site"],
+        created_at=row["created_at"],
+        rationale=row["rationale"],
+        insight_id=row["insight_id"],
+        items=unpack_plan_items(row["details"]) if row["details"] else []
+    )
+
+
+@timed(STORAGE_SECONDS)
+def find_plan(insight_id: int, generator_version: int) -> Optional[Plan]:
+    """The plan `generator_version` produced for an insight, if any."""
+    row = get_storage().connection().execute(_FIND_PLAN_SQL, (insight_id, generator_version)).fetchone()
+    return _row_to_plan(row) if row else None
+
+
+@timed(STORAGE_SECONDS)
+def list_plans(site: str, limit: int = 10) -> List[Plan]:
+    """List recent plans for a site, with their items."""
+    sql = _LIST_PLANS_SQL.format(columns=_PLAN_COLUMNS)
+    rows = get_storage().connection().execute(sql, (site, limit)).fetchall()
+    return [_row_to_plan(row) for row in rows]
+
+
+@timed(STORAGE_SECONDS)
+def list_plan_headers(site: str, limit: int = 10) -> List[PlanHeader]:
+    """List recent plans for a site from their header columns (items are not read)."""
+    sql = _LIST_PLANS_SQL.format(columns=_PLAN_HEADER_COLUMNS)
+    rows = get_storage().connection().execute(sql, (site, limit)).fetchall()
+    return [PlanHeader(**dict(row)) for row in rows]
 
 
 # ============================================================================
-# Mock Pub/Sub Publisher
+# Local Event Bus (stands in for Pub/Sub in MOCK mode)
 # ============================================================================
 
-class MockPubSubPublisher:
-    """Mock Pub/Sub publisher for local development."""
-    
-    def __init__(self):
-        self.published: List[Dict[str, Any]] = []
-    
-    def publish(self, topic: str, data: Dict[str, Any]):
-        """Publish message to topic (mock)."""
-        message = {
-            "topic": topic,
-            "data": data,
-            "timestamp": datetime.utcnow().isoformat()
-        }
-        self.published.append(message)
-        print(f"[MOCK Pub/Sub] Published to {topic}: {json.dumps(data)[:100]}...")
+_bus: Optional[Union[EventBus, SqliteEventBus]] = None
+
+
+def get_bus():
+    """Get the local event bus (EVENT_BACKEND: "memory" or "sqlite")."""
+    global _bus
+    if _bus is None:
+        if EVENT_BACKEND == "sqlite":
+            _bus = SqliteEventBus(get_storage)
+        else:
+            _bus = EventBus()
+    return _bus
 
 
-# Global mock publisher instance
-_publisher = MockPubSubPublisher()
+def _bus_topics(field: str) -> Dict[Tuple[str, ...], float]:
+    # The sqlite bus buffers across topics: reported under topic "*"
+    if _bus is None:
+        return {}
+    stats = _bus.stats()
+    if "topics" not in stats:
+        return {("*",): stats[field]} if field in stats else {}
+    return {(topic,): values[field] for topic, values in stats["topics"].items()}
 
 
-def get_publisher() -> MockPubSubPublisher:
-    """Get the mock Pub/Sub publisher."""
-    return _publisher
+gauge("ecopulse_event_buffered", "Events held by the local event bus, by topic", ("topic",), lambda: _bus_topics("buffered"))
+gauge("ecopulse_event_max_lag", "Events the slowest subscriber has yet to read, by topic", ("topic",), lambda: _bus_topics("max_lag"))
+counter("ecopulse_events_published_total", "Events published on the local event bus", (), lambda: {} if _bus is None else {(): _bus.stats()["published"]})
+
+
+def get_publisher():
+    """Get the mock Pub/Sub publisher (the local event bus)."""
+    return get_bus()
 
 
 def publish_event(topic: str, data: Dict[str, Any]):
     """Publish event to topic."""
     if MOCK:
-        get_publisher().publish(topic, data)
+        get_bus().publish(topic, data)
+        logger.debug("Published to %s: %s", topic, data)
     else:
         # TODO: Real GCP Pub/Sub integration
         # from google.cloud import pubsub_v1
@@ -246,4 +1287,3 @@ def publish_event(topic: str, data: Dict[str, Any]):
         # topic_path = publisher.topic_path(project_id, topic)
         # publisher.publish(topic_path, json.dumps(data).encode())
         pass
-
@@ -0,0 +1,619 @@
+"""CSV ingest helpers shared by the gateway upload paths, the ingest CLI and benchmarks."""
+
+import codecs
+import csv
+import gzip
+import json
+import os
+import pickle
+import tempfile
+import time
+import zipfile
+from concurrent.futures import FIRST_COMPLETED, wait
+from itertools import repeat
+from pathlib import Path
+from typing import Any, Awaitable, BinaryIO, Callable, Dict, IO, Iterator, List, NamedTuple, Optional, Sequence, Tuple
+import numpy as np
+from . import aio
+from .gcp import (
+    CONFLICT_POLICIES, INGEST_CHUNK_SIZE, INGEST_ERROR_LIMIT, IngestCounts,
+    ingest_created_at, init_db, insert_energy_rows, save_ingest_errors
+)
+from .metrics import INGEST_ROWS, INGEST_SECONDS, timed
+from .schema import to_epoch
+
+try:
+    import zstandard
+except ImportError:  # .zst inputs are reported as per-file errors
+    zstandard = None
+
+
+# Bytes pulled from the upload per read
+UPLOAD_READ_SIZE = 1024 * 1024
+
+# Parse worker processes for multi-file ingest (at most aio.PROCESS_WORKERS),
+# and zip members per task (members of one task share a single open of
+# the archive)
+INGEST_WORKERS = int(os.getenv("INGEST_WORKERS", str(os.cpu_count() or 1)))
+ARCHIVE_TASK_FILES = 32
+
+# Parsed rows a worker holds before spilling them to its spool file; the
+# writer reads them back in batches of the same size
+PARSE_BATCH_ROWS = int(os.getenv("INGEST_PARSE_BATCH_ROWS", "100000"))
+
+# Expected CSV format: timestamp,kw[,cost_usd,co2_kg,temp_c] (any order)
+REQUIRED_COLUMNS = ("timestamp", "kw")
+OPTIONAL_COLUMNS = ("cost_usd", "co2_kg", "temp_c")
+
+# A rejected row: (line number, reason, raw row)
+Reject = Tuple[int, str, str]
+
+_ROWS_REJECTED = INGEST_ROWS.labels("rejected")
+
+
+# ============================================================================
+# Column-oriented parsing
+# ============================================================================
+
+# Digit positions and separators of "YYYY-MM-DDTHH:MM:SS"
+_TS_DIGITS = (0, 1, 2, 3, 5, 6, 8, 9, 11, 12, 14, 15, 17, 18)
+_TS_SEPARATORS = ((4, "-"), (7, "-"), (13, ":"), (16, ":"))
+_DAYS_IN_MONTH = np.array([31, 28, 31, 30, 31, 30, 31, 31, 30, 31, 30, 31])
+
+
+def _code_points(values: Sequence[str]) -> np.ndarray:
+    """values as a (len, max length) array of code points, zero-padded."""
+    size = len(values)
+    if size:
+        width = len(values[0])
+        if sum(map(len, values)) == width * size and max(map(len, values)) == width:
+            # All one length (the usual case): ASCII bytes reshape directly
+            try:
+                return np.frombuffer("".join(values).encode("ascii"), dtype=np.uint8).reshape(size, width)
+            except UnicodeEncodeError:
+                pass
+    text = np.array(values, dtype=str)
+    return text.view(np.uint32).reshape(size, text.dtype.itemsize // 4)
+
+
+def parse_timestamps(values: Sequence[str]) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Vectorized to_epoch. Returns (epochs, ok), ok False where invalid.
+
+    "YYYY-MM-DD[T ]HH:MM:SS" followed by nothing (UTC), "Z" or "+HH:MM"
+    is decoded from the strings' code points in bulk and range-checked.
+    Any other layout (fractional seconds, date only, ...) falls back to
+    to_epoch per value, so both accept exactly the same timestamps.
+    """
+    size = len(values)
+    epochs = np.zeros(size, dtype=np.int64)
+    fast = np.zeros(size, dtype=bool)
+    codes = _code_points(values)
+    width = codes.shape[1]
+    if size and width >= 19:
+        length = np.count_nonzero(codes, axis=1)
+
+        def number(*positions) -> Tuple[np.ndarray, np.ndarray]:
+            value = np.zeros(size, dtype=np.int64)
+            ok = np.ones(size, dtype=bool)
+            for pos in positions:
+                digit = codes[:, pos].astype(np.int64) - 48
+                ok &= (digit >= 0) & (digit <= 9)
+                value = value * 10 + digit
+            return value, ok
+
+        fast = (codes[:, 10] == ord("T")) | (codes[:, 10] == ord(" "))
+        for pos, sep in _TS_SEPARATORS:
+            fast &= codes[:, pos] == ord(sep)
+        parts = [number(0, 1, 2, 3), number(5, 6), number(8, 9), number(11, 12), number(14, 15), number(17, 18)]
+        for _, ok in parts:
+            fast &= ok
+        year, month, day, hour, minute, second = (value for value, _ in parts)
+
+        offset = np.zeros(size, dtype=np.int64)
+        tail = length == 19
+        if width >= 20:
+            tail |= (length == 20) & (codes[:, 19] == ord("Z"))
+        if width >= 25:
+            (zone_hours, hours_ok), (zone_minutes, minutes_ok) = number(20, 21), number(23, 24)
+            signed = (length == 25) & ((codes[:, 19] == ord("+")) | (codes[:, 19] == ord("-"))) & (codes[:, 22] == ord(":"))
+            signed &= hours_ok & minutes_ok & (zone_hours < 24) & (zone_minutes < 60)
+            sign = np.where(codes[:, 19] == ord("-"), -1, 1)
+            offset = np.where(signed, sign * (zone_hours * 3600 + zone_minutes * 60), 0)
+            tail |= signed
+        fast &= tail
+
+        leap = (year % 4 == 0) & ((year % 100 != 0) | (year % 400 == 0))
+        month_days = _DAYS_IN_MONTH[np.clip(month, 1, 12) - 1] + ((month == 2) & leap)
+        fast &= (year >= 1) & (month >= 1) & (month <= 12) & (day >= 1) & (day <= month_days)
+        fast &= (hour < 24) & (minute < 60) & (second < 60)
+
+        # Days since the epoch from a proleptic Gregorian date (days_from_civil)
+        y = year - (month <= 2)
+        era = y // 400
+        yoe = y - era * 400
+        doy = (153 * ((month + 9) % 12) + 2) // 5 + day - 1
+        days = era * 146097 + yoe * 365 + yoe // 4 - yoe // 100 + doy - 719468
+        epochs = np.where(fast, days * 86400 + hour * 3600 + minute * 60 + second - offset, 0)
+
+    ok = fast.copy()
+    for i in np.flatnonzero(~fast).tolist():
+        try:
+            epochs[i] = to_epoch(values[i])
+            ok[i] = True
+        except (ValueError, TypeError, OverflowError):
+            pass
+    return epochs, ok
+
+
+def _float_column(values: List[str]) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Parse strings to float64 in bulk. Returns (values, blank, bad); NaN where blank or bad."""
+    size = len(values)
+    blank = np.zeros(size, dtype=bool)
+    if "" in values:
+        blank = np.fromiter((not v for v in values), dtype=bool, count=size)
+        values = [v or "nan" for v in values]
+    try:
+        return np.array(values, dtype=np.float64), blank, np.zeros(size, dtype=bool)
+    except ValueError:
+        pass
+    parsed = np.full(size, np.nan)
+    bad = np.zeros(size, dtype=bool)
+    for i, value in enumerate(values):
+        try:
+            parsed[i] = float(value)
+        except ValueError:
+            bad[i] = True
+    return parsed, blank, bad
+
+
+class EnergyCsvParser:
+    """
+    Column-oriented parser for energy CSV rows.
+
+    The header is resolved once into field positions. Each batch of rows
+    is split positionally into columns and converted in bulk (floats to
+    float64 arrays, timestamps via parse_timestamps); validation is done
+    with array masks. Rows that fail are returned as rejects with their
+    line number and reasons rather than dropped.
+    """
+
+    def __init__(self, header: List[str], site: str):
+        missing = [name for name in REQUIRED_COLUMNS if name not in header]
+        if missing:
+            raise ValueError(f"missing CSV columns: {', '.join(missing)}")
+        self.site = site
+        self.width = len(header)
+        # Last occurrence wins for repeated names, as with csv.DictReader
+        self.positions = {name: i for i, name in enumerate(header) if name in REQUIRED_COLUMNS + OPTIONAL_COLUMNS}
+
+    def parse(self, rows: List[List[str]], lines: Sequence[int]) -> Tuple[List[tuple], List[Reject]]:
+        """Parse csv.reader rows into storage rows (see gcp.energy_row) and rejects."""
+        original = rows
+        needed = max(self.positions.values()) + 1
+        if min(map(len, rows)) < needed:
+            # Short rows read as blanks for the missing fields
+            rows = [row if len(row) >= needed else row + [""] * (needed - len(row)) for row in rows]
+        return self._parse(
+            lambda pos: [row[pos] for row in rows], len(rows), lines,
+            lambda i: ",".join(original[i])
+        )
+
+    def parse_fields(self, fields: List[str], lines: Sequence[int]) -> Tuple[List[tuple], List[Reject]]:
+        """parse() for rows of exactly `width` fields, flattened into one list."""
+        width = self.width
+        return self._parse(
+            lambda pos: fields[pos::width], len(fields) // width, lines,
+            lambda i: ",".join(fields[i * width:(i + 1) * width])
+        )
+
+    def _parse(
+        self,
+        column: Callable[[int], List[str]],
+        size: int,
+        lines: Sequence[int],
+        raw: Callable[[int], str]
+    ) -> Tuple[List[tuple], List[Reject]]:
+        timestamps = column(self.positions["timestamp"])
+        epochs, ts_ok = parse_timestamps(timestamps)
+        ts_blank = np.zeros(size, dtype=bool)
+        if "" in timestamps:
+            ts_blank = np.fromiter((not v for v in timestamps), dtype=bool, count=size)
+        problems = [(ts_blank, "timestamp: missing"), (~ts_ok & ~ts_blank, "timestamp: not ISO-8601")]
+
+        floats = {}
+        for name in REQUIRED_COLUMNS[1:] + OPTIONAL_COLUMNS:
+            if name not in self.positions:
+                continue
+            values, blank, bad = _float_column(column(self.positions[name]))
+            if name in REQUIRED_COLUMNS:
+                problems.append((blank, f"{name}: missing"))
+            problems += [(bad, f"{name}: not a number"), (~np.isfinite(values) & ~blank & ~bad, f"{name}: not finite")]
+            floats[name] = (values, blank)
+
+        rejected = np.zeros(size, dtype=bool)
+        for mask, _ in problems:
+            rejected |= mask
+
+        def optional(name: str):
+            if name not in floats:
+                return repeat(None)
+            values, blank = floats[name]
+            values = values.tolist()
+            for i in np.flatnonzero(blank).tolist():
+                values[i] = None
+            return values
+
+        parsed = list(zip(
+            timestamps, epochs.tolist(), floats["kw"][0].tolist(), repeat(self.site),
+            *(optional(name) for name in OPTIONAL_COLUMNS)
+        ))
+        if not rejected.any():
+            return parsed, []
+        rejects = [
+            (lines[i], "; ".join(reason for mask, reason in problems if mask[i]), raw(i))
+            for i in np.flatnonzero(rejected).tolist()
+        ]
+        return [parsed[i] for i in np.flatnonzero(~rejected).tolist()], rejects
+
+
+class CsvRecordSplitter:
+    """
+    Incrementally decode bytes and split them into complete CSV records.
+
+    A line only closes a record when the quotes seen so far are balanced,
+    so quoted fields containing newlines are never cut at a chunk boundary.
+    Records are returned without their final newline; `lines` counts the
+    physical lines consumed so far.
+    """
+
+    def __init__(self, encoding: str = "utf-8"):
+        self._decoder = codecs.getincrementaldecoder(encoding)()
+        self._tail = ""
+        self._record: List[str] = []
+        self.lines = 0
+
+    def feed(self, data: bytes, final: bool = False) -> List[str]:
+        """Feed a chunk of bytes; return the records it completed."""
+        text = self._tail + self._decoder.decode(data, final)
+        lines = text.split("\n")
+        self._tail = lines.pop()
+        if final and self._tail:
+            lines.append(self._tail)
+            self._tail = ""
+        self.lines += len(lines)
+        if not self._record and '"' not in text:
+            # No quoting in this chunk: every line is a record
+            return lines
+
+        records = []
+        for line in lines:
+            self._record.append(line)
+            if sum(part.count('"') for part in self._record) % 2 == 0:
+                records.append("\n".join(self._record))
+                self._record = []
+        if final and self._record:
+            records.append("\n".join(self._record))
+            self._record = []
+        return records
+
+
+class EnergyCsvReader:
+    """
+    Incremental energy CSV reader: bytes in, (storage rows, rejects) out.
+
+    Splits records with CsvRecordSplitter, takes the first non-blank
+    record as the header and parses the rest with EnergyCsvParser,
+    tracking the line each record starts on for the rejects.
+    """
+
+    def __init__(self, site: str):
+        self.site = site
+        self._splitter = CsvRecordSplitter()
+        self._parser: Optional[EnergyCsvParser] = None
+
+    def feed(self, data: bytes, final: bool = False) -> Tuple[List[tuple], List[Reject]]:
+        first = self._splitter.lines + 1
+        records = self._splitter.feed(data, final)
+        if self._splitter.lines - first + 1 == len(records):
+            # One line per record
+            starts = range(first, first + len(records))
+        else:
+            starts = []
+            line = first
+            for record in records:
+                starts.append(line)
+                line += record.count("\n") + 1
+
+        if self._parser is None:
+            while records and not records[0]:
+                records, starts = records[1:], starts[1:]
+            if not records:
+                return [], []
+            self._parser = EnergyCsvParser(next(csv.reader(records[:1])), self.site)
+            records, starts = records[1:], starts[1:]
+        if not records:
+            return [], []
+
+        # Fast path: no quoting or CRs and every line has exactly the
+        # header's fields, so one split yields all fields in row order
+        width = self._parser.width
+        joined = ",".join(records)
+        if '"' not in joined and "\r" not in joined and [r.count(",") for r in records].count(width - 1) == len(records):
+            return self._parser.parse_fields(joined.split(","), starts)
+
+        rows = list(csv.reader(records))
+        if [] in rows:
+            starts = [start for start, values in zip(starts, rows) if values]
+            rows = [values for values in rows if values]
+        if not rows:
+            return [], []
+        return self._parser.parse(rows, starts)
+
+
+class UploadResult(NamedTuple):
+    """Outcome of one upload: write counts, rejected rows and their error report id (if any)."""
+    counts: IngestCounts
+    rejected: int = 0
+    error_report: Optional[str] = None
+
+
+@timed(INGEST_SECONDS)
+async def ingest_csv_stream(
+    read: Callable[[int], Awaitable[bytes]],
+    site: str,
+    batch_size: int = INGEST_CHUNK_SIZE,
+    read_size: int = UPLOAD_READ_SIZE,
+    policy: Optional[str] = None,
+    filename: Optional[str] = None,
+    as_of: Optional[str] = None
+) -> UploadResult:
+    """
+    Stream a CSV upload into storage.
+
+    `read` is an async callable such as UploadFile.read. Bytes are pulled
+    `read_size` at a time, decoded incrementally and parsed column-wise
+    (EnergyCsvReader) as records complete; valid rows are flushed every
+    `batch_size` rows on the storage thread pool, so memory is bounded by
+    the batch rather than the file and the event loop keeps serving while
+    rows are written. Every batch is stamped with `as_of`, the data's
+    source time (default the upload's start time), which is what the
+    "latest" conflict policy compares.
+
+    Rejected rows (the first INGEST_ERROR_LIMIT of them) are saved as an
+    error report, whose id is returned with the counts.
+    """
+    reader = EnergyCsvReader(site)
+    batch: List[tuple] = []
+    rejects: List[Reject] = []
+    rejected = 0
+    counts = IngestCounts()
+    created_at = ingest_created_at(as_of)
+
+    while True:
+        data = await read(read_size)
+        rows, bad = reader.feed(data, final=not data)
+        rejected += len(bad)
+        _ROWS_REJECTED.inc(len(bad))
+        rejects += bad[:INGEST_ERROR_LIMIT - len(rejects)]
+        batch += rows
+        while len(batch) >= batch_size:
+            counts += await aio.insert_energy_rows(batch[:batch_size], batch_size, policy, created_at)
+            batch = batch[batch_size:]
+        if not data:
+            break
+
+    if batch:
+        counts += await aio.insert_energy_rows(batch, batch_size, policy, created_at)
+    report = None
+    if rejects:
+        report = await aio.run(save_ingest_errors, site, [(filename, *reject) for reject in rejects])
+    return UploadResult(counts, rejected, report)
+
+
+# ============================================================================
+# Multi-file and archive ingest
+# ============================================================================
+
+def _decompress(name: str, raw: BinaryIO) -> BinaryIO:
+    """Wrap a raw stream in a streaming decompressor chosen by file suffix."""
+    suffix = Path(name).suffix.lower()
+    if suffix == ".gz":
+        return gzip.GzipFile(fileobj=raw)
+    if suffix == ".zst":
+        if zstandard is None:
+            raise ValueError("zstandard is not installed; cannot read .zst files")
+        return zstandard.ZstdDecompressor().stream_reader(raw)
+    if suffix == ".zip":
+        raise ValueError("nested archives are not supported")
+    return raw
+
+
+def _parse_stream(stream: BinaryIO, site: str, spool: IO[bytes]) -> Tuple[int, int, List[Reject]]:
+    """
+    Parse one decompressed CSV, pickling storage rows to `spool` in
+    batches of PARSE_BATCH_ROWS. Returns (rows, rejected, first rejects).
+    """
+    reader = EnergyCsvReader(site)
+    batch: List[tuple] = []
+    count = rejected = 0
+    rejects: List[Reject] = []
+    while True:
+        data = stream.read(UPLOAD_READ_SIZE)
+        parsed, bad = reader.feed(data, final=not data)
+        batch += parsed
+        rejected += len(bad)
+        rejects += bad[:INGEST_ERROR_LIMIT - len(rejects)]
+        if len(batch) >= PARSE_BATCH_ROWS or (batch and not data):
+            pickle.dump(batch, spool, pickle.HIGHEST_PROTOCOL)
+            count += len(batch)
+            batch = []
+        if not data:
+            return count, rejected, rejects
+
+
+def _spooled_rows(path: str) -> Iterator[tuple]:
+    """Rows pickled by _parse_stream, one batch in memory at a time."""
+    with open(path, "rb") as spool:
+        while True:
+            try:
+                yield from pickle.load(spool)
+            except EOFError:
+                return
+
+
+def _parse_task(path: str, name: str, members: List[Optional[str]], site: str, spool_dir: str) -> List[Dict[str, Any]]:
+    """
+    Parse a file, or a group of members of a zip archive, in a worker.
+
+    Returns one result per file: {"file", "spool", "rows", "rejected",
+    "rejects"}, where "spool" is a file in `spool_dir` holding the
+    storage rows ready to write (see _spooled_rows) and "rejects" the
+    first INGEST_ERROR_LIMIT rejects, or {"file", "error"}. Memory is
+    bounded by PARSE_BATCH_ROWS, not by file size, and a bad file never
+    fails the others.
+    """
+    results = []
+    archive = zipfile.ZipFile(path) if members != [None] else None
+    try:
+        for member in members:
+            label = f"{name}/{member}" if member else name
+            fd, spool_path = tempfile.mkstemp(dir=spool_dir)
+            try:
+                with open(fd, "wb") as spool, (archive.open(member) if archive else open(path, "rb")) as raw:
+                    with _decompress(member or name, raw) as stream:
+                        rows, rejected, rejects = _parse_stream(stream, site, spool)
+                results.append({"file": label, "spool": spool_path, "rows": rows, "rejected": rejected, "rejects": rejects})
+            except Exception as e:
+                os.unlink(spool_path)
+                results.append({"file": label, "error": str(e)})
+    finally:
+        if archive is not None:
+            archive.close()
+    return results
+
+
+def _tasks(path: str, name: str) -> List[Tuple[str, str, List[Optional[str]]]]:
+    """Split an input into parse tasks: groups of zip members, or the file itself."""
+    if Path(name).suffix.lower() != ".zip":
+        return [(path, name, [None])]
+    with zipfile.ZipFile(path) as archive:
+        members = [info.filename for info in archive.infolist() if not info.is_dir()]
+    return [(path, name, members[i:i + ARCHIVE_TASK_FILES]) for i in range(0, len(members), ARCHIVE_TASK_FILES)]
+
+
+def _parse_all(tasks: List[tuple], site: str, workers: int, spool_dir: str) -> Iterator[List[Dict[str, Any]]]:
+    """
+    Yield parse results as tasks finish, with at most `workers` tasks in
+    flight on the shared process pool (see aio.get_process_pool).
+    """
+    if workers <= 1:
+        for task in tasks:
+            yield _parse_task(*task, site, spool_dir)
+        return
+    pool = aio.get_process_pool()
+    pending = set()
+    for task in tasks:
+        pending.add(pool.submit(_parse_task, *task, site, spool_dir))
+        if len(pending) >= workers:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                yield future.result()
+    while pending:
+        done, pending = wait(pending, return_when=FIRST_COMPLETED)
+        for future in done:
+            yield future.result()
+
+
+@timed(INGEST_SECONDS)
+def ingest_files(
+    files: Sequence[Tuple[str, str]],
+    site: str,
+    workers: int = INGEST_WORKERS,
+    policy: Optional[str] = None,
+    chunk_size: int = INGEST_CHUNK_SIZE,
+    as_of: Optional[str] = None
+) -> Dict[str, Any]:
+    """
+    Ingest many CSV files and archives for a site. Returns a report.
+
+    `files` are (path, name) pairs; `name` picks the format by suffix:
+    .gz and .zst are decompressed as a stream, every file in a .zip is
+    ingested (members may themselves be .gz/.zst), anything else is read
+    as plain CSV (timestamp,kw[,cost_usd,co2_kg,temp_c]). Files are
+    parsed concurrently on `workers` processes (clamped to the CPU count)
+    and spooled to temporary files, so neither the workers nor this
+    process hold more than PARSE_BATCH_ROWS rows of a file at once; this
+    process is the only writer and stores each file's rows as soon as it
+    is parsed, in
+    `chunk_size` transactions, all stamped with one created_at (`as_of`,
+    default now; see ingest_csv_stream). Files
+    finish in any order, so two files with different values for the same
+    reading leave either one under "replace"/"latest".
+
+    The report lists per-file row/rejected/inserted/updated/skipped
+    counts or the file's error, totals, the id of the error report
+    holding rejected rows (see ingest_csv_stream), and rows/sec next to
+    the worker and CPU counts.
+    """
+    start = time.perf_counter()
+    created_at = ingest_created_at(as_of)
+    workers = aio.clamp_workers(workers)
+    report: List[Dict[str, Any]] = []
+    tasks = []
+    for path, name in files:
+        try:
+            tasks += _tasks(path, name)
+        except Exception as e:
+            report.append({"file": name, "error": str(e)})
+
+    rejects: List[Tuple[str, int, str, str]] = []
+    with tempfile.TemporaryDirectory(prefix="ingest-") as spool_dir:
+        for results in _parse_all(tasks, site, workers, spool_dir):
+            for result in results:
+                if "spool" in result:
+                    rejects += [(result["file"], *reject) for reject in result["rejects"][:INGEST_ERROR_LIMIT - len(rejects)]]
+                    spool = result["spool"]
+                    try:
+                        counts = insert_energy_rows(_spooled_rows(spool), chunk_size, policy, created_at)
+                        result = {"file": result["file"], "rows": result["rows"], "rejected": result["rejected"], **counts._asdict()}
+                    except Exception as e:
+                        result = {"file": result["file"], "error": str(e)}
+                    finally:
+                        os.unlink(spool)
+                report.append(result)
+
+    report.sort(key=lambda r: r["file"])
+    totals = {key: sum(r.get(key, 0) for r in report) for key in ("rows", "rejected", "inserted", "updated", "skipped")}
+    totals.update(files=len(report), errors=sum("error" in r for r in report))
+    _ROWS_REJECTED.inc(totals["rejected"])
+    seconds = time.perf_counter() - start
+    return {
+        "files": report,
+        "totals": totals,
+        "error_report": save_ingest_errors(site, rejects) if rejects else None,
+        "seconds": round(seconds, 3),
+        "rows_per_sec": round(totals["rows"] / seconds) if seconds else 0,
+        "workers": workers,
+        "cpu_count": os.cpu_count()
+    }
+
+
+if __name__ == "__main__":
+    # Bulk or backfill ingest from disk, same code path as POST /upload/batch:
+    #   cd services && python -m common.ingest --site plant-a [--workers N] file.csv.gz backfill.zip ...
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Ingest CSV files and .gz/.zip/.zst archives")
+    parser.add_argument("files", nargs="+")
+    parser.add_argument("--site", required=True)
+    parser.add_argument("--workers", type=int, default=INGEST_WORKERS)
+    parser.add_argument("--on-conflict", choices=CONFLICT_POLICIES)
+    parser.add_argument("--chunk-size", type=int, default=INGEST_CHUNK_SIZE)
+    parser.add_argument("--as-of", help="Source time of the data (ISO-8601), compared by --on-conflict latest")
+    args = parser.parse_args()
+    init_db()
+    result = ingest_files([(f, f) for f in args.files], args.site, args.workers, args.on_conflict, args.chunk_size, args.as_of)
+    for line in result["files"]:
+        print(json.dumps(line))
+    print(json.dumps({k: v for k, v in result.items() if k != "files"}))
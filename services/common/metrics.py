@@ -0,0 +1,389 @@
+"""In-process counters, gauges and histograms, served on /metrics in Prometheus text format."""
+
+import asyncio
+import functools
+import os
+import threading
+import time
+from collections import deque
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+import numpy as np
+
+
+# Set METRICS_ENABLED=0 to leave functions undecorated and skip request timing
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "1") == "1"
+
+# Histogram bucket upper bounds, in seconds: 100µs to 30s
+LATENCY_BUCKETS = (
+    0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05,
+    0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0
+)
+
+CONTENT_TYPE = "text/plain; version=0.0.4"
+
+# Observations buffered per histogram before they are folded into buckets
+FOLD_SIZE = 512
+
+# Label values -> sample value, read from elsewhere at scrape time
+Collector = Callable[[], Dict[Tuple[str, ...], float]]
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names: Sequence[str], values: Sequence[str]) -> str:
+    if not names:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in zip(names, values)) + "}"
+
+
+def _number(value: float) -> str:
+    value = float(value)
+    if value != value:
+        return "NaN"
+    if value in (float("inf"), float("-inf")):
+        return "+Inf" if value > 0 else "-Inf"
+    return str(int(value)) if value.is_integer() else repr(value)
+
+
+class _Value:
+    """One labelled counter or gauge sample."""
+
+    __slots__ = ("value", "_lock")
+
+    def __init__(self):
+        self.value = 0.0
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1):
+        with self._lock:
+            self.value += amount
+
+    def dec(self, amount: float = 1):
+        with self._lock:
+            self.value -= amount
+
+    def set(self, value: float):
+        self.value = value
+
+
+class _Buckets:
+    """
+    One labelled histogram: per-bucket counts (not cumulative until
+    rendered), sum and count.
+
+    observe() only appends to a deque (thread-safe without a lock); every
+    FOLD_SIZE observations, and on each scrape, the backlog is drained
+    under the lock and bucketed in one NumPy pass.
+    """
+
+    __slots__ = ("bounds", "counts", "sum", "_pending", "_lock")
+
+    def __init__(self, bounds: Tuple[float, ...]):
+        self.bounds = np.array(bounds, dtype=np.float64)
+        self.counts = np.zeros(len(bounds) + 1, dtype=np.int64)
+        self.sum = 0.0
+        self._pending = deque()
+        self._lock = threading.Lock()
+
+    def observe(self, value: float):
+        pending = self._pending
+        pending.append(value)
+        if len(pending) >= FOLD_SIZE:
+            self.fold()
+
+    def fold(self):
+        with self._lock:
+            # Only this method pops: the first `size` entries are ours to take
+            pending = self._pending
+            size = len(pending)
+            if not size:
+                return
+            values = np.fromiter((pending.popleft() for _ in range(size)), dtype=np.float64, count=size)
+            # le buckets: the first bound >= value; past the last bound is +Inf
+            self.counts += np.bincount(np.searchsorted(self.bounds, values, "left"), minlength=self.counts.size)
+            self.sum += float(values.sum())
+
+    def snapshot(self) -> Tuple[List[int], float]:
+        self.fold()
+        with self._lock:
+            return self.counts.tolist(), self.sum
+
+
+class Metric:
+    """
+    A named metric family: one child per combination of label values.
+
+    `labels(*values)` returns the child to update; look it up once and
+    keep it where the call is hot. Metrics without labels forward
+    inc/dec/set/observe to their only child. A metric built with
+    `collect` has no children of its own and is read from the callback
+    whenever /metrics is scraped.
+    """
+
+    kind = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (), collect: Optional[Collector] = None):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.collect = collect
+        self._children: Dict[Tuple[str, ...], object] = {}
+        self._lock = threading.Lock()
+        if not self.labelnames and collect is None:
+            # The only child exists up front, so it is exported as 0 before first use
+            self.labels()
+
+    def _new_child(self):
+        return _Value()
+
+    def labels(self, *values: str):
+        child = self._children.get(values)
+        if child is None:
+            if len(values) != len(self.labelnames):
+                raise ValueError(f"{self.name} takes labels {self.labelnames}, got {values}")
+            with self._lock:
+                child = self._children.setdefault(tuple(str(v) for v in values), self._new_child())
+        return child
+
+    def inc(self, amount: float = 1):
+        self.labels().inc(amount)
+
+    def dec(self, amount: float = 1):
+        self.labels().dec(amount)
+
+    def set(self, value: float):
+        self.labels().set(value)
+
+    def samples(self) -> List[Tuple[str, Tuple[str, ...], float]]:
+        if self.collect is not None:
+            return [("", tuple(str(v) for v in key), value) for key, value in self.collect().items()]
+        with self._lock:
+            children = list(self._children.items())
+        return [("", key, child.value) for key, child in children]
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {_escape(self.documentation)}", f"# TYPE {self.name} {self.kind}"]
+        for suffix, values, value in self.samples():
+            lines.append(f"{self.name}{suffix}{_labels(self.labelnames, values)} {_number(value)}")
+        return lines
+
+
+class Counter(Metric):
+    kind = "counter"
+
+
+class Gauge(Metric):
+    kind = "gauge"
+
+
+class Histogram(Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = LATENCY_BUCKETS):
+        self.buckets = tuple(sorted(buckets))
+        super().__init__(name, documentation, labelnames)
+
+    def _new_child(self):
+        return _Buckets(self.buckets)
+
+    def observe(self, value: float):
+        self.labels().observe(value)
+
+    def samples(self) -> List[Tuple[str, Tuple[str, ...], float]]:
+        with self._lock:
+            children = list(self._children.items())
+        samples = []
+        for key, child in children:
+            counts, total = child.snapshot()
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                samples.append(("_bucket", key + (_number(bound),), cumulative))
+            samples.append(("_sum", key, total))
+            samples.append(("_count", key, cumulative))
+        return samples
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {_escape(self.documentation)}", f"# TYPE {self.name} histogram"]
+        bucket_labels = self.labelnames + ("le",)
+        for suffix, values, value in self.samples():
+            names = bucket_labels if suffix == "_bucket" else self.labelnames
+            lines.append(f"{self.name}{suffix}{_labels(names, values)} {_number(value)}")
+        return lines
+
+
+class Registry:
+    """Metrics rendered together on /metrics, by name."""
+
+    def __init__(self):
+        self._metrics: Dict[str, Metric] = {}
+        self._lock = threading.Lock()
+
+    def register(self, metric: Metric) -> Metric:
+        """
+        Add `metric`, or return the one already registered under its name.
+
+        Re-registering keeps existing samples, so modules (and services
+        sharing a process) may declare the same metric; a new `collect`
+        callback replaces the old one.
+        """
+        with self._lock:
+            existing = self._metrics.get(metric.name)
+            if existing is None:
+                self._metrics[metric.name] = metric
+                return metric
+        if type(existing) is not type(metric) or existing.labelnames != metric.labelnames:
+            raise ValueError(f"Metric '{metric.name}' is already registered as a {existing.kind} with labels {existing.labelnames}")
+        if metric.collect is not None:
+            existing.collect = metric.collect
+        return existing
+
+    def render(self) -> str:
+        with self._lock:
+            metrics = sorted(self._metrics.values(), key=lambda m: m.name)
+        lines = []
+        for metric in metrics:
+            lines += metric.render()
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+
+def counter(name: str, documentation: str, labelnames: Sequence[str] = (), collect: Optional[Collector] = None) -> Counter:
+    return REGISTRY.register(Counter(name, documentation, labelnames, collect))
+
+
+def gauge(name: str, documentation: str, labelnames: Sequence[str] = (), collect: Optional[Collector] = None) -> Gauge:
+    return REGISTRY.register(Gauge(name, documentation, labelnames, collect))
+
+
+def histogram(name: str, documentation: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = LATENCY_BUCKETS) -> Histogram:
+    return REGISTRY.register(Histogram(name, documentation, labelnames, buckets))
+
+
+def render() -> str:
+    """Every registered metric in Prometheus text format 0.0.4."""
+    return REGISTRY.render()
+
+
+# ============================================================================
+# Shared metrics
+# ============================================================================
+
+HTTP_REQUEST_SECONDS = histogram(
+    "ecopulse_http_request_duration_seconds", "HTTP request latency by route template and status",
+    ("method", "route", "status")
+)
+STORAGE_SECONDS = histogram("ecopulse_storage_duration_seconds", "Storage helper call duration", ("helper",))
+ANALYSIS_SECONDS = histogram("ecopulse_analysis_duration_seconds", "Analysis function duration", ("function",))
+INGEST_SECONDS = histogram("ecopulse_ingest_duration_seconds", "Upload ingest duration, parse to last write", ("function",))
+INGEST_ROWS = counter(
+    "ecopulse_ingest_rows_total",
+    "Energy rows ingested by outcome: inserted, updated, skipped (unchanged or duplicate) or rejected (unparseable)",
+    ("outcome",)
+)
+READ_ROWS = counter("ecopulse_read_rows_total", "Energy rows read, by source (sqlite or columnar)", ("source",))
+STORAGE_QUEUE_SECONDS = histogram("ecopulse_storage_queue_wait_seconds", "Time storage calls wait for a pool thread")
+
+
+def timed(metric: Histogram, name: Optional[str] = None):
+    """
+    Decorator observing each call's duration (exceptions included) in
+    `metric`, labelled with `name` or the function's name. Works on
+    plain and async functions; a no-op when METRICS_ENABLED is off.
+    """
+    def decorate(fn):
+        if not METRICS_ENABLED:
+            return fn
+        observe = metric.labels(name or fn.__name__).observe
+        clock = time.perf_counter
+
+        if asyncio.iscoroutinefunction(fn):
+            @functools.wraps(fn)
+            async def timed_async(*args, **kwargs):
+                start = clock()
+                try:
+                    return await fn(*args, **kwargs)
+                finally:
+                    observe(clock() - start)
+            return timed_async
+
+        @functools.wraps(fn)
+        def timed_call(*args, **kwargs):
+            start = clock()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                observe(clock() - start)
+        return timed_call
+
+    return decorate
+
+
+# ============================================================================
+# HTTP
+# ============================================================================
+
+class MetricsMiddleware:
+    """
+    ASGI middleware timing every HTTP request into HTTP_REQUEST_SECONDS.
+
+    Requests are labelled with the matched route's path template (e.g.
+    /upload/errors/{report_id}), so label sets stay bounded whatever the
+    URLs; anything that matches no route counts as "unmatched".
+    """
+
+    def __init__(self, app, routes_app=None):
+        self.app = app
+        self.routes_app = routes_app
+        self._templates: Dict[object, str] = {}
+
+    def _template(self, scope) -> str:
+        endpoint = scope.get("endpoint")
+        if endpoint is None:
+            return "unmatched"
+        template = self._templates.get(endpoint)
+        if template is None:
+            # Routes registered after startup are picked up on first use
+            routes = self.routes_app.routes if self.routes_app is not None else scope["app"].routes
+            self._templates = {getattr(route, "endpoint", None): getattr(route, "path", "") for route in routes}
+            template = self._templates.setdefault(endpoint, "unmatched")
+        return template
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        start = time.perf_counter()
+        status = 500
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            HTTP_REQUEST_SECONDS.labels(scope["method"], self._template(scope), str(status)).observe(
+                time.perf_counter() - start
+            )
+
+
+def instrument_app(app):
+    """Time every request to a FastAPI app and serve the registry on GET /metrics."""
+    from fastapi import Response
+
+    if METRICS_ENABLED:
+        app.add_middleware(MetricsMiddleware, routes_app=app)
+
+    @app.get("/metrics", include_in_schema=False)
+    async def metrics():
+        """Prometheus scrape endpoint."""
+        return Response(content=render(), media_type=CONTENT_TYPE)
+
+    return app
@@ -1,8 +1,10 @@
 """Pydantic models for EcoPulse services."""
 
-from datetime import datetime
-from typing import List, Optional
+from datetime import datetime, timezone
+from typing import Dict, Iterator, List, Optional, Sequence, Union
+import numpy as np
 from pydantic import BaseModel, Field
+from .schema import to_epoch
 
 
 class EnergyPoint(BaseModel):
@@ -15,6 +17,138 @@ class EnergyPoint(BaseModel):
     temp_c: Optional[float] = None
 
 
+def _optional_column(values, size: int) -> Optional[np.ndarray]:
+    if values is None:
+        return None
+    column = np.asarray(values, dtype=np.float64)
+    if column.shape != (size,):
+        raise ValueError(f"Column length {column.shape} does not match {size} rows")
+    return column
+
+
+class EnergySeries:
+    """
+    Column-backed energy readings for one site, oldest first.
+
+    Holds ts_epoch, kw and the optional cost_usd/co2_kg/temp_c columns as
+    NumPy arrays (NaN where missing; None when the whole column is absent)
+    instead of one EnergyPoint per row. Points are built lazily, on
+    indexing or iteration, so hot paths work on the arrays and only API
+    boundaries pay for models. Slices share the underlying buffers.
+    `timestamps` keeps the original ISO strings when known; otherwise
+    they are formatted from ts_epoch in UTC.
+    """
+
+    __slots__ = ("site", "ts_epoch", "kw", "cost_usd", "co2_kg", "temp_c", "timestamps")
+
+    def __init__(
+        self,
+        site: str,
+        ts_epoch: Sequence[int],
+        kw: Sequence[float],
+        cost_usd: Optional[Sequence[float]] = None,
+        co2_kg: Optional[Sequence[float]] = None,
+        temp_c: Optional[Sequence[float]] = None,
+        timestamps: Optional[Sequence[str]] = None
+    ):
+        self.site = site
+        self.ts_epoch = np.asarray(ts_epoch, dtype=np.int64)
+        self.kw = np.asarray(kw, dtype=np.float64)
+        size = self.ts_epoch.size
+        if self.kw.shape != (size,):
+            raise ValueError(f"Column length {self.kw.shape} does not match {size} rows")
+        self.cost_usd = _optional_column(cost_usd, size)
+        self.co2_kg = _optional_column(co2_kg, size)
+        self.temp_c = _optional_column(temp_c, size)
+        self.timestamps = timestamps
+
+    @classmethod
+    def from_arrays(cls, site: str, arrays: Dict[str, np.ndarray], timestamps: Optional[Sequence[str]] = None) -> "EnergySeries":
+        """Build from read_energy_arrays-style columns."""
+        return cls(
+            site, arrays["ts_epoch"], arrays["kw"],
+            arrays.get("cost_usd"), arrays.get("co2_kg"), arrays.get("temp_c"),
+            timestamps
+        )
+
+    @classmethod
+    def from_points(cls, points: Sequence[EnergyPoint], site: Optional[str] = None) -> "EnergySeries":
+        """Build from EnergyPoints (kept in the given order)."""
+        nan = float("nan")
+        size = len(points)
+
+        def column(name):
+            values = [getattr(p, name) for p in points]
+            if all(v is None for v in values):
+                return None
+            return np.fromiter((nan if v is None else v for v in values), dtype=np.float64, count=size)
+
+        return cls(
+            site if site is not None else (points[0].site if size else ""),
+            np.fromiter((to_epoch(p.timestamp) for p in points), dtype=np.int64, count=size),
+            np.fromiter((p.kw for p in points), dtype=np.float64, count=size),
+            column("cost_usd"), column("co2_kg"), column("temp_c"),
+            [p.timestamp for p in points]
+        )
+
+    def __len__(self) -> int:
+        return self.ts_epoch.size
+
+    def __getitem__(self, key: Union[int, slice]) -> Union[EnergyPoint, "EnergySeries"]:
+        if isinstance(key, slice):
+            return EnergySeries(
+                self.site, self.ts_epoch[key], self.kw[key],
+                None if self.cost_usd is None else self.cost_usd[key],
+                None if self.co2_kg is None else self.co2_kg[key],
+                None if self.temp_c is None else self.temp_c[key],
+                None if self.timestamps is None else self.timestamps[key]
+            )
+        return self.point(key)
+
+    def __iter__(self) -> Iterator[EnergyPoint]:
+        for i in range(len(self)):
+            yield self.point(i)
+
+    def timestamp(self, i: int) -> str:
+        """ISO timestamp of row `i`."""
+        if self.timestamps is not None:
+            return self.timestamps[i]
+        return datetime.fromtimestamp(int(self.ts_epoch[i]), tz=timezone.utc).isoformat()
+
+    def point(self, i: int) -> EnergyPoint:
+        """Materialize row `i` as an EnergyPoint."""
+        def optional(column):
+            if column is None:
+                return None
+            value = float(column[i])
+            return None if value != value else value
+
+        return EnergyPoint(
+            timestamp=self.timestamp(i),
+            kw=float(self.kw[i]),
+            site=self.site,
+            cost_usd=optional(self.cost_usd),
+            co2_kg=optional(self.co2_kg),
+            temp_c=optional(self.temp_c)
+        )
+
+    def to_points(self) -> List[EnergyPoint]:
+        return list(self)
+
+    def between(self, start_epoch: Optional[int] = None, end_epoch: Optional[int] = None) -> "EnergySeries":
+        """Rows with start_epoch <= ts_epoch < end_epoch (binary search; a view)."""
+        lo = 0 if start_epoch is None else int(np.searchsorted(self.ts_epoch, start_epoch, "left"))
+        hi = len(self) if end_epoch is None else int(np.searchsorted(self.ts_epoch, end_epoch, "left"))
+        return self[lo:hi]
+
+    @property
+    def latest_epoch(self) -> Optional[int]:
+        return int(self.ts_epoch[-1]) if len(self) else None
+
+    def __repr__(self) -> str:
+        return f"EnergySeries(site={self.site!r}, rows={len(self)})"
+
+
 class Anomaly(BaseModel):
     """Detected anomaly."""
     timestamp: str
@@ -41,6 +175,50 @@ class Insight(BaseModel):
     mode: Optional[str] = None  # "gemini" or None
 
 
+class SeverityStats(BaseModel):
+    """Anomaly count and mean deviation for one severity."""
+    count: int
+    mean_deviation: float
+
+
+class InsightHeader(BaseModel):
+    """
+    Insight fields plus aggregates of its details, for listings.
+
+    Read from header columns kept alongside the insight, so it costs the
+    same whether the insight holds ten anomalies or ten thousand.
+    """
+    id: Optional[int] = None
+    site: str
+    created_at: str
+    summary: str
+    mode: Optional[str] = None
+    anomaly_count: int = 0
+    severities: Dict[str, SeverityStats] = Field(default_factory=dict)
+    forecast_count: int = 0
+    forecast_mean_kw: Optional[float] = None
+
+    @classmethod
+    def from_insight(cls, insight: Insight) -> "InsightHeader":
+        counts: Dict[str, int] = {}
+        totals: Dict[str, float] = {}
+        for a in insight.anomalies:
+            counts[a.severity] = counts.get(a.severity, 0) + 1
+            totals[a.severity] = totals.get(a.severity, 0) + a.deviation
+        forecast = insight.forecast_24h
+        return cls(
+            id=insight.id,
+            site=insight.site,
+            created_at=insight.created_at,
+            summary=insight.summary,
+            mode=insight.mode,
+            anomaly_count=len(insight.anomalies),
+            severities={s: SeverityStats(count=n, mean_deviation=totals[s] / n) for s, n in counts.items()},
+            forecast_count=len(forecast),
+            forecast_mean_kw=sum(f.kw for f in forecast) / len(forecast) if forecast else None
+        )
+
+
 class PlanItem(BaseModel):
     """Actionable plan item."""
     action: str
@@ -59,6 +237,58 @@ class Plan(BaseModel):
     insight_id: Optional[int] = None
 
 
+class PlanHeader(BaseModel):
+    """Plan fields plus item counts, for listings (items are not read)."""
+    id: Optional[int] = None
+    site: str
+    created_at: str
+    rationale: str
+    insight_id: Optional[int] = None
+    item_count: int = 0
+    high_priority_count: int = 0
+
+    @classmethod
+    def from_plan(cls, plan: Plan) -> "PlanHeader":
+        return cls(
+            id=plan.id,
+            site=plan.site,
+            created_at=plan.created_at,
+            rationale=plan.rationale,
+            insight_id=plan.insight_id,
+            item_count=len(plan.items),
+            high_priority_count=sum(1 for item in plan.items if item.priority == "high")
+        )
+
+
+class AnswerContext(BaseModel):
+    """
+    What the assistant answers from, for one site.
+
+    One stored row per site, updated in the same transaction as every
+    insight and plan save: totals plus the latest insight's aggregates
+    and the latest plan's high-priority actions.
+    """
+    site: str
+    insight_count: int = 0
+    insight_id: Optional[int] = None
+    anomaly_count: int = 0
+    severities: Dict[str, SeverityStats] = Field(default_factory=dict)
+    forecast_count: int = 0
+    forecast_mean_kw: Optional[float] = None
+    plan_count: int = 0
+    plan_id: Optional[int] = None
+    plan_item_count: int = 0
+    high_priority_actions: List[str] = Field(default_factory=list)
+
+
+class LeaderboardEntry(BaseModel):
+    """One site's place in a cross-site ranking."""
+    rank: int
+    site: str
+    value: float
+    insight_id: Optional[int] = None
+
+
 class AskRequest(BaseModel):
     """Assistant query request."""
     site: str
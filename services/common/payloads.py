@@ -0,0 +1,141 @@
+"""Compact binary encoding of insight and plan details."""
+
+import json
+import struct
+from itertools import accumulate
+from typing import Dict, List, Optional, Sequence, Tuple, Type
+from pydantic import BaseModel
+from .models import Anomaly, ForecastPoint, Insight, InsightHeader, Plan, PlanHeader, PlanItem, SeverityStats
+
+
+# Leading byte of every payload; bumped when the layout changes
+PAYLOAD_VERSION = 1
+
+# Column layout of each record type: (field, kind), kind being "f"
+# (float64), "s" (text) or "c" (text from a small set, dictionary-coded)
+ANOMALY_FIELDS = (("timestamp", "s"), ("kw", "f"), ("expected_kw", "f"), ("deviation", "f"), ("severity", "c"))
+FORECAST_FIELDS = (("timestamp", "s"), ("kw", "f"))
+PLAN_ITEM_FIELDS = (("action", "s"), ("priority", "c"), ("expected_impact_kw", "f"), ("rationale", "s"))
+
+_U32 = struct.Struct("<I")
+
+
+def _pack_array(code: str, values: Sequence) -> bytes:
+    return struct.pack(f"<{len(values)}{code}", *values)
+
+
+def _pack_text(values: Sequence[str]) -> bytes:
+    # Code point lengths, then all values as one UTF-8 run: decoded once and sliced
+    data = "".join(values).encode("utf-8")
+    return _pack_array("I", list(map(len, values))) + _U32.pack(len(data)) + data
+
+
+def _pack_records(records: Sequence[BaseModel], fields) -> bytes:
+    parts = [_U32.pack(len(records))]
+    for name, kind in fields:
+        values = [getattr(record, name) for record in records]
+        if kind == "f":
+            parts.append(_pack_array("d", values))
+        elif kind == "c":
+            categories = list(dict.fromkeys(values))
+            index = {value: code for code, value in enumerate(categories)}
+            parts.append(_U32.pack(len(categories)) + _pack_text(categories))
+            parts.append(_pack_array("H", [index[v] for v in values]))
+        else:
+            parts.append(_pack_text(values))
+    return b"".join(parts)
+
+
+class _Reader:
+    """Cursor over a payload buffer."""
+
+    __slots__ = ("buffer", "offset")
+
+    def __init__(self, buffer: bytes):
+        self.buffer = memoryview(buffer)
+        self.offset = 0
+
+    def u32(self) -> int:
+        value, = _U32.unpack_from(self.buffer, self.offset)
+        self.offset += 4
+        return value
+
+    def array(self, code: str, count: int) -> tuple:
+        layout = struct.Struct(f"<{count}{code}")
+        values = layout.unpack_from(self.buffer, self.offset)
+        self.offset += layout.size
+        return values
+
+    def text(self, count: int) -> List[str]:
+        ends = list(accumulate(self.array("I", count)))
+        size = self.u32()
+        data = str(self.buffer[self.offset:self.offset + size], "utf-8")
+        self.offset += size
+        return [data[start:end] for start, end in zip([0] + ends, ends)]
+
+    def records(self, model: Type[BaseModel], fields) -> list:
+        count = self.u32()
+        columns = []
+        for _, kind in fields:
+            if kind == "f":
+                columns.append(self.array("d", count))
+            elif kind == "c":
+                categories = self.text(self.u32())
+                columns.append([categories[code] for code in self.array("H", count)])
+            else:
+                columns.append(self.text(count))
+        names = [name for name, _ in fields]
+        return [model(**dict(zip(names, values))) for values in zip(*columns)]
+
+
+def _reader(payload: bytes) -> _Reader:
+    reader = _Reader(payload)
+    version = reader.buffer[0]
+    if version != PAYLOAD_VERSION:
+        raise ValueError(f"unsupported payload version {version}")
+    reader.offset = 1
+    return reader
+
+
+def pack_insight_details(anomalies: Sequence[Anomaly], forecast: Sequence[ForecastPoint]) -> bytes:
+    """Encode an insight's anomalies and forecast points."""
+    return bytes([PAYLOAD_VERSION]) + _pack_records(anomalies, ANOMALY_FIELDS) + _pack_records(forecast, FORECAST_FIELDS)
+
+
+def unpack_insight_details(payload: bytes) -> Tuple[List[Anomaly], List[ForecastPoint]]:
+    """Decode pack_insight_details output into (anomalies, forecast)."""
+    reader = _reader(payload)
+    anomalies = reader.records(Anomaly, ANOMALY_FIELDS)
+    return anomalies, reader.records(ForecastPoint, FORECAST_FIELDS)
+
+
+def pack_plan_items(items: Sequence[PlanItem]) -> bytes:
+    """Encode a plan's items."""
+    return bytes([PAYLOAD_VERSION]) + _pack_records(items, PLAN_ITEM_FIELDS)
+
+
+def unpack_plan_items(payload: bytes) -> List[PlanItem]:
+    """Decode pack_plan_items output."""
+    return _reader(payload).records(PlanItem, PLAN_ITEM_FIELDS)
+
+
+def insight_columns(insight: Insight) -> tuple:
+    """Stored (anomaly_count, severities, forecast_count, forecast_mean_kw, details) for an insight."""
+    header = InsightHeader.from_insight(insight)
+    severities = json.dumps({s: [stats.count, stats.mean_deviation] for s, stats in header.severities.items()})
+    details = pack_insight_details(insight.anomalies, insight.forecast_24h)
+    return (header.anomaly_count, severities, header.forecast_count, header.forecast_mean_kw, details)
+
+
+def parse_severities(severities: Optional[str]) -> Dict[str, SeverityStats]:
+    """Decode the severities header column written by insight_columns."""
+    return {
+        s: SeverityStats(count=count, mean_deviation=mean)
+        for s, (count, mean) in json.loads(severities or "{}").items()
+    }
+
+
+def plan_columns(plan: Plan) -> Tuple[int, int, bytes]:
+    """Stored (item_count, high_priority_count, details) for a plan."""
+    header = PlanHeader.from_plan(plan)
+    return (header.item_count, header.high_priority_count, pack_plan_items(plan.items))
@@ -0,0 +1,211 @@
+"""Event-driven pipeline: ingest events trigger harvest → analyze → plan per site."""
+
+import asyncio
+import logging
+import os
+import time
+from collections import deque
+from typing import Any, Dict, Optional
+import numpy as np
+from . import aio, analysis, gcp
+from .metrics import gauge, histogram
+from .planning import PLAN_GENERATOR_VERSION, build_plan
+
+
+logger = logging.getLogger(__name__)
+
+# Quiet period after a site's last upload before the pipeline runs, and the
+# longest a run may be deferred while uploads keep arriving
+PIPELINE_DEBOUNCE = float(os.getenv("PIPELINE_DEBOUNCE", "2.0"))
+PIPELINE_MAX_DELAY = float(os.getenv("PIPELINE_MAX_DELAY", "10.0"))
+
+STAGES = ("debounce", "harvest", "analyze", "plan", "total")
+
+# Recent runs kept per stage for latency percentiles
+LATENCY_WINDOW = 1000
+
+PIPELINE_STAGE_SECONDS = histogram("ecopulse_pipeline_stage_seconds", "Pipeline stage latency; total runs from first upload to plan", ("stage",))
+
+
+class StageLatency:
+    """Rolling latency samples for one stage, also observed in `histogram` when given."""
+
+    def __init__(self, window: int = LATENCY_WINDOW, histogram=None):
+        self.samples = deque(maxlen=window)
+        self.count = 0
+        self.histogram = histogram
+
+    def record(self, seconds: float):
+        self.samples.append(seconds)
+        self.count += 1
+        if self.histogram is not None:
+            self.histogram.observe(seconds)
+
+    def stats(self) -> Dict[str, float]:
+        if not self.samples:
+            return {"count": 0}
+        ms = np.array(self.samples) * 1000
+        return {
+            "count": self.count,
+            "last_ms": round(float(ms[-1]), 2),
+            "mean_ms": round(float(ms.mean()), 2),
+            "p50_ms": round(float(np.percentile(ms, 50)), 2),
+            "p95_ms": round(float(np.percentile(ms, 95)), 2),
+            "max_ms": round(float(ms.max()), 2),
+        }
+
+
+class _PendingSite:
+    __slots__ = ("first_event", "uploads", "rows", "handle")
+
+    def __init__(self, first_event: float):
+        self.first_event = first_event
+        self.uploads = 0
+        self.rows = 0
+        self.handle: Optional[asyncio.TimerHandle] = None
+
+
+class PipelineRunner:
+    """
+    Consume event.ingest and run harvest → analyze → plan for each site.
+
+    Uploads for a site are debounced: the run starts PIPELINE_DEBOUNCE
+    seconds after the last one (at most PIPELINE_MAX_DELAY after the
+    first), so a burst of uploads costs one run. Stages hand results to
+    each other in memory: the plan is built from the Insight object the
+    analysis just produced instead of being re-read from storage. Runs for
+    the same site never overlap.
+    """
+
+    def __init__(
+        self,
+        bus=None,
+        debounce: float = PIPELINE_DEBOUNCE,
+        max_delay: float = PIPELINE_MAX_DELAY,
+        **analysis_params
+    ):
+        self.bus = bus or gcp.get_bus()
+        self.debounce = debounce
+        self.max_delay = max_delay
+        self.analysis_params = analysis_params
+        self.latency = {stage: StageLatency(histogram=PIPELINE_STAGE_SECONDS.labels(stage)) for stage in STAGES}
+        self.runs = 0
+        self.errors = 0
+        self._pending: Dict[str, _PendingSite] = {}
+        self._running: Dict[str, asyncio.Task] = {}
+        self._task: Optional[asyncio.Task] = None
+        gauge(
+            "ecopulse_pipeline_sites", "Sites waiting out the upload debounce (pending) or being processed (running)",
+            ("state",), lambda: {("pending",): len(self._pending), ("running",): len(self._running)}
+        )
+
+    def start(self) -> asyncio.Task:
+        """Start consuming events on the running loop."""
+        self._task = asyncio.create_task(self.run())
+        return self._task
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                # Let run() close its subscription before returning
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        for pending in self._pending.values():
+            if pending.handle is not None:
+                pending.handle.cancel()
+        self._pending.clear()
+        await asyncio.gather(*self._running.values(), return_exceptions=True)
+
+    async def run(self):
+        sub = self.bus.subscribe(["event.ingest"], name="pipeline")
+        try:
+            while True:
+                for event in await sub.get_batch():
+                    self.schedule(event.data["site"], event.published_at, event.data.get("rows_ingested", 0))
+        finally:
+            sub.close()
+
+    def schedule(self, site: str, published_at: Optional[float] = None, rows: int = 0):
+        """Note an upload for `site` and (re)arm its debounce timer."""
+        loop = asyncio.get_running_loop()
+        published_at = published_at or time.time()
+        pending = self._pending.get(site)
+        if pending is None:
+            pending = self._pending[site] = _PendingSite(published_at)
+        pending.uploads += 1
+        pending.rows += rows
+        if pending.handle is not None:
+            pending.handle.cancel()
+        delay = min(self.debounce, max(0.0, pending.first_event + self.max_delay - time.time()))
+        pending.handle = loop.call_later(delay, self._fire, site)
+
+    def _fire(self, site: str):
+        if site in self._running:
+            # A run is in progress; try again once it finishes
+            self._pending[site].handle = asyncio.get_running_loop().call_later(self.debounce, self._fire, site)
+            return
+        pending = self._pending.pop(site)
+        task = asyncio.create_task(self._process(site, pending))
+        self._running[site] = task
+        task.add_done_callback(lambda _: self._running.pop(site, None))
+
+    async def _process(self, site: str, pending: _PendingSite) -> Dict[str, Any]:
+        started = time.time()
+        self.latency["debounce"].record(started - pending.first_event)
+        try:
+            # Harvest: summarize what arrived, as /trigger does
+            t0 = time.perf_counter()
+            row_count, latest_timestamp = await aio.energy_summary(site, limit=1000)
+            gcp.publish_event("event.insight", {
+                "site": site,
+                "row_count": row_count,
+                "latest_timestamp": latest_timestamp
+            })
+            t1 = time.perf_counter()
+            self.latency["harvest"].record(t1 - t0)
+
+            # Analyze: the Insight stays in memory for the plan stage
+            result = await aio.run(analysis.analyze_site, site, **self.analysis_params)
+            await aio.run(analysis.save_analyses, [result])
+            t2 = time.perf_counter()
+            self.latency["analyze"].record(t2 - t1)
+
+            outcome = {"site": site, "uploads": pending.uploads, "rows": pending.rows, "analysis": result["status"]}
+            insight = result.get("insight")
+            if insight is not None:
+                plan = build_plan(insight)
+                plan.id = await aio.save_plan(plan, PLAN_GENERATOR_VERSION)
+                self.latency["plan"].record(time.perf_counter() - t2)
+                outcome.update(insight_id=insight.id, plan_id=plan.id)
+
+            self.latency["total"].record(time.time() - pending.first_event)
+            self.runs += 1
+            return outcome
+        except Exception as e:
+            self.errors += 1
+            logger.exception("Pipeline run failed for site %s", site)
+            return {"site": site, "status": "error", "error": str(e)}
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "runs": self.runs,
+            "errors": self.errors,
+            "pending_sites": len(self._pending),
+            "running_sites": len(self._running),
+            "stages": {stage: latency.stats() for stage, latency in self.latency.items()},
+        }
+
+
+async def _serve():
+    await aio.init_db()
+    await PipelineRunner().run()
+
+
+if __name__ == "__main__":
+    # Standalone runner, e.g. with EVENT_BACKEND=sqlite alongside the services:
+    #   cd services && MOCK=1 EVENT_BACKEND=sqlite python -m common.pipeline
+    logging.basicConfig(level=logging.INFO)
+    asyncio.run(_serve())
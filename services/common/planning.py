@@ -0,0 +1,88 @@
+"""Plan generation: actionable items derived from an insight."""
+
+from datetime import datetime
+from typing import Union
+from .metrics import ANALYSIS_SECONDS, timed
+from .models import Insight, InsightHeader, Plan, PlanItem
+
+# Stored with every plan. Bump whenever generate_plan_items changes, so
+# plans memoized for existing insights are regenerated.
+PLAN_GENERATOR_VERSION = 1
+
+
+def generate_plan_items(insight: Union[Insight, InsightHeader]) -> list[PlanItem]:
+    """
+    Generate actionable plan items based on insight.
+
+    Only the header aggregates (anomaly counts and mean deviation by
+    severity, forecast mean) are used, so a stored insight's details
+    never need decoding.
+    """
+    if isinstance(insight, Insight):
+        insight = InsightHeader.from_insight(insight)
+    items = []
+    
+    # If there are anomalies, add investigation items
+    if insight.anomaly_count:
+        high = insight.severities.get("high")
+        if high:
+            items.append(PlanItem(
+                action="Investigate high-severity energy spikes",
+                priority="high",
+                expected_impact_kw=high.mean_deviation,
+                rationale=f"Detected {high.count} high-severity anomalies requiring immediate attention"
+            ))
+        
+        items.append(PlanItem(
+            action="Review anomaly patterns and root causes",
+            priority="medium",
+            expected_impact_kw=5.0,
+            rationale=f"Total of {insight.anomaly_count} anomalies detected across the dataset"
+        ))
+    
+    # Always add standard optimization items
+    items.append(PlanItem(
+        action="Conduct nighttime load audit",
+        priority="medium",
+        expected_impact_kw=10.0,
+        rationale="Nighttime loads may indicate unnecessary equipment running"
+    ))
+    
+    items.append(PlanItem(
+        action="HVAC system tune-up and optimization",
+        priority="medium",
+        expected_impact_kw=15.0,
+        rationale="HVAC systems are typically the largest energy consumers"
+    ))
+    
+    items.append(PlanItem(
+        action="Review and optimize peak demand periods",
+        priority="low",
+        expected_impact_kw=8.0,
+        rationale="Reducing peak demand can lower overall energy costs"
+    ))
+    
+    # If forecast shows consistent load, suggest load balancing
+    if insight.forecast_count:
+        avg_forecast = insight.forecast_mean_kw
+        items.append(PlanItem(
+            action="Implement load balancing strategies",
+            priority="low",
+            expected_impact_kw=avg_forecast * 0.1,
+            rationale=f"Forecasted average load of {avg_forecast:.1f} kW suggests opportunities for load shifting"
+        ))
+    
+    return items
+
+
+@timed(ANALYSIS_SECONDS)
+def build_plan(insight: Union[Insight, InsightHeader]) -> Plan:
+    """Build an unsaved plan for an insight."""
+    items = generate_plan_items(insight)
+    return Plan(
+        site=insight.site,
+        created_at=datetime.utcnow().isoformat(),
+        items=items,
+        rationale=f"Generated {len(items)} actionable items based on latest insight (ID: {insight.id})",
+        insight_id=insight.id
+    )
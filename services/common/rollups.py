@@ -0,0 +1,282 @@
+"""Time-bucket aggregation of energy readings: ingest-maintained rollups and array reductions."""
+
+import json
+import os
+import sqlite3
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+import numpy as np
+from .schema import ROLLUP_COLUMNS, ROLLUP_SECONDS, rollup_select_sql, rollup_table
+
+
+BUCKET_SECONDS = {"1m": 60, "15m": 900, "1h": 3600, "1d": 86400}
+AGGREGATES = ("avg", "max", "sum", "p95")
+
+# Aggregates a rollup row can answer; percentiles need the raw readings
+ROLLUP_AGGREGATES = {"avg": "kw_sum / kw_count", "max": "kw_max", "sum": "kw_sum"}
+
+# Default process pool size for `python -m common.rollups` rebuilds, and
+# the days of raw readings each worker aggregates per task
+REBUILD_WORKERS = int(os.getenv("ROLLUP_REBUILD_WORKERS", str(os.cpu_count() or 1)))
+REBUILD_CHUNK_DAYS = int(os.getenv("ROLLUP_REBUILD_CHUNK_DAYS", "31"))
+
+# Positions of kw, cost_usd and co2_kg in gcp energy rows
+_METRIC_INDEXES = (2, 4, 5)
+
+
+def _merge(column: str) -> str:
+    # MIN()/MAX() of a NULL argument is NULL, so fall back to whichever side is set
+    field = column.rsplit("_", 1)[1]
+    if field in ("min", "max"):
+        return f"{column} = COALESCE({field.upper()}({column}, excluded.{column}), {column}, excluded.{column})"
+    return f"{column} = {column} + excluded.{column}"
+
+
+_UPSERT_ROLLUP_SQL = f"""
+    INSERT INTO {{table}} (site, bucket, {', '.join(ROLLUP_COLUMNS)})
+    VALUES ({', '.join('?' * (len(ROLLUP_COLUMNS) + 2))})
+    ON CONFLICT (site, bucket) DO UPDATE SET
+        {', '.join(_merge(column) for column in ROLLUP_COLUMNS)}
+"""
+
+_INSERT_ROLLUP_SQL = f"""
+    INSERT INTO {{table}} (site, bucket, {', '.join(ROLLUP_COLUMNS)})
+    VALUES ({', '.join('?' * (len(ROLLUP_COLUMNS) + 2))})
+"""
+
+
+def uses_rollup(bucket: str, agg: str) -> bool:
+    """Whether (bucket, agg) is answered from a rollup table rather than raw rows."""
+    return bucket in ROLLUP_SECONDS and agg in ROLLUP_AGGREGATES
+
+
+def _row_columns(rows: Sequence[tuple]) -> tuple:
+    """Transpose gcp energy rows once into (sites, site codes, ts_epoch, metric arrays)."""
+    columns = list(zip(*rows))
+    sites, codes = np.unique(np.array(columns[3]), return_inverse=True)
+    # None becomes NaN in a float64 array
+    metrics = [np.array(columns[index], dtype=np.float64) for index in _METRIC_INDEXES]
+    return sites.tolist(), codes.astype(np.int64), np.array(columns[1], dtype=np.int64), metrics
+
+
+def _fold(columns: tuple, seconds: int) -> List[tuple]:
+    sites, codes, ts_epoch, metrics = columns
+    keys = ts_epoch - ts_epoch % seconds
+    order = np.lexsort((keys, codes))
+    codes, keys = codes[order], keys[order]
+    starts = np.flatnonzero(np.concatenate(([True], (codes[1:] != codes[:-1]) | (keys[1:] != keys[:-1]))))
+
+    folded = []
+    for values in metrics:
+        values = values[order]
+        present = ~np.isnan(values)
+        filled = np.where(present, values, 0.0)
+        folded += [
+            np.add.reduceat(present.astype(np.int64), starts).tolist(),
+            np.add.reduceat(filled, starts).tolist(),
+            [None if v != v else v for v in np.fmin.reduceat(values, starts).tolist()],
+            [None if v != v else v for v in np.fmax.reduceat(values, starts).tolist()],
+            np.add.reduceat(filled * filled, starts).tolist(),
+        ]
+    return list(zip([sites[c] for c in codes[starts].tolist()], keys[starts].tolist(), *folded))
+
+
+def bucket_rows(rows: Sequence[tuple], seconds: int) -> List[tuple]:
+    """
+    Fold gcp energy rows into (site, bucket, *ROLLUP_COLUMNS) tuples.
+
+    Rows may arrive in any order and span sites; each (site, bucket)
+    appears once. Grouping is vectorized: one lexsort, then
+    ufunc.reduceat per moment. Missing optional values are left out of
+    their metric's count/sum/min/max (min/max are None when none is set).
+    """
+    if not rows:
+        return []
+    return _fold(_row_columns(rows), seconds)
+
+
+def apply_rollups(conn: sqlite3.Connection, rows: Sequence[tuple]):
+    """
+    Fold newly inserted energy rows into every rollup table.
+
+    Call inside the insert transaction so rollups commit (or roll back)
+    with the rows. Late rows simply update their older bucket; a rollup
+    always equals aggregating the rows stored for its bucket.
+    """
+    if not rows:
+        return
+    # Transpose once; each grain only re-buckets the arrays
+    columns = _row_columns(rows)
+    for bucket, seconds in ROLLUP_SECONDS.items():
+        conn.executemany(_UPSERT_ROLLUP_SQL.format(table=rollup_table(bucket)), _fold(columns, seconds))
+
+
+def refresh_rollups(conn: sqlite3.Connection, site_days: Iterable[Tuple[str, int]]):
+    """
+    Recompute rollups for (site, day_start_epoch) pairs from the stored rows.
+
+    Used where stored readings change rather than grow (upserts that
+    replace values), since a min or max cannot be taken back
+    incrementally. Consecutive days are recomputed as one range; call in
+    the writing transaction, after the rows themselves are written.
+    """
+    by_site: Dict[str, List[int]] = {}
+    for site, day in site_days:
+        by_site.setdefault(site, []).append(day)
+    where = "site = ? AND ts_epoch >= ? AND ts_epoch < ?"
+    for site, days in by_site.items():
+        days = sorted(set(days))
+        ranges = []
+        for day in days:
+            if ranges and ranges[-1][1] == day:
+                ranges[-1][1] = day + 86400
+            else:
+                ranges.append([day, day + 86400])
+        for bucket, seconds in ROLLUP_SECONDS.items():
+            table = rollup_table(bucket)
+            for lo, hi in ranges:
+                conn.execute(f"DELETE FROM {table} WHERE site = ? AND bucket >= ? AND bucket < ?", (site, lo, hi))
+                conn.execute(
+                    f"INSERT INTO {table} (site, bucket, {', '.join(ROLLUP_COLUMNS)}) {rollup_select_sql(seconds, where)}",
+                    (site, lo, hi)
+                )
+
+
+def aggregate_arrays(ts_epoch: np.ndarray, values: np.ndarray, seconds: int, agg: str) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Aggregate sorted readings into `seconds`-wide buckets.
+
+    Returns (bucket_epochs, values). Groups are contiguous runs of the
+    sorted input, reduced with ufunc.reduceat; p95 sorts values within
+    each bucket once and interpolates linearly, as np.percentile does.
+    """
+    if ts_epoch.size == 0:
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float64)
+    keys = ts_epoch - ts_epoch % seconds
+    starts = np.flatnonzero(np.concatenate(([True], keys[1:] != keys[:-1])))
+    counts = np.diff(np.append(starts, keys.size))
+    values = np.asarray(values, dtype=np.float64)
+    if agg == "sum":
+        result = np.add.reduceat(values, starts)
+    elif agg == "avg":
+        result = np.add.reduceat(values, starts) / counts
+    elif agg == "max":
+        result = np.maximum.reduceat(values, starts)
+    elif agg == "p95":
+        ordered = values[np.lexsort((values, keys))]
+        position = (counts - 1) * 0.95
+        lower = np.floor(position).astype(np.int64)
+        upper = np.minimum(lower + 1, counts - 1)
+        low, high = ordered[starts + lower], ordered[starts + upper]
+        result = low + (high - low) * (position - lower)
+    else:
+        raise ValueError(f"Unknown aggregate '{agg}'. Choose from: {', '.join(AGGREGATES)}")
+    return keys[starts], result
+
+
+def lttb(x: np.ndarray, y: np.ndarray, threshold: int) -> np.ndarray:
+    """
+    Largest-Triangle-Three-Buckets downsampling; returns indices to keep.
+
+    Keeps the first and last points and, from each of `threshold - 2`
+    equal-count buckets, the point forming the largest triangle with the
+    previously kept point and the next bucket's average, which preserves
+    peaks and troughs far better than striding or averaging.
+    """
+    n = len(x)
+    if threshold >= n or threshold < 3:
+        return np.arange(n)
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    every = (n - 2) / (threshold - 2)
+    keep = np.empty(threshold, dtype=np.int64)
+    keep[0], keep[-1] = 0, n - 1
+    a = 0
+    for i in range(threshold - 2):
+        lo, hi = int(i * every) + 1, int((i + 1) * every) + 1
+        next_hi = min(int((i + 2) * every) + 1, n)
+        avg_x, avg_y = x[hi:next_hi].mean(), y[hi:next_hi].mean()
+        area = np.abs((x[a] - avg_x) * (y[lo:hi] - y[a]) - (x[a] - x[lo:hi]) * (avg_y - y[a]))
+        a = lo + int(area.argmax())
+        keep[i + 1] = a
+    return keep
+
+
+# ============================================================================
+# Rebuild
+# ============================================================================
+
+def _init_worker(db_path: str):
+    from . import gcp
+    gcp.DB_PATH = type(gcp.DB_PATH)(db_path)
+
+
+def _aggregate_chunk(site: str, start_epoch: int, end_epoch: int) -> Dict[str, List[tuple]]:
+    """Rollup rows per bucket width for one site and day-aligned time range."""
+    from . import gcp
+    conn = gcp.get_storage().connection()
+    where = "site = ? AND ts_epoch >= ? AND ts_epoch < ?"
+    return {
+        bucket: [tuple(row) for row in conn.execute(rollup_select_sql(seconds, where), (site, start_epoch, end_epoch))]
+        for bucket, seconds in ROLLUP_SECONDS.items()
+    }
+
+
+def _chunks(start_epoch: int, end_epoch: int, chunk_days: int) -> List[Tuple[int, int]]:
+    step = 86400 * chunk_days
+    lo = start_epoch - start_epoch % 86400
+    return [(t, t + step) for t in range(lo, end_epoch + 1, step)]
+
+
+def rebuild_rollups(
+    sites: Optional[List[str]] = None,
+    workers: int = REBUILD_WORKERS,
+    chunk_days: int = REBUILD_CHUNK_DAYS
+) -> Dict[str, int]:
+    """
+    Recompute rollups from raw readings for `sites` (default all).
+
+    Each site's history is split into day-aligned chunks of `chunk_days`,
+    aggregated in parallel by a process pool (read-only, WAL readers), and
+    written by this process: a site's rollups are replaced in one
+    transaction, so readers never see a half-built site. Run it with
+    ingest for those sites paused; rows committed mid-rebuild may be
+    missed until the next rebuild. Returns hourly buckets per site.
+    """
+    from . import gcp
+    storage = gcp.get_storage()
+    ranges = {}
+    for site in sites or gcp.list_sites():
+        row = storage.connection().execute(gcp._SITE_RANGE_SQL, (site,)).fetchone()
+        ranges[site] = _chunks(row[0], row[1], chunk_days) if row[0] is not None else []
+
+    counts = {}
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(str(gcp.DB_PATH),)) as pool:
+        futures = {
+            site: [pool.submit(_aggregate_chunk, site, lo, hi) for lo, hi in chunks]
+            for site, chunks in ranges.items()
+        }
+        for site, site_futures in futures.items():
+            results = [future.result() for future in site_futures]
+            with storage.transaction() as conn:
+                for bucket in ROLLUP_SECONDS:
+                    table = rollup_table(bucket)
+                    conn.execute(f"DELETE FROM {table} WHERE site = ?", (site,))
+                    for result in results:
+                        conn.executemany(_INSERT_ROLLUP_SQL.format(table=table), result[bucket])
+            counts[site] = sum(len(result["1h"]) for result in results)
+    return counts
+
+
+if __name__ == "__main__":
+    # Backfill rollups from raw readings:
+    #   cd services && python -m common.rollups [--workers N] [site ...]
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Rebuild energy rollups from raw readings")
+    parser.add_argument("sites", nargs="*")
+    parser.add_argument("--workers", type=int, default=REBUILD_WORKERS)
+    parser.add_argument("--chunk-days", type=int, default=REBUILD_CHUNK_DAYS)
+    args = parser.parse_args()
+    for site, buckets in rebuild_rollups(args.sites or None, args.workers, args.chunk_days).items():
+        print(json.dumps({"site": site, "hourly_buckets": buckets}))
@@ -0,0 +1,501 @@
+"""Versioned schema migrations and energy_points partitioning."""
+
+import json
+import os
+import sqlite3
+import time
+from datetime import datetime, timezone
+from typing import Callable, List, Set, Tuple
+
+
+# Monthly partitioning of energy_points: "monthly" or "" (disabled). When
+# enabled, new rows land in energy_points_pYYYYMM tables and every read
+# goes through the energy_points_all view over the base table plus
+# partitions.
+ENERGY_PARTITIONING = os.getenv("ENERGY_PARTITIONING", "")
+
+ENERGY_TABLE = "energy_points"
+ENERGY_VIEW = "energy_points_all"
+PARTITION_PREFIX = "energy_points_p"
+
+ENERGY_COLUMNS = "id, timestamp, ts_epoch, kw, site, cost_usd, co2_kg, temp_c, created_at"
+
+# Bucket widths with a rollup table maintained at ingest, and the
+# per-metric moments each rollup row keeps (NULL values are not counted)
+ROLLUP_SECONDS = {"1h": 3600, "1d": 86400}
+ROLLUP_METRICS = ("kw", "cost_usd", "co2_kg")
+ROLLUP_FIELDS = ("count", "sum", "min", "max", "sumsq")
+ROLLUP_COLUMNS = [f"{metric}_{field}" for metric in ROLLUP_METRICS for field in ROLLUP_FIELDS]
+
+# Days of daily rollups behind the cross-site cost/CO2 rankings
+LEADERBOARD_DAYS = int(os.getenv("LEADERBOARD_DAYS", "30"))
+
+
+def leaderboard_totals_sql(where: str = "site = ?") -> str:
+    """UPDATE refreshing answer_context cost_usd/co2_kg from each matched site's latest daily rollups."""
+    return f"""
+        UPDATE answer_context
+        SET (cost_usd, co2_kg) = (
+            SELECT CASE WHEN SUM(cost_usd_count) THEN TOTAL(cost_usd_sum) END,
+                   CASE WHEN SUM(co2_kg_count) THEN TOTAL(co2_kg_sum) END
+            FROM (
+                SELECT cost_usd_count, cost_usd_sum, co2_kg_count, co2_kg_sum
+                FROM {rollup_table("1d")}
+                WHERE site = answer_context.site
+                ORDER BY bucket DESC
+                LIMIT {LEADERBOARD_DAYS}
+            )
+        )
+        WHERE {where}
+    """
+
+
+def rollup_table(bucket: str) -> str:
+    return f"energy_rollup_{bucket}"
+
+
+def rollup_select_sql(seconds: int, where: str = "1") -> str:
+    """SELECT computing rollup rows (site, bucket, *ROLLUP_COLUMNS) from raw readings."""
+    moments = ", ".join(
+        f"COUNT({m}), TOTAL({m}), MIN({m}), MAX({m}), TOTAL({m} * {m})"
+        for m in ROLLUP_METRICS
+    )
+    return f"""
+        SELECT site, (ts_epoch / {seconds}) * {seconds} AS bucket, {moments}
+        FROM {ENERGY_VIEW}
+        WHERE {where}
+        GROUP BY site, bucket
+    """
+
+
+def to_epoch(timestamp: str) -> int:
+    """Convert an ISO-8601 timestamp to integer epoch seconds (naive = UTC)."""
+    dt = datetime.fromisoformat(timestamp.replace("Z", "+00:00"))
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=timezone.utc)
+    return int(dt.timestamp())
+
+
+def partition_for(ts_epoch: int) -> str:
+    """Name of the monthly partition table holding `ts_epoch`."""
+    tm = time.gmtime(ts_epoch)
+    return f"{PARTITION_PREFIX}{tm.tm_year:04d}{tm.tm_mon:02d}"
+
+
+def _energy_table_ddl(name: str) -> str:
+    return f"""
+        CREATE TABLE IF NOT EXISTS {name} (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            timestamp TEXT NOT NULL,
+            kw REAL NOT NULL,
+            site TEXT NOT NULL,
+            cost_usd REAL,
+            co2_kg REAL,
+            temp_c REAL,
+            created_at TEXT DEFAULT CURRENT_TIMESTAMP,
+            ts_epoch INTEGER
+        )
+    """
+
+
+def _energy_index_ddl(name: str) -> str:
+    return f"CREATE INDEX IF NOT EXISTS idx_{name}_site_ts ON {name} (site, ts_epoch)"
+
+
+def _energy_unique_index_ddl(name: str) -> str:
+    # One reading per site and instant; the conflict target of ingest upserts
+    return f"CREATE UNIQUE INDEX IF NOT EXISTS uq_{name}_site_ts ON {name} (site, ts_epoch)"
+
+
+def list_partitions(conn: sqlite3.Connection) -> List[str]:
+    """Existing energy partition tables, oldest first."""
+    rows = conn.execute(
+        "SELECT name FROM sqlite_master WHERE type = 'table' AND name LIKE ? ORDER BY name",
+        (PARTITION_PREFIX + "%",)
+    ).fetchall()
+    return [row[0] for row in rows]
+
+
+def refresh_energy_view(conn: sqlite3.Connection):
+    """(Re)create the energy_points_all view over the base table and partitions."""
+    selects = [
+        f"SELECT {ENERGY_COLUMNS} FROM {name}"
+        for name in [ENERGY_TABLE] + list_partitions(conn)
+    ]
+    conn.execute(f"DROP VIEW IF EXISTS {ENERGY_VIEW}")
+    conn.execute(f"CREATE VIEW {ENERGY_VIEW} AS " + " UNION ALL ".join(selects))
+
+
+def ensure_partitions(conn: sqlite3.Connection, names: Set[str], known: Set[str]):
+    """Create any partitions in `names` not yet in `known` and refresh the view."""
+    missing = names - known
+    if not missing:
+        return
+    existing = set(list_partitions(conn))
+    created = False
+    for name in sorted(missing - existing):
+        conn.execute(_energy_table_ddl(name))
+        conn.execute(_energy_unique_index_ddl(name))
+        created = True
+    if created:
+        refresh_energy_view(conn)
+    known.update(missing)
+
+
+# ============================================================================
+# Migrations
+# ============================================================================
+
+def _v1_base_tables(conn: sqlite3.Connection):
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS energy_points (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            timestamp TEXT NOT NULL,
+            kw REAL NOT NULL,
+            site TEXT NOT NULL,
+            cost_usd REAL,
+            co2_kg REAL,
+            temp_c REAL,
+            created_at TEXT DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS insights (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            site TEXT NOT NULL,
+            created_at TEXT DEFAULT CURRENT_TIMESTAMP,
+            summary TEXT,
+            mode TEXT,
+            data_json TEXT
+        )
+    """)
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS plans (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            site TEXT NOT NULL,
+            created_at TEXT DEFAULT CURRENT_TIMESTAMP,
+            rationale TEXT,
+            insight_id INTEGER,
+            data_json TEXT
+        )
+    """)
+
+
+def _v2_epoch_timestamps(conn: sqlite3.Connection):
+    """Add sortable integer epochs, backfilled from the TEXT timestamps."""
+    conn.execute("ALTER TABLE energy_points ADD COLUMN ts_epoch INTEGER")
+    conn.execute("""
+        UPDATE energy_points
+        SET ts_epoch = CAST(strftime('%s', timestamp) AS INTEGER)
+        WHERE ts_epoch IS NULL
+    """)
+
+
+def _v3_site_time_indexes(conn: sqlite3.Connection):
+    conn.execute(_energy_index_ddl(ENERGY_TABLE))
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_insights_site_created ON insights (site, created_at)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_plans_site_created ON plans (site, created_at)")
+
+
+def _v4_energy_view(conn: sqlite3.Connection):
+    refresh_energy_view(conn)
+
+
+def _v5_detector_state(conn: sqlite3.Connection):
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS detector_state (
+            site TEXT NOT NULL,
+            detector TEXT NOT NULL,
+            state_json TEXT NOT NULL,
+            updated_at TEXT DEFAULT CURRENT_TIMESTAMP,
+            PRIMARY KEY (site, detector)
+        )
+    """)
+
+
+def _v6_insight_watermarks(conn: sqlite3.Connection):
+    """Per-site analysis watermark and running aggregates, stored with each insight."""
+    conn.execute("ALTER TABLE insights ADD COLUMN watermark_epoch INTEGER")
+    conn.execute("ALTER TABLE insights ADD COLUMN agg_state TEXT")
+
+
+def _v7_site_versions(conn: sqlite3.Connection):
+    """Per-site change counters, bumped in the same transaction as each write."""
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS site_versions (
+            site TEXT NOT NULL,
+            kind TEXT NOT NULL,
+            version INTEGER NOT NULL,
+            PRIMARY KEY (site, kind)
+        )
+    """)
+
+
+def _v8_events(conn: sqlite3.Connection):
+    """Event log and consumer cursors for the cross-process event bus."""
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS events (
+            seq INTEGER PRIMARY KEY AUTOINCREMENT,
+            topic TEXT NOT NULL,
+            data_json TEXT NOT NULL,
+            published_at REAL NOT NULL
+        )
+    """)
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_events_topic_seq ON events (topic, seq)")
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS event_cursors (
+            consumer TEXT PRIMARY KEY,
+            seq INTEGER NOT NULL,
+            updated_at REAL NOT NULL
+        )
+    """)
+
+
+def _v9_energy_rollups(conn: sqlite3.Connection):
+    """
+    Hourly and daily rollups per site, backfilled from existing readings.
+
+    Each keeps count/sum/min/max/sum of squares for kw, cost_usd and co2_kg.
+    """
+    types = {"count": "INTEGER NOT NULL", "sum": "REAL NOT NULL", "min": "REAL", "max": "REAL", "sumsq": "REAL NOT NULL"}
+    columns = ", ".join(
+        f"{metric}_{field} {types[field]}"
+        for metric in ROLLUP_METRICS for field in ROLLUP_FIELDS
+    )
+    for bucket in ROLLUP_SECONDS:
+        conn.execute(f"""
+            CREATE TABLE IF NOT EXISTS {rollup_table(bucket)} (
+                site TEXT NOT NULL,
+                bucket INTEGER NOT NULL,
+                {columns},
+                PRIMARY KEY (site, bucket)
+            ) WITHOUT ROWID
+        """)
+    _backfill_rollups(conn)
+
+
+def _backfill_rollups(conn: sqlite3.Connection):
+    for bucket, seconds in ROLLUP_SECONDS.items():
+        table = rollup_table(bucket)
+        conn.execute(f"DELETE FROM {table}")
+        conn.execute(f"INSERT INTO {table} (site, bucket, {', '.join(ROLLUP_COLUMNS)}) {rollup_select_sql(seconds)}")
+
+
+def _v10_unique_readings(conn: sqlite3.Connection):
+    """
+    Make (site, ts_epoch) unique in every energy table.
+
+    Existing duplicates keep the most recently inserted row (highest id);
+    rollups are then recomputed from the deduplicated rows.
+    """
+    for name in [ENERGY_TABLE] + list_partitions(conn):
+        conn.execute(f"DELETE FROM {name} WHERE id NOT IN (SELECT MAX(id) FROM {name} GROUP BY site, ts_epoch)")
+        conn.execute(f"DROP INDEX IF EXISTS idx_{name}_site_ts")
+        conn.execute(_energy_unique_index_ddl(name))
+    _backfill_rollups(conn)
+
+
+def _v11_ingest_errors(conn: sqlite3.Connection):
+    """Rejected upload rows (line number and reason), grouped into downloadable reports."""
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS ingest_errors (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            report_id TEXT NOT NULL,
+            site TEXT NOT NULL,
+            filename TEXT,
+            line INTEGER NOT NULL,
+            reason TEXT NOT NULL,
+            raw TEXT,
+            created_at TEXT DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_ingest_errors_report ON ingest_errors (report_id, id)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_ingest_errors_created ON ingest_errors (created_at)")
+
+
+def _v12_binary_details(conn: sqlite3.Connection):
+    """
+    Binary insight/plan details, plus header columns so listings skip them.
+
+    `details` is added last so header columns stay ahead of the payload in
+    each record and header reads never load its overflow pages. Existing
+    data_json payloads are converted and then cleared.
+    """
+    from .models import Insight, Plan
+    from .payloads import insight_columns, plan_columns
+
+    for column in (
+        "anomaly_count INTEGER NOT NULL DEFAULT 0", "severities TEXT",
+        "forecast_count INTEGER NOT NULL DEFAULT 0", "forecast_mean_kw REAL", "details BLOB"
+    ):
+        conn.execute(f"ALTER TABLE insights ADD COLUMN {column}")
+    for column in ("item_count INTEGER NOT NULL DEFAULT 0", "high_priority_count INTEGER NOT NULL DEFAULT 0", "details BLOB"):
+        conn.execute(f"ALTER TABLE plans ADD COLUMN {column}")
+
+    rows = conn.execute("SELECT id, site, summary, data_json FROM insights WHERE data_json IS NOT NULL").fetchall()
+    conn.executemany(
+        """
+        UPDATE insights
+        SET anomaly_count = ?, severities = ?, forecast_count = ?, forecast_mean_kw = ?, details = ?, data_json = NULL
+        WHERE id = ?
+        """,
+        [
+            insight_columns(Insight(site=site, created_at="", summary=summary or "", **json.loads(data))) + (row_id,)
+            for row_id, site, summary, data in rows
+        ]
+    )
+    rows = conn.execute("SELECT id, site, rationale, data_json FROM plans WHERE data_json IS NOT NULL").fetchall()
+    conn.executemany(
+        """
+        UPDATE plans
+        SET item_count = ?, high_priority_count = ?, details = ?, data_json = NULL
+        WHERE id = ?
+        """,
+        [
+            plan_columns(Plan(site=site, created_at="", rationale=rationale or "", **json.loads(data))) + (row_id,)
+            for row_id, site, rationale, data in rows
+        ]
+    )
+
+
+def _v13_plan_generator_version(conn: sqlite3.Connection):
+    """
+    Record which plan generator version produced each plan.
+
+    At most one plan per (insight, generator version), so a plan can be
+    reused until its insight or the generator changes. Older plans have
+    no version and are never reused.
+    """
+    conn.execute("ALTER TABLE plans ADD COLUMN generator_version INTEGER")
+    conn.execute("""
+        CREATE UNIQUE INDEX IF NOT EXISTS idx_plans_insight_generator
+        ON plans (insight_id, generator_version) WHERE generator_version IS NOT NULL
+    """)
+
+
+def _v14_answer_context(conn: sqlite3.Connection):
+    """Per-site assistant answer context, backfilled from the latest insight and plan."""
+    from .payloads import unpack_plan_items
+
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS answer_context (
+            site TEXT PRIMARY KEY,
+            insight_count INTEGER NOT NULL DEFAULT 0,
+            insight_id INTEGER,
+            insight_created_at TEXT,
+            anomaly_count INTEGER NOT NULL DEFAULT 0,
+            severities TEXT,
+            forecast_count INTEGER NOT NULL DEFAULT 0,
+            forecast_mean_kw REAL,
+            plan_count INTEGER NOT NULL DEFAULT 0,
+            plan_id INTEGER,
+            plan_created_at TEXT,
+            plan_item_count INTEGER NOT NULL DEFAULT 0,
+            high_priority_actions TEXT
+        )
+    """)
+    # Bare columns come from the MAX(created_at) row of each site
+    conn.execute("""
+        INSERT INTO answer_context (
+            site, insight_count, insight_id, insight_created_at,
+            anomaly_count, severities, forecast_count, forecast_mean_kw
+        )
+        SELECT site, COUNT(*), id, MAX(created_at), anomaly_count, severities, forecast_count, forecast_mean_kw
+        FROM insights
+        GROUP BY site
+    """)
+    rows = conn.execute("SELECT site, COUNT(*), id, MAX(created_at), item_count, details FROM plans GROUP BY site").fetchall()
+    conn.executemany(
+        """
+        INSERT INTO answer_context (site, plan_count, plan_id, plan_created_at, plan_item_count, high_priority_actions)
+        VALUES (?, ?, ?, ?, ?, ?)
+        ON CONFLICT (site) DO UPDATE SET
+            plan_count = excluded.plan_count, plan_id = excluded.plan_id, plan_created_at = excluded.plan_created_at,
+            plan_item_count = excluded.plan_item_count, high_priority_actions = excluded.high_priority_actions
+        """,
+        [
+            (site, count, plan_id, created_at, item_count, json.dumps([
+                item.action for item in (unpack_plan_items(details) if details else []) if item.priority == "high"
+            ]))
+            for site, count, plan_id, created_at, item_count, details in rows
+        ]
+    )
+
+
+def _v15_site_leaderboard(conn: sqlite3.Connection):
+    """
+    Cross-site ranking columns on answer_context, one index per metric.
+
+    cost_usd and co2_kg are totals over the site's latest LEADERBOARD_DAYS
+    daily rollups, refreshed with each insight save.
+    """
+    for column in ("high_anomaly_count INTEGER NOT NULL DEFAULT 0", "cost_usd REAL", "co2_kg REAL"):
+        conn.execute(f"ALTER TABLE answer_context ADD COLUMN {column}")
+    conn.execute("UPDATE answer_context SET high_anomaly_count = COALESCE(json_extract(severities, '$.high[0]'), 0)")
+    conn.execute(leaderboard_totals_sql(where="insight_id IS NOT NULL"))
+    for column in ("anomaly_count", "high_anomaly_count", "forecast_mean_kw", "cost_usd", "co2_kg"):
+        conn.execute(f"CREATE INDEX IF NOT EXISTS idx_answer_context_{column} ON answer_context ({column})")
+
+
+def _v16_analysis_rewind(conn: sqlite3.Connection):
+    """
+    Earliest reading written per site since its last analysis.
+
+    Ingest lowers min_epoch and bumps seq; a save consumes the marker
+    (min_epoch = NULL) only if seq is unchanged since the analysis read it.
+    """
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS analysis_rewind (
+            site TEXT PRIMARY KEY,
+            min_epoch INTEGER,
+            seq INTEGER NOT NULL DEFAULT 1
+        )
+    """)
+
+
+MIGRATIONS: List[Tuple[int, Callable[[sqlite3.Connection], None]]] = [
+    (1, _v1_base_tables),
+    (2, _v2_epoch_timestamps),
+    (3, _v3_site_time_indexes),
+    (4, _v4_energy_view),
+    (5, _v5_detector_state),
+    (6, _v6_insight_watermarks),
+    (7, _v7_site_versions),
+    (8, _v8_events),
+    (9, _v9_energy_rollups),
+    (10, _v10_unique_readings),
+    (11, _v11_ingest_errors),
+    (12, _v12_binary_details),
+    (13, _v13_plan_generator_version),
+    (14, _v14_answer_context),
+    (15, _v15_site_leaderboard),
+    (16, _v16_analysis_rewind),
+]
+
+
+def schema_version(conn: sqlite3.Connection) -> int:
+    return conn.execute("PRAGMA user_version").fetchone()[0]
+
+
+def migrate(conn: sqlite3.Connection) -> int:
+    """
+    Apply pending migrations. Returns the resulting schema version.
+
+    Runs under BEGIN IMMEDIATE so services starting concurrently against
+    the same database apply each migration exactly once.
+    """
+    if conn.in_transaction:
+        conn.commit()
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        version = schema_version(conn)
+        for target, step in MIGRATIONS:
+            if target > version:
+                step(conn)
+                conn.execute(f"PRAGMA user_version = {target}")
+                version = target
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    return version
@@ -0,0 +1,120 @@
+"""SQLite storage backend with pooled connections and WAL journaling."""
+
+import os
+import sqlite3
+import threading
+import weakref
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, Iterator, Union
+
+
+# Pragmas applied to every pooled connection. WAL lets readers proceed
+# while a writer holds the lock; synchronous=NORMAL is durable under WAL
+# except for the last transactions on power loss.
+DEFAULT_PRAGMAS: Dict[str, Union[str, int]] = {
+    "journal_mode": "WAL",
+    "synchronous": os.getenv("SQLITE_SYNCHRONOUS", "NORMAL"),
+    "cache_size": -int(os.getenv("SQLITE_CACHE_SIZE_KB", "65536")),
+    "mmap_size": int(os.getenv("SQLITE_MMAP_SIZE", str(256 * 1024 * 1024))),
+    "temp_store": "MEMORY",
+    "busy_timeout": 5000,
+}
+
+# Per-connection prepared statement cache (sqlite3 reuses compiled
+# statements for identical SQL strings on the same connection)
+STATEMENT_CACHE_SIZE = 256
+
+
+class _ThreadConnection:
+    """
+    A thread's pooled connection. Only the thread's local storage holds
+    it, so when the thread exits it is collected and the connection closed.
+    """
+
+    __slots__ = ("conn", "close", "__weakref__")
+
+    def __init__(self, conn: sqlite3.Connection):
+        self.conn = conn
+        self.close = weakref.finalize(self, conn.close)
+
+
+class Storage:
+    """
+    SQLite storage backend.
+
+    Each thread gets one long-lived connection, so requests on the event
+    loop thread and on worker threads never share a connection and never
+    pay connect/teardown per query. A thread's connection is closed when
+    the thread exits, or earlier with `release()`. A forked child (e.g. a
+    process pool worker) drops the inherited pool and opens its own
+    connections. Helpers should use module-level SQL constants so the
+    per-connection statement cache gets hits.
+    """
+
+    def __init__(self, path: Union[str, Path], pragmas: Dict[str, Union[str, int]] = None):
+        self.path = str(path)
+        self.pragmas = dict(DEFAULT_PRAGMAS if pragmas is None else pragmas)
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._connections: "weakref.WeakSet[_ThreadConnection]" = weakref.WeakSet()
+        self._pid = os.getpid()
+
+    def _connect(self) -> _ThreadConnection:
+        conn = sqlite3.connect(
+            self.path,
+            timeout=self.pragmas.get("busy_timeout", 5000) / 1000,
+            cached_statements=STATEMENT_CACHE_SIZE,
+            check_same_thread=False,
+        )
+        conn.row_factory = sqlite3.Row
+        for name, value in self.pragmas.items():
+            conn.execute(f"PRAGMA {name}={value}")
+        pooled = _ThreadConnection(conn)
+        with self._lock:
+            self._connections.add(pooled)
+        return pooled
+
+    def connection(self) -> sqlite3.Connection:
+        """Return this thread's connection, opening it on first use."""
+        if self._pid != os.getpid():
+            # Connections must not cross fork(); abandon the parent's without
+            # closing them (a close here could checkpoint the parent's WAL)
+            for pooled in list(self._connections):
+                pooled.close.detach()
+            self._pid = os.getpid()
+            self._local = threading.local()
+            self._lock = threading.Lock()
+            self._connections = weakref.WeakSet()
+        pooled = getattr(self._local, "pooled", None)
+        if pooled is None:
+            pooled = self._connect()
+            self._local.pooled = pooled
+        return pooled.conn
+
+    @contextmanager
+    def transaction(self) -> Iterator[sqlite3.Connection]:
+        """Run a block in one transaction; commit on success, roll back on error."""
+        conn = self.connection()
+        with conn:
+            yield conn
+
+    def release(self):
+        """Close the calling thread's connection, if it has one (the next use reopens it)."""
+        pooled = getattr(self._local, "pooled", None)
+        if pooled is not None:
+            del self._local.pooled
+            pooled.close()
+
+    def open_connections(self) -> int:
+        """Connections currently open, across threads."""
+        with self._lock:
+            return len(self._connections)
+
+    def close(self):
+        """Close every pooled connection."""
+        with self._lock:
+            for pooled in list(self._connections):
+                pooled.close()
+            self._connections = weakref.WeakSet()
+        self._local = threading.local()
@@ -0,0 +1,49 @@
+"""Shared fixtures: every test gets a fresh database under tmp_path."""
+
+import functools
+import importlib.util
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
+# gcp creates DB_PATH's directory on import: keep it out of the working tree
+os.environ.setdefault("ECOPULSE_DB_PATH", str(Path(tempfile.gettempdir()) / "ecopulse-tests" / "ecopulse.db"))
+
+from common import gcp  # noqa: E402
+
+
+@pytest.fixture
+def db(tmp_path, monkeypatch):
+    """gcp pointed at an initialized, empty database."""
+    monkeypatch.setattr(gcp, "DB_PATH", tmp_path / "ecopulse.db")
+    gcp.init_db()
+    yield gcp
+    gcp.get_storage().close()
+
+
+@functools.lru_cache(maxsize=None)
+def load_service(name: str):
+    """A service's main module (services/<name>/main.py), imported once per session."""
+    path = Path(__file__).resolve().parents[2] / name / "main.py"
+    spec = importlib.util.spec_from_file_location(name.replace("-", "_"), path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+@pytest.fixture
+def gateway(db, monkeypatch):
+    """TestClient for the gateway, with an empty response cache."""
+    from fastapi.testclient import TestClient
+    from common.cache import ResponseCache
+
+    module = load_service("gateway-api")
+    cache = ResponseCache()
+    monkeypatch.setattr(module, "response_cache", cache)
+    monkeypatch.setattr(gcp, "_write_listeners", [cache.invalidate])
+    with TestClient(module.app) as client:
+        yield client
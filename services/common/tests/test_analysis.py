@@ -0,0 +1,89 @@
+from datetime import datetime, timezone
+
+from common import analysis
+
+START = 1_704_067_200  # 2024-01-01T00:00:00Z
+
+
+def _rows(start: int, count: int, spike_at: int = None, site: str = "plant-a"):
+    rows = []
+    for i in range(start, start + count):
+        ts = START + i * 900
+        kw = 500.0 if i == spike_at else 50.0 + i % 5
+        iso = datetime.fromtimestamp(ts, timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
+        rows.append((iso, ts, kw, site, 0.2, 0.1, 15.0))
+    return rows
+
+
+def _analyze(site: str = "plant-a"):
+    result = analysis.analyze_site(site)
+    analysis.save_analyses([result])
+    return result
+
+
+def test_incremental_analysis_carries_anomalies_forward(db):
+    db.insert_energy_rows(_rows(0, 200, spike_at=100))
+    assert len(_analyze()["insight"].anomalies) == 1
+
+    db.insert_energy_rows(_rows(200, 5))
+    result = _analyze()
+    assert "(5 new)" in result["insight"].summary
+    assert [a.kw for a in result["insight"].anomalies] == [500.0]
+    assert db.site_leaderboard("anomalies")[0].value == 1
+
+
+def test_backfill_before_watermark_forces_full_recompute(db):
+    db.insert_energy_rows(_rows(100, 100))
+    assert _analyze()["insight"].anomalies == []
+
+    # Older than the watermark: an incremental read would never see it
+    db.insert_energy_rows(_rows(0, 100, spike_at=50))
+    result = _analyze()
+    assert result["status"] == "success"
+    assert "new)" not in result["insight"].summary
+    assert [a.kw for a in result["insight"].anomalies] == [500.0]
+    assert _analyze()["status"] == "up_to_date"
+
+
+def test_replaced_row_forces_full_recompute(db):
+    db.insert_energy_rows(_rows(0, 200))
+    assert _analyze()["insight"].anomalies == []
+
+    db.insert_energy_rows(_rows(100, 1, spike_at=100), policy="replace")
+    result = _analyze()
+    assert result["status"] == "success"
+    assert [a.kw for a in result["insight"].anomalies] == [500.0]
+    assert _analyze()["status"] == "up_to_date"
+
+
+def test_incremental_and_full_analysis_agree(db, monkeypatch):
+    monkeypatch.setattr(analysis, "INCREMENTAL_WINDOW", 300)
+    # The first spike slides out of the window; the baseline moves with it
+    db.insert_energy_rows(_rows(0, 200, spike_at=20))
+    _analyze()
+    for start in range(200, 500, 50):
+        db.insert_energy_rows(_rows(start, 50, spike_at=start + 10 if start == 350 else None))
+        incremental = _analyze()
+        assert "(50 new)" in incremental["insight"].summary
+        full = analysis.analyze_site("plant-a", full=True)
+        assert incremental["insight"].anomalies == full["insight"].anomalies
+    assert [a.timestamp for a in full["insight"].anomalies] == [_rows(360, 1)[0][0]]
+
+
+def test_batch_commits_in_chunks_and_on_close(db, monkeypatch):
+    monkeypatch.setattr(analysis, "BATCH_COMMIT_SIZE", 2)
+    sites = [f"plant-{i}" for i in range(5)]
+    for site in sites:
+        db.insert_energy_rows(_rows(0, 50, site=site))
+
+    lines = list(analysis.analyze_batch(sites, workers=1))
+    committed = [line["insight_ids"] for line in lines if line["status"] == "committed"]
+    assert [len(ids) for ids in committed] == [2, 2, 1]
+    assert lines[-1]["status"] == "committed"
+
+    for site in sites:
+        db.insert_energy_rows(_rows(50, 1, site=site))
+    batch = analysis.analyze_batch(sites, workers=1)
+    assert next(batch)["status"] == "success"
+    batch.close()
+    assert sum(len(db.list_insights(site, limit=10)) for site in sites) == 6
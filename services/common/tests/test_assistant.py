@@ -0,0 +1,45 @@
+import pytest
+
+from common import analysis
+from conftest import load_service
+
+
+@pytest.fixture
+def assistant(gateway):
+    from fastapi.testclient import TestClient
+
+    for site, cost in (("plant-a", 1.0), ("plant-b", 2.0), ("plant-c", 3.0)):
+        csv = "timestamp,kw,cost_usd\n" + "".join(f"2024-01-01T{h:02d}:00:00Z,50,{cost}\n" for h in range(10))
+        gateway.post(f"/upload?site={site}", files={"file": ("a.csv", csv)})
+        analysis.run_analysis(site)
+    with TestClient(load_service("agent-assistant").app) as client:
+        yield client
+
+
+def _ask(client, q: str) -> dict:
+    return client.post("/ask", json={"site": "plant-a", "q": q}).json()
+
+
+def test_comparison_is_restricted_to_named_sites(assistant):
+    answer = _ask(assistant, "Compare plant-a and plant-b by cost")
+    assert answer["sources"] == ["Site leaderboard (cost_usd)"]
+    assert "plant-b ($20.00), plant-a ($10.00)" in answer["answer"]
+    assert "plant-c" not in answer["answer"]
+
+    answer = _ask(assistant, "plant-c vs plant-a: which has the lowest cost?")
+    assert "plant-a ($10.00), plant-c ($30.00)" in answer["answer"]
+
+
+def test_topical_questions_are_not_rankings(assistant):
+    for q in (
+        "How does cost compare to last week?",
+        "Any anomalies across our sites?",
+        "What is the forecast for tomorrow compared to yesterday?",
+        "Show me the plan ranked by priority",
+    ):
+        assert not any("leaderboard" in source for source in _ask(assistant, q)["sources"]), q
+
+
+def test_top_k_ranks_every_site(assistant):
+    answer = _ask(assistant, "Top 2 sites by cost")
+    assert answer["answer"].startswith("Top 2 sites by energy cost: plant-c ($30.00), plant-b ($20.00).")
@@ -0,0 +1,53 @@
+from common.cache import ResponseCache, make_etag
+from common.models import Insight
+
+
+def _insight(site: str, summary: str) -> Insight:
+    return Insight(site=site, created_at="2024-01-01T00:00:00", summary=summary)
+
+
+def test_save_bumps_version_and_invalidates_listing(gateway, db):
+    db.save_insight(_insight("plant-a", "first"))
+    version = db.site_version("insights", "plant-a")
+    first = gateway.get("/insights", params={"site": "plant-a"})
+    assert first.headers["etag"] == make_etag("insights", "plant-a", 10, version)
+    assert gateway.get("/cache/stats").json()["entries"] == 1
+
+    db.save_insight(_insight("plant-a", "second"))
+    assert db.site_version("insights", "plant-a") == version + 1
+    assert db.site_version("plans", "plant-a") == 0
+    stats = gateway.get("/cache/stats").json()
+    assert (stats["entries"], stats["invalidations"]) == (0, 1)
+
+    second = gateway.get("/insights", params={"site": "plant-a"})
+    assert second.headers["etag"] != first.headers["etag"]
+    assert [i["summary"] for i in second.json()] == ["second", "first"]
+
+
+def test_if_none_match_is_304_only_while_version_unchanged(gateway, db):
+    db.save_insight(_insight("plant-a", "first"))
+    etag = gateway.get("/insights", params={"site": "plant-a"}).headers["etag"]
+
+    for _ in range(2):
+        unchanged = gateway.get("/insights", params={"site": "plant-a"}, headers={"If-None-Match": etag})
+        assert (unchanged.status_code, unchanged.headers["etag"], unchanged.content) == (304, etag, b"")
+    # Another site's write leaves this listing's version alone
+    db.save_insight(_insight("plant-b", "other"))
+    assert gateway.get("/insights", params={"site": "plant-a"}, headers={"If-None-Match": etag}).status_code == 304
+
+    db.save_insight(_insight("plant-a", "second"))
+    changed = gateway.get("/insights", params={"site": "plant-a"}, headers={"If-None-Match": etag})
+    assert changed.status_code == 200
+    assert changed.headers["etag"] != etag
+    assert gateway.get(
+        "/insights", params={"site": "plant-a"}, headers={"If-None-Match": f'"stale", {changed.headers["etag"]}'}
+    ).status_code == 304
+
+
+def test_newer_version_misses_without_invalidate():
+    # Writes from another process only show up as a version bump
+    cache = ResponseCache()
+    cache.put("insights", "plant-a", 10, 1, b"[]")
+    assert cache.get("insights", "plant-a", 10, 1).body == b"[]"
+    assert cache.get("insights", "plant-a", 10, 2) is None
+    assert cache.stats()["entries"] == 0
@@ -0,0 +1,57 @@
+import pytest
+
+from common import columnar
+
+START = 1_704_067_200  # 2024-01-01T00:00:00Z
+
+
+def _rows(site: str, start: int, count: int):
+    return [(f"t{i}", START + i * 900, float(i), site, None, None, None) for i in range(start, start + count)]
+
+
+@pytest.fixture
+def store(db, tmp_path, monkeypatch):
+    monkeypatch.setattr(columnar, "ENERGY_COLUMNAR_DIR", str(tmp_path / "columnar"))
+    return columnar.get_store()
+
+
+def test_partially_covered_site_is_read_from_sqlite(db, tmp_path, monkeypatch):
+    db.insert_energy_rows(_rows("plant-a", 0, 100))
+    monkeypatch.setattr(columnar, "ENERGY_COLUMNAR_DIR", str(tmp_path / "columnar"))
+    store = columnar.get_store()
+    db.insert_energy_rows(_rows("plant-a", 100, 10))
+
+    assert store.rows("plant-a") == 10
+    assert store.read("plant-a") is None
+    assert len(db.read_energy_arrays("plant-a")["kw"]) == 110
+
+    assert db.rebuild_columnar(["plant-a"]) == {"plant-a": 110}
+    assert len(store.read("plant-a")["kw"]) == 110
+
+
+def test_site_first_ingested_with_store_is_complete(store, db):
+    db.insert_energy_rows(_rows("plant-b", 0, 50))
+    db.insert_energy_rows(_rows("plant-b", 50, 50))
+    assert store.is_complete("plant-b")
+    assert store.read("plant-b")["kw"].tolist() == [float(i) for i in range(100)]
+
+
+def test_reset_clears_completeness(store, db):
+    db.insert_energy_rows(_rows("plant-c", 0, 10))
+    store.reset("plant-c")
+    assert not store.is_complete("plant-c")
+    assert len(db.read_energy_arrays("plant-c")["kw"]) == 10
+
+
+@pytest.mark.parametrize("columnar_store", [False, True])
+def test_read_energy_is_newest_first_and_arrays_oldest_first(db, tmp_path, monkeypatch, columnar_store):
+    if columnar_store:
+        monkeypatch.setattr(columnar, "ENERGY_COLUMNAR_DIR", str(tmp_path / "columnar"))
+    db.insert_energy_rows(_rows("plant-d", 0, 20))
+
+    assert [p.kw for p in db.read_energy("plant-d", limit=5)] == [19.0, 18.0, 17.0, 16.0, 15.0]
+    assert len(db.read_energy("plant-d", limit=None)) == 20
+    arrays = db.read_energy_arrays("plant-d", ["ts_epoch", "kw"], limit=5)
+    assert arrays["kw"].tolist() == [15.0, 16.0, 17.0, 18.0, 19.0]
+    assert (arrays["ts_epoch"][1:] > arrays["ts_epoch"][:-1]).all()
+    assert (columnar.get_store() is not None) == columnar_store
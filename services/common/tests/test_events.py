@@ -0,0 +1,44 @@
+import threading
+import time
+
+from common.events import SqliteEventBus
+
+
+def test_timed_flushes_share_one_thread_and_connection(db):
+    bus = SqliteEventBus(db.get_storage, flush_interval=0.002)
+    flushed_on = set()
+    flush = bus.flush
+
+    def recording_flush():
+        flushed_on.add(threading.get_ident())
+        flush()
+
+    bus.flush = recording_flush
+    threads = threading.active_count()
+    for i in range(50):
+        bus.publish("event.test", {"i": i})
+        time.sleep(0.005)
+    conn = db.get_storage().connection()
+    deadline = time.monotonic() + 5
+    while conn.execute("SELECT COUNT(*) FROM events").fetchone()[0] < 50 and time.monotonic() < deadline:
+        time.sleep(0.01)
+
+    assert len(flushed_on) == 1
+    assert threading.active_count() <= threads + 1
+    # This thread's and the flusher's
+    assert db.get_storage().open_connections() <= 2
+    assert conn.execute("SELECT COUNT(*) FROM events").fetchone()[0] == 50
+
+
+def test_full_buffer_drops_oldest(db):
+    bus = SqliteEventBus(db.get_storage, queue_size=3, batch_size=100, flush_interval=60, publish_timeout=0.01)
+    for i in range(5):
+        bus.publish("event.test", {"i": i})
+    assert (bus.stats()["buffered"], bus.stats()["dropped"]) == (3, 2)
+
+    bus.flush()
+    conn = db.get_storage().connection()
+    assert [row[0] for row in conn.execute("SELECT data_json FROM events ORDER BY seq")] == [
+        '{"i": 2}', '{"i": 3}', '{"i": 4}'
+    ]
+    assert bus.stats()["buffered"] == 0
@@ -0,0 +1,96 @@
+import numpy as np
+import pytest
+
+from common import forecasting
+
+START = 1_704_067_200  # 2024-01-01T00:00:00Z
+HOUR = 3600
+
+
+@pytest.fixture(autouse=True)
+def empty_param_cache():
+    forecasting.clear_param_cache()
+    yield
+    forecasting.clear_param_cache()
+
+
+def _curve(hours: int, amplitude: float = 20.0, offset: int = 0) -> np.ndarray:
+    t = np.arange(offset, offset + hours)
+    return 50.0 + amplitude * np.sin(2 * np.pi * t / 24)
+
+
+def _series(hours: int, amplitude: float = 20.0, days_later: int = 0) -> forecasting.SiteSeries:
+    offset = days_later * 24
+    temp = 15.0 + 5.0 * np.sin(2 * np.pi * (np.arange(offset, offset + hours) - 6) / 24)
+    return forecasting.SiteSeries(START + offset * HOUR, _curve(hours, amplitude, offset), temp)
+
+
+def _kw(points) -> np.ndarray:
+    return np.array([p.kw for p in points])
+
+
+@pytest.mark.parametrize("model, tolerance", [("seasonal_naive", 1e-9), ("holt_winters", 1e-6), ("ridge", 0.01)])
+def test_models_continue_a_seasonal_curve(model, tolerance):
+    points = forecasting.forecast_many({"plant-a": _series(8 * 24)}, model, horizon=36)["plant-a"]
+
+    assert len(points) == 36
+    assert points[0].timestamp == "2024-01-09T00:00:00+00:00"
+    assert np.abs(_kw(points) - _curve(36, offset=8 * 24)).max() < tolerance
+
+
+def test_short_history_falls_back():
+    assert forecasting._effective_model("holt_winters", 30, 24) == "seasonal_naive"
+    assert forecasting._effective_model("ridge", 10, 24) == "naive"
+    points = forecasting.forecast_many({"plant-a": _series(10)}, "holt_winters", horizon=3)["plant-a"]
+    assert _kw(points).tolist() == [_curve(10)[-1]] * 3
+
+
+@pytest.mark.parametrize("model", ["seasonal_naive", "holt_winters", "ridge"])
+def test_batched_fit_matches_one_site_at_a_time(model):
+    series = {
+        "plant-a": _series(8 * 24),
+        "plant-b": _series(8 * 24, amplitude=5.0),
+        "plant-c": _series(5 * 24, amplitude=40.0),
+        "plant-d": _series(30),
+    }
+    batched = forecasting.forecast_many(series, model, horizon=24)
+    forecasting.clear_param_cache()
+
+    assert sorted(batched) == sorted(series)
+    for site, s in series.items():
+        alone = forecasting.forecast_many({site: s}, model, horizon=24)[site]
+        assert [p.timestamp for p in batched[site]] == [p.timestamp for p in alone]
+        np.testing.assert_allclose(_kw(batched[site]), _kw(alone), rtol=1e-9)
+
+
+@pytest.mark.parametrize("model", ["holt_winters", "ridge"])
+def test_cached_params_are_reused_until_refit(model):
+    forecasting.forecast_many({"plant-a": _series(8 * 24)}, model, horizon=24)
+    state = forecasting.fitted_params("plant-a", model, HOUR)
+    assert state["fitted_through"] == START + (8 * 24 - 1) * HOUR
+    assert forecasting.fitted_params("plant-a", model, 900) is None
+
+    # Restored into a fresh process (here: an emptied cache), the saved fit is used as is
+    forecasting.clear_param_cache()
+    planted = {**state, "params": [0.8, 0.0, 0.05] if model == "holt_winters" else [0.0] * len(state["params"])}
+    forecasting.restore_params("plant-a", planted)
+    later = _series(8 * 24 + 6)
+    reused = forecasting.forecast_many({"plant-a": later}, model, horizon=24)["plant-a"]
+    assert forecasting.fitted_params("plant-a", model, HOUR) == planted
+    if model == "ridge":
+        assert _kw(reused).tolist() == [0.0] * 24
+
+    # An older fit never replaces a newer cached one
+    forecasting.restore_params("plant-a", {**state, "fitted_through": state["fitted_through"] - HOUR})
+    assert forecasting.fitted_params("plant-a", model, HOUR) == planted
+
+    # A season of new data triggers a refit
+    forecasting.forecast_many({"plant-a": _series(8 * 24, days_later=1)}, model, horizon=24)
+    refit = forecasting.fitted_params("plant-a", model, HOUR)
+    assert refit["fitted_through"] == START + (9 * 24 - 1) * HOUR
+    assert refit["params"] != planted["params"]
+
+
+def test_unknown_model():
+    with pytest.raises(ValueError, match="Unknown forecast model 'arima'"):
+        forecasting.forecast_many({"plant-a": _series(48)}, "arima")
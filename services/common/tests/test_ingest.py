@@ -0,0 +1,59 @@
+import asyncio
+
+import pytest
+
+from common.ingest import ingest_csv_stream
+
+START = 1_704_067_200  # 2024-01-01T00:00:00Z
+
+
+def _row(kw: float):
+    return ("2024-01-01T00:00:00Z", START, kw, "plant-a", None, None, None)
+
+
+def _stored_kw(db) -> list:
+    return db.read_energy_arrays("plant-a", ["kw"])["kw"].tolist()
+
+
+def test_ignore_keeps_the_stored_row(db):
+    db.insert_energy_rows([_row(1.0)])
+    assert db.insert_energy_rows([_row(2.0)], policy="ignore") == (0, 0, 1)
+    assert _stored_kw(db) == [1.0]
+
+
+def test_replace_overwrites_and_skips_identical_resends(db):
+    db.insert_energy_rows([_row(1.0)])
+    assert db.insert_energy_rows([_row(1.0)], policy="replace") == (0, 0, 1)
+    assert db.insert_energy_rows([_row(2.0)], policy="replace") == (0, 1, 0)
+    assert _stored_kw(db) == [2.0]
+
+
+def test_latest_compares_source_times(db):
+    db.insert_energy_rows([_row(1.0)], created_at=db.ingest_created_at("2024-02-01T00:00:00Z"))
+    older = db.ingest_created_at("2024-01-15T00:00:00+01:00")
+    assert db.insert_energy_rows([_row(2.0)], policy="latest", created_at=older) == (0, 0, 1)
+    assert _stored_kw(db) == [1.0]
+
+    newer = db.ingest_created_at("2024-03-01T00:00:00")
+    assert db.insert_energy_rows([_row(3.0)], policy="latest", created_at=newer) == (0, 1, 0)
+    assert _stored_kw(db) == [3.0]
+
+
+def test_upload_as_of_is_the_source_time(db):
+    def reader(body: bytes):
+        chunks = [body, b""]
+
+        async def read(size: int) -> bytes:
+            return chunks.pop(0)
+        return read
+
+    csv = b"timestamp,kw\n2024-01-01T00:00:00Z,5\n"
+    asyncio.run(ingest_csv_stream(reader(csv), "plant-a", as_of="2024-06-01T00:00:00Z"))
+    stale = asyncio.run(ingest_csv_stream(
+        reader(csv.replace(b",5", b",7")), "plant-a", policy="latest", as_of="2024-05-01T00:00:00Z"
+    ))
+    assert stale.counts.skipped == 1
+    assert _stored_kw(db) == [5.0]
+
+    with pytest.raises(ValueError):
+        asyncio.run(ingest_csv_stream(reader(csv), "plant-a", as_of="last week"))
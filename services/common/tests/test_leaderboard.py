@@ -0,0 +1,25 @@
+from common import analysis
+
+
+def _csv(start_hour: int, hours: int, cost: float) -> str:
+    return "timestamp,kw,cost_usd,co2_kg\n" + "".join(
+        f"2024-01-01T{h:02d}:00:00Z,50,{cost},2\n" for h in range(start_hour, start_hour + hours)
+    )
+
+
+def _cost(gateway, site: str) -> float:
+    entries = gateway.get("/leaderboard", params={"metric": "cost_usd"}).json()["entries"]
+    return {entry["site"]: entry["value"] for entry in entries}[site]
+
+
+def test_ingest_refreshes_cost_totals(gateway):
+    for site in ("plant-a", "plant-b"):
+        gateway.post(f"/upload?site={site}", files={"file": ("a.csv", _csv(0, 10, 1.0))})
+        analysis.run_analysis(site)
+    assert _cost(gateway, "plant-a") == 10.0
+
+    # No analysis in between: the upload alone moves the ranking
+    gateway.post("/upload?site=plant-a", files={"file": ("b.csv", _csv(10, 5, 4.0))})
+    assert _cost(gateway, "plant-a") == 30.0
+    assert _cost(gateway, "plant-b") == 10.0
+    assert gateway.get("/leaderboard", params={"metric": "cost_usd"}).json()["entries"][0]["site"] == "plant-a"
@@ -0,0 +1,83 @@
+import asyncio
+
+from common import metrics
+
+
+def test_histogram_buckets_are_cumulative_with_sum_and_count(monkeypatch):
+    monkeypatch.setattr(metrics, "FOLD_SIZE", 2)
+    hist = metrics.Histogram("test_seconds", "Test latency", ("route",), buckets=(1.0, 0.125, 0.5))
+    child = hist.labels("/a")
+    # A value on a bound counts in that bound's bucket; the last is past every bound
+    for value in (0.0625, 0.125, 0.25, 0.5, 0.75, 2.0):
+        child.observe(value)
+
+    assert hist.render()[2:] == [
+        'test_seconds_bucket{route="/a",le="0.125"} 2',
+        'test_seconds_bucket{route="/a",le="0.5"} 4',
+        'test_seconds_bucket{route="/a",le="1"} 5',
+        'test_seconds_bucket{route="/a",le="+Inf"} 6',
+        'test_seconds_sum{route="/a"} 3.6875',
+        'test_seconds_count{route="/a"} 6',
+    ]
+
+
+def test_histogram_quantile_from_buckets():
+    hist = metrics.Histogram("test_quantile_seconds", "Test latency", buckets=(0.01, 0.1, 1.0))
+    for i in range(100):
+        hist.observe(0.005 if i < 90 else 0.5)
+
+    buckets = {values[-1]: count for suffix, values, count in hist.samples() if suffix == "_bucket"}
+    # p90 falls in the first bucket, p99 in the third (as histogram_quantile reads them)
+    assert buckets == {"0.01": 90, "0.1": 90, "1": 100, "+Inf": 100}
+
+
+def test_timed_async_observes_awaited_time_and_exceptions():
+    hist = metrics.Histogram("test_async_seconds", "Test latency", ("function",))
+
+    @metrics.timed(hist)
+    async def slow(fail: bool = False):
+        await asyncio.sleep(0.02)
+        if fail:
+            raise RuntimeError("boom")
+        return "done"
+
+    assert asyncio.iscoroutinefunction(slow)
+    assert slow.__name__ == "slow"
+    assert asyncio.run(slow()) == "done"
+    try:
+        asyncio.run(slow(fail=True))
+    except RuntimeError:
+        pass
+
+    counts, total = hist.labels("slow").snapshot()
+    assert sum(counts) == 2
+    assert total >= 0.04
+
+
+def test_text_exposition_format():
+    registry = metrics.Registry()
+    requests = registry.register(metrics.Counter("test_requests_total", "Requests\nserved", ("path",)))
+    requests.labels('/say "hi"\\').inc()
+    requests.labels("/b").inc(2.5)
+    registry.register(metrics.Gauge("test_depth", "Queue depth", collect=lambda: {(): 3}))
+
+    assert registry.render() == (
+        "# HELP test_depth Queue depth\n"
+        "# TYPE test_depth gauge\n"
+        "test_depth 3\n"
+        "# HELP test_requests_total Requests\\nserved\n"
+        "# TYPE test_requests_total counter\n"
+        'test_requests_total{path="/say \\"hi\\"\\\\"} 1\n'
+        'test_requests_total{path="/b"} 2.5\n'
+    )
+
+
+def test_requests_are_labelled_by_route_template(gateway):
+    assert gateway.get("/upload/errors/missing").status_code == 404
+    response = gateway.get("/metrics")
+
+    assert response.headers["content-type"].startswith("text/plain; version=0.0.4")
+    assert (
+        'ecopulse_http_request_duration_seconds_count{method="GET",route="/upload/errors/{report_id}",status="404"}'
+        in response.text
+    )
@@ -0,0 +1,91 @@
+import json
+import sqlite3
+
+import pytest
+
+from common import gcp, payloads, schema
+from common.models import Anomaly, ForecastPoint, Insight, Plan, PlanItem
+
+ANOMALIES = [
+    Anomaly(timestamp="2024-01-01T00:00:00Z", kw=500.0, expected_kw=52.5, deviation=8.5, severity="high"),
+    Anomaly(timestamp="2024-01-01T00:15:00Z", kw=-0.0, expected_kw=1e-300, deviation=-2.25, severity="low"),
+    Anomaly(timestamp="2024-01-01T00:30:00Z", kw=61.0, expected_kw=52.5, deviation=2.1, severity="high"),
+]
+FORECAST = [ForecastPoint(timestamp=f"2024-01-02T{h:02d}:00:00Z", kw=50.0 + h / 3) for h in range(24)]
+ITEMS = [
+    PlanItem(action="Décaler la charge → 22h", priority="high", expected_impact_kw=12.5, rationale="Pic à 18h ⚡"),
+    PlanItem(action="", priority="低", expected_impact_kw=0.0, rationale="負荷を平準化する 🏭"),
+]
+
+
+def test_insight_details_round_trip():
+    payload = payloads.pack_insight_details(ANOMALIES, FORECAST)
+    assert payload[0] == payloads.PAYLOAD_VERSION
+    assert payloads.unpack_insight_details(payload) == (ANOMALIES, FORECAST)
+
+
+def test_empty_lists_round_trip():
+    assert payloads.unpack_insight_details(payloads.pack_insight_details([], [])) == ([], [])
+    assert payloads.unpack_insight_details(payloads.pack_insight_details([], FORECAST)) == ([], FORECAST)
+    assert payloads.unpack_plan_items(payloads.pack_plan_items([])) == []
+
+
+def test_non_ascii_text_round_trips():
+    # Lengths are code points; the run is UTF-8, so multi-byte text must slice cleanly
+    assert payloads.unpack_plan_items(payloads.pack_plan_items(ITEMS)) == ITEMS
+
+
+def test_unknown_version_is_rejected():
+    payload = payloads.pack_plan_items(ITEMS)
+    with pytest.raises(ValueError, match="unsupported payload version"):
+        payloads.unpack_plan_items(bytes([payloads.PAYLOAD_VERSION + 1]) + payload[1:])
+
+
+def test_none_optionals_survive_storage(db):
+    insight = Insight(site="plant-é", created_at="2024-01-01T00:00:00", summary="Résumé", anomalies=ANOMALIES)
+    count, severities, forecast_count, forecast_mean, _ = payloads.insight_columns(insight)
+    assert (count, forecast_count, forecast_mean) == (3, 0, None)
+    assert payloads.parse_severities(None) == {}
+    assert payloads.parse_severities(severities)["high"].count == 2
+
+    db.save_insight(insight)
+    db.save_plan(Plan(site="plant-é", created_at="2024-01-01T00:00:00", rationale="", items=ITEMS))
+    stored = db.list_insights("plant-é", limit=1)[0]
+    assert (stored.mode, stored.anomalies, stored.forecast_24h) == (None, ANOMALIES, [])
+    plan = db.list_plans("plant-é", limit=1)[0]
+    assert (plan.insight_id, plan.items) == (None, ITEMS)
+
+
+def test_v12_migrates_json_details(tmp_path, monkeypatch):
+    path = tmp_path / "ecopulse.db"
+    conn = sqlite3.connect(path)
+    for target, step in schema.MIGRATIONS:
+        if target < 12:
+            step(conn)
+            conn.execute(f"PRAGMA user_version = {target}")
+    data = {
+        "anomalies": [a.dict() for a in ANOMALIES],
+        "forecast_24h": [f.dict() for f in FORECAST]
+    }
+    conn.execute(
+        "INSERT INTO insights (site, created_at, summary, mode, data_json) VALUES (?, ?, ?, ?, ?)",
+        ("plant-a", "2024-01-01T00:00:00", "Old insight", None, json.dumps(data))
+    )
+    conn.execute(
+        "INSERT INTO plans (site, created_at, rationale, insight_id, data_json) VALUES (?, ?, ?, ?, ?)",
+        ("plant-a", "2024-01-01T00:00:00", "Old plan", 1, json.dumps({"items": [i.dict() for i in ITEMS]}))
+    )
+    conn.commit()
+    conn.close()
+
+    monkeypatch.setattr(gcp, "DB_PATH", path)
+    try:
+        gcp.init_db()
+        insight = gcp.list_insights("plant-a", limit=1)[0]
+        assert (insight.summary, insight.anomalies, insight.forecast_24h) == ("Old insight", ANOMALIES, FORECAST)
+        assert gcp.list_plans("plant-a", limit=1)[0].items == ITEMS
+        conn = gcp.get_storage().connection()
+        assert conn.execute("SELECT COUNT(*) FROM insights WHERE data_json IS NOT NULL").fetchone()[0] == 0
+        assert tuple(conn.execute("SELECT anomaly_count, forecast_count FROM insights").fetchone()) == (3, 24)
+    finally:
+        gcp.get_storage().close()
@@ -0,0 +1,33 @@
+import asyncio
+
+from common.events import EventBus
+from common.pipeline import PipelineRunner
+
+START = 1_704_067_200  # 2024-01-01T00:00:00Z
+
+
+def test_uploads_within_debounce_trigger_one_run(db):
+    db.insert_energy_rows([(f"t{i}", START + i * 900, 50.0 + i % 5, "plant-a", None, None, None) for i in range(200)])
+    bus = EventBus()
+
+    async def scenario():
+        runner = PipelineRunner(bus, debounce=0.2, max_delay=5.0)
+        task = runner.start()
+        await asyncio.sleep(0)
+        for _ in range(5):
+            bus.publish("event.ingest", {"site": "plant-a", "rows_ingested": 40})
+            await asyncio.sleep(0.02)
+        while runner.runs == 0 and runner.errors == 0:
+            await asyncio.sleep(0.05)
+        await asyncio.sleep(0.3)
+        await runner.stop()
+        # stop() waited for the consumer to finish, closing its subscription
+        assert task.cancelled()
+        assert bus.stats()["topics"]["event.ingest"]["subscribers"] == 0
+        return runner
+
+    runner = asyncio.run(scenario())
+    assert (runner.runs, runner.errors) == (1, 0)
+    assert runner.latency["debounce"].count == 1
+    assert len(db.list_insights("plant-a")) == 1
+    assert len(db.list_plans("plant-a")) == 1
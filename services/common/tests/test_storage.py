@@ -0,0 +1,40 @@
+import threading
+
+from common.storage import Storage
+
+
+def _query_on_thread(storage: Storage):
+    thread = threading.Thread(target=lambda: storage.connection().execute("SELECT 1").fetchone())
+    thread.start()
+    thread.join()
+
+
+def test_connection_is_per_thread_and_reused(tmp_path):
+    storage = Storage(tmp_path / "t.db")
+    assert storage.connection() is storage.connection()
+    seen = []
+    thread = threading.Thread(target=lambda: seen.append(storage.connection()))
+    thread.start()
+    thread.join()
+    assert seen[0] is not storage.connection()
+    storage.close()
+
+
+def test_exited_threads_release_their_connections(tmp_path):
+    storage = Storage(tmp_path / "t.db")
+    storage.connection()
+    for _ in range(20):
+        _query_on_thread(storage)
+    assert storage.open_connections() == 1
+    storage.close()
+
+
+def test_release_and_close(tmp_path):
+    storage = Storage(tmp_path / "t.db")
+    storage.connection().execute("CREATE TABLE t (x)")
+    storage.release()
+    assert storage.open_connections() == 0
+    # The next use reopens
+    assert storage.connection().execute("SELECT COUNT(*) FROM t").fetchone()[0] == 0
+    storage.close()
+    assert storage.open_connections() == 0
@@ -1,18 +1,32 @@
 """Gateway API service - Entry point for uploads, insights, and plans."""
 
+from fastapi import FastAPI, UploadFile, File, Query, HTTPException, Request, Response
+from fastapi.middleware.cors import CORSMiddleware
+from typing import List, Optional
 import csv
 import io
-from fastapi import FastAPI, UploadFile, File, Query, HTTPException
-from fastapi.middleware.cors import CORSMiddleware
-from typing import List
+import json
+import os
 import sys
+import tempfile
 from pathlib import Path
+import numpy as np
 
 # Add common to path
 sys.path.insert(0, str(Path(__file__).parent.parent))
 
-from common.gcp import init_db, insert_energy, list_insights, list_plans, publish_event
-from common.models import EnergyPoint, Insight, Plan
+from common import aio, metrics
+from common.cache import ResponseCache, make_etag
+from common.gcp import CONFLICT_POLICIES, INGEST_CHUNK_SIZE, LEADERBOARD_METRICS, add_write_listener, publish_event
+from common.ingest import INGEST_WORKERS, UPLOAD_READ_SIZE, ingest_csv_stream, ingest_files
+from common.models import Insight, Plan
+from common.pipeline import PipelineRunner
+from common.rollups import AGGREGATES, BUCKET_SECONDS, lttb, uses_rollup
+from common.schema import to_epoch
+
+# Run harvest → analyze → plan automatically after uploads (needs MOCK=1
+# so publish_event reaches the local event bus)
+PIPELINE_ENABLED = os.getenv("PIPELINE_ENABLED", "0") == "1"
 
 app = FastAPI(
     title="EcoPulse Gateway API",
@@ -29,10 +43,40 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Request latency per route, and every registered metric on GET /metrics
+metrics.instrument_app(app)
+
+# Serialized /insights and /plans responses; writes made in this process
+# drop a site's entries at once, others are caught by the version check
+response_cache = ResponseCache()
+add_write_listener(response_cache.invalidate)
+
+# Read from the cache's own counters at scrape time; hit rate is
+# hit / (hit + miss) over ecopulse_response_cache_lookups_total
+metrics.counter(
+    "ecopulse_response_cache_lookups_total", "Response cache lookups by result", ("result",),
+    lambda: {("hit",): response_cache.hits, ("miss",): response_cache.misses}
+)
+metrics.counter(
+    "ecopulse_response_cache_evictions_total", "Response cache entries evicted over the byte budget", (),
+    lambda: {(): response_cache.evictions}
+)
+metrics.gauge("ecopulse_response_cache_bytes", "Response cache body bytes held", (), lambda: {(): response_cache.bytes})
+
+pipeline = PipelineRunner() if PIPELINE_ENABLED else None
+
 # Initialize database on startup
 @app.on_event("startup")
 async def startup():
-    init_db()
+    await aio.init_db()
+    if pipeline is not None:
+        pipeline.start()
+
+
+@app.on_event("shutdown")
+async def shutdown():
+    if pipeline is not None:
+        await pipeline.stop()
 
 
 @app.get("/health")
@@ -44,63 +88,235 @@ async def health():
 @app.post("/upload")
 async def upload_csv(
     file: UploadFile = File(...),
-    site: str = Query(default="plant-a", description="Site identifier")
+    site: str = Query(default="plant-a", description="Site identifier"),
+    batch_size: int = Query(default=INGEST_CHUNK_SIZE, ge=1, le=100_000, description="Rows buffered per storage flush"),
+    on_conflict: Optional[str] = Query(
+        default=None, pattern=f"^({'|'.join(CONFLICT_POLICIES)})$",
+        description="Rows already stored for the same timestamp: ignore, replace, or latest (default: ENERGY_CONFLICT_POLICY)"
+    ),
+    as_of: Optional[str] = Query(default=None, description="ISO-8601 source time of the data, compared by on_conflict=latest; default: now")
 ):
     """
     Upload CSV file with energy data.
     
     Expected CSV format:
     timestamp,kw[,cost_usd,co2_kg,temp_c]
+    
+    The file is streamed: read in chunks, decoded incrementally, parsed
+    column-wise and flushed to storage every `batch_size` rows, so memory
+    does not grow with file size. Uploads are idempotent: a row whose
+    timestamp is already stored for the site is inserted at most once,
+    per `on_conflict`; "latest" keeps whichever of the stored and the
+    uploaded row has the later `as_of`. Rejected rows are counted and
+    listed, with line numbers and reasons, at
+    GET /upload/errors/{error_report}.
     """
     try:
-        contents = await file.read()
-        text = contents.decode("utf-8")
-        reader = csv.DictReader(io.StringIO(text))
-        
-        rows_ingested = 0
-        for row in reader:
-            try:
-                point = EnergyPoint(
-                    timestamp=row["timestamp"],
-                    kw=float(row["kw"]),
-                    site=site,
-                    cost_usd=float(row.get("cost_usd", 0)) if row.get("cost_usd") else None,
-                    co2_kg=float(row.get("co2_kg", 0)) if row.get("co2_kg") else None,
-                    temp_c=float(row.get("temp_c", 0)) if row.get("temp_c") else None,
-                )
-                insert_energy(point)
-                rows_ingested += 1
-            except (ValueError, KeyError) as e:
-                # Skip invalid rows
-                continue
+        result = await ingest_csv_stream(file.read, site, batch_size=batch_size, policy=on_conflict, filename=file.filename, as_of=as_of)
+        counts = result.counts
         
-        # Publish ingest event
-        publish_event("event.ingest", {
-            "site": site,
-            "rows_ingested": rows_ingested,
-            "filename": file.filename
-        })
+        # Publish ingest event (a resend that changed nothing triggers no work)
+        if counts.written:
+            publish_event("event.ingest", {
+                "site": site,
+                "rows_ingested": counts.written,
+                "filename": file.filename
+            })
         
         return {
             "status": "success",
             "site": site,
-            "rows_ingested": rows_ingested,
+            "rows_ingested": counts.written,
+            "inserted": counts.inserted,
+            "updated": counts.updated,
+            "skipped": counts.skipped,
+            "rejected": result.rejected,
+            "error_report": result.error_report,
             "filename": file.filename
         }
     except Exception as e:
         raise HTTPException(status_code=400, detail=f"Upload failed: {str(e)}")
 
 
+@app.get("/upload/errors/{report_id}")
+async def get_upload_errors(report_id: str):
+    """Download an upload's rejected rows as CSV: filename,line,reason,raw."""
+    rows = await aio.read_ingest_errors(report_id)
+    if not rows:
+        raise HTTPException(status_code=404, detail=f"No error report '{report_id}'")
+    
+    buf = io.StringIO()
+    writer = csv.writer(buf)
+    writer.writerow(["filename", "line", "reason", "raw"])
+    writer.writerows(rows)
+    return Response(
+        content=buf.getvalue(),
+        media_type="text/csv",
+        headers={"Content-Disposition": f'attachment; filename="upload-errors-{report_id}.csv"'}
+    )
+
+
+@app.post("/upload/batch")
+async def upload_batch(
+    files: List[UploadFile] = File(...),
+    site: str = Query(default="plant-a", description="Site identifier"),
+    workers: int = Query(default=INGEST_WORKERS, ge=1, le=64, description="Parse worker processes (at most the CPU count)"),
+    on_conflict: Optional[str] = Query(
+        default=None, pattern=f"^({'|'.join(CONFLICT_POLICIES)})$",
+        description="Rows already stored for the same timestamp: ignore, replace, or latest (default: ENERGY_CONFLICT_POLICY)"
+    ),
+    as_of: Optional[str] = Query(default=None, description="ISO-8601 source time of the data, compared by on_conflict=latest; default: now")
+):
+    """
+    Upload several CSV files and/or .gz, .zip or .zst archives for a site.
+    
+    Uploads are spooled to disk, then parsed in parallel and written by a
+    single writer (see common.ingest.ingest_files; `python -m common.ingest`
+    runs the same code on local files). The response has per-file counts
+    or errors, totals, the error report id for rejected rows, and
+    rows/sec; a file that fails does not fail the request.
+    """
+    try:
+        with tempfile.TemporaryDirectory(prefix="upload-") as tmp:
+            spooled = []
+            for i, file in enumerate(files):
+                path = Path(tmp) / str(i)
+                with open(path, "wb") as out:
+                    while data := await file.read(UPLOAD_READ_SIZE):
+                        out.write(data)
+                spooled.append((str(path), file.filename or f"file-{i}"))
+            result = await aio.run(ingest_files, spooled, site, workers, on_conflict, INGEST_CHUNK_SIZE, as_of)
+        
+        totals = result["totals"]
+        written = totals["inserted"] + totals["updated"]
+        if written:
+            publish_event("event.ingest", {
+                "site": site,
+                "rows_ingested": written,
+                "files": totals["files"]
+            })
+        
+        return {"status": "success", "site": site, **result}
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=f"Upload failed: {str(e)}")
+
+
+async def cached_listing(request: Request, kind: str, site: str, limit: int, load) -> Response:
+    """
+    Serve a listing from the response cache, answering 304 when unchanged.
+
+    The ETag is derived from the site's version counter, so a matching
+    If-None-Match is answered from one key lookup without building the body.
+    """
+    version = await aio.site_version(kind, site)
+    etag = make_etag(kind, site, limit, version)
+    if_none_match = request.headers.get("if-none-match", "")
+    if etag in (tag.strip() for tag in if_none_match.split(",")) or if_none_match.strip() == "*":
+        return Response(status_code=304, headers={"ETag": etag})
+
+    entry = response_cache.get(kind, site, limit, version)
+    if entry is None:
+        items = await load(site, limit=limit)
+        body = json.dumps([item.dict() for item in items]).encode("utf-8")
+        entry = response_cache.put(kind, site, limit, version, body)
+    return Response(content=entry.body, media_type="application/json", headers={"ETag": entry.etag})
+
+
 @app.get("/insights", response_model=List[Insight])
-async def get_insights(site: str = Query(default="plant-a", description="Site identifier")):
-    """Get recent insights for a site."""
-    insights = list_insights(site, limit=10)
-    return insights
+async def get_insights(
+    request: Request,
+    site: str = Query(default="plant-a", description="Site identifier"),
+    limit: int = Query(default=10, ge=1, le=100, description="Number of insights")
+):
+    """Get recent insights for a site (cached; supports If-None-Match)."""
+    return await cached_listing(request, "insights", site, limit, aio.list_insights)
 
 
 @app.get("/plans", response_model=List[Plan])
-async def get_plans(site: str = Query(default="plant-a", description="Site identifier")):
-    """Get recent plans for a site."""
-    plans = list_plans(site, limit=10)
-    return plans
+async def get_plans(
+    request: Request,
+    site: str = Query(default="plant-a", description="Site identifier"),
+    limit: int = Query(default=10, ge=1, le=100, description="Number of plans")
+):
+    """Get recent plans for a site (cached; supports If-None-Match)."""
+    return await cached_listing(request, "plans", site, limit, aio.list_plans)
+
+
+@app.get("/leaderboard")
+async def get_leaderboard(
+    metric: str = Query(default="anomalies", pattern=f"^({'|'.join(LEADERBOARD_METRICS)})$", description="Ranking metric"),
+    limit: int = Query(default=10, ge=1, le=1000, description="Number of sites"),
+    order: str = Query(default="desc", pattern="^(asc|desc)$", description="desc: highest first"),
+    sites: Optional[str] = Query(default=None, description="Comma-separated sites to compare; default: all sites")
+):
+    """
+    Cross-site ranking by anomaly count, high-severity anomalies, forecast
+    load or cost/CO2 totals.
+    
+    Read off a per-site index kept current by insight saves (anomaly and
+    forecast columns) and by ingest (cost/CO2 totals), so a top-k costs
+    the same for ten sites or ten thousand.
+    """
+    selected = [site.strip() for site in sites.split(",") if site.strip()] if sites else None
+    entries = await aio.site_leaderboard(metric, limit, order == "asc", selected)
+    return {
+        "metric": metric,
+        "order": order,
+        "entries": [entry.dict() for entry in entries]
+    }
+
+
+@app.get("/energy")
+async def get_energy(
+    site: str = Query(default="plant-a", description="Site identifier"),
+    start: Optional[str] = Query(default=None, description="ISO-8601 start (inclusive); default: all history"),
+    end: Optional[str] = Query(default=None, description="ISO-8601 end (exclusive); default: latest reading"),
+    bucket: str = Query(default="1h", pattern=f"^({'|'.join(BUCKET_SECONDS)})$", description="Time bucket width"),
+    agg: str = Query(default="avg", pattern=f"^({'|'.join(AGGREGATES)})$", description="Aggregate per bucket"),
+    points: Optional[int] = Query(default=None, ge=3, le=100_000, description="LTTB-downsample to at most this many points")
+):
+    """
+    Energy (kW) per time bucket for charting.
+    
+    Aggregation runs in storage: hourly and daily avg/max/sum come from
+    rollup tables maintained at ingest, so a year of hourly data is a
+    range scan over 8,760 rows. `points` further reduces the series with
+    Largest-Triangle-Three-Buckets, keeping its visual shape.
+    """
+    try:
+        start_epoch = to_epoch(start) if start else None
+        end_epoch = to_epoch(end) if end else None
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=f"Invalid timestamp: {str(e)}")
+    
+    series = await aio.read_energy_aggregate(site, bucket, agg, start_epoch, end_epoch)
+    ts_epoch, kw = series["ts_epoch"], series["kw"]
+    buckets = len(ts_epoch)
+    if points is not None:
+        keep = lttb(ts_epoch, kw, points)
+        ts_epoch, kw = ts_epoch[keep], kw[keep]
+    
+    timestamps = np.datetime_as_string(ts_epoch.astype("datetime64[s]"), unit="s", timezone="UTC")
+    body = {
+        "site": site,
+        "bucket": bucket,
+        "agg": agg,
+        "source": "rollup" if uses_rollup(bucket, agg) else "raw",
+        "buckets": buckets,
+        "points": [{"timestamp": t, "kw": v} for t, v in zip(timestamps.tolist(), kw.tolist())]
+    }
+    return Response(content=json.dumps(body), media_type="application/json")
+
+
+@app.get("/cache/stats")
+async def cache_stats():
+    """Response cache hit/miss/eviction counters and memory use."""
+    return response_cache.stats()
+
 
+@app.get("/pipeline/stats")
+async def pipeline_stats():
+    """Pipeline runs and per-stage latency from upload to plan."""
+    if pipeline is None:
+        return {"enabled": False}
+    return {"enabled": True, **pipeline.stats()}